@@ -1,4 +1,7 @@
 from SimPG.classes import Minibed, Minigfa
+from SimPG.graph import CSRGraph, save_graph, load_graph
+from SimPG.walks import WalkStore, WalkWriter, open_walks
+from SimPG.frequency import NodeFrequency, open_node_frequency
 from SimPG.core import (
     turn_GFA_to_DiGraph,
     simulate_population_every_walk,
@@ -13,6 +16,14 @@ __all__ = [
     "run_SimPG",
     "Minibed",
     "Minigfa",
+    "CSRGraph",
+    "save_graph",
+    "load_graph",
+    "WalkStore",
+    "WalkWriter",
+    "open_walks",
+    "NodeFrequency",
+    "open_node_frequency",
     "turn_GFA_to_DiGraph",
     "simulate_population_every_walk",
     "simulate_Population_Pangenome",
@@ -11,6 +11,14 @@ __all__ = [
     "run_SimPG",
     "Minibed",
     "Minigfa",
+    "CSRGraph",
+    "save_graph",
+    "load_graph",
+    "WalkStore",
+    "WalkWriter",
+    "open_walks",
+    "NodeFrequency",
+    "open_node_frequency",
     "turn_GFA_to_DiGraph",
     "simulate_population_every_walk",
     "simulate_Population_Pangenome",
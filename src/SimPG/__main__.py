@@ -16,12 +16,12 @@ def cli():
     parser.add_argument(
         "--save_temp_file",
         action="store_true",
-        help="Whether to save as a pickle file for reuse. Defaults to False",
+        help="Whether to keep intermediate files (graph snapshots and pickles) for reuse. Defaults to False",
     )
     parser.add_argument(
         "--save_walk_filepath",
         default=None,
-        help="Save file location.By default, it is saved in `my_walks.pl` in the `/tmp` folder of the working directory.",
+        help="Save file location.The walks are written as a walk store. By default, it is saved in `my_walks.spw` in the `/tmp` folder of the working directory.",
     )
     parser.add_argument(
         "--report_graph_information",
@@ -56,6 +56,45 @@ def cli():
         action="store_true",
         help="Is the pan-genome a human pan-genome? Defaults to `False`.",
     )
+    parser.add_argument(
+        "--graph_engine",
+        choices=["networkx", "csr"],
+        default="networkx",
+        help="Graph representation. `csr` uses the compact array-backed graph, which needs far less memory on large pangenomes. Defaults to `networkx`.",
+    )
+    parser.add_argument(
+        "-t",
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of worker processes. Defaults to 1.",
+    )
+    parser.add_argument(
+        "--walk_engine",
+        choices=["sample", "bubble"],
+        default="sample",
+        help="How sample walks are extracted. `bubble` solves all samples bubble by bubble, building each bubble subgraph once, but keeps every walk in memory. Defaults to `sample`.",
+    )
+    parser.add_argument(
+        "--walk_cache",
+        default=None,
+        help="File of the bubble solution cache. Solutions saved by an earlier run on the same graph and BED are reused, and new ones are added. Defaults to None.",
+    )
+    parser.add_argument(
+        "--use_gfa_paths",
+        action="store_true",
+        help="Read the walks of the samples that have W-lines or P-lines in the GFA file from those lines instead of searching the graph. Defaults to `False`.",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Checkpoint the walk extraction, and continue the one of an interrupted run with `--resume` into the same walk file, keeping the walks it finished. The walks are extracted again if the GFA or BED file changed. Defaults to `False`.",
+    )
+    parser.add_argument(
+        "--sample_cache",
+        default=None,
+        help="Directory caching the walk of every sample extracted, shared by the runs on the same GFA and BED files with any population. Cached samples are copied instead of extracted again. Defaults to None.",
+    )
 
     args = parser.parse_args()
     run_SimPG(
@@ -70,6 +109,13 @@ def cli():
         args.population_name,
         args.sim_num,
         args.logging_verbose,
+        args.graph_engine,
+        args.workers,
+        args.walk_engine,
+        args.walk_cache,
+        args.use_gfa_paths,
+        args.resume,
+        args.sample_cache,
     )
 
 
@@ -1,92 +1,728 @@
 from sys import exit
-from typing import Any, Generator, Optional
-from functools import cache
-
-all = ["Minigfa", "Minibed"]
-
-
-class _Segment:
-    def __init__(self, S_line: str) -> None:
-        easy_line = S_line.strip().split("\t")
-        self.segID: str = easy_line[1]
-        self.seq: str = easy_line[2]
-        SN_parts = easy_line[4].split(":")[2].split("#")
-        self._SName = (SN_parts[0], int(SN_parts[1]), SN_parts[2])
-        self.SRank: int = int(easy_line[6].split(":")[2])
-
-    @property
-    def source_sample(self) -> str:
-        return self._SName[0]
-
-    @property
-    def linear_reference_chr(self) -> str:
-        return self._SName[2]
-
-
-class _Link:
-    def __init__(self, L_line: str) -> None:
-        easy_line = L_line.strip().split("\t")
-        self.fromSeg = (easy_line[1], easy_line[2])
-        self.toSeg = (easy_line[3], easy_line[4])
-        self.SRank = int(easy_line[6].split(":")[2])
-
-    @property
-    def fromID(self) -> str:
-        return self.fromSeg[0]
-
-    @property
-    def fromOrient(self) -> str:
-        return self.fromSeg[1]
-
-    @property
-    def toID(self) -> str:
-        return self.toSeg[0]
-
-    @property
-    def toOrient(self) -> str:
-        return self.toSeg[1]
+from array import array
+from typing import Any, Generator, Iterable, Optional, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate, compress, repeat
+from collections import OrderedDict
+from hashlib import blake2b
+from . import logger
+import io
+import mmap
+import os
+import struct
+import sys
+
+all = ["Minigfa", "Minibed", "file_fingerprint"]
+
+_INDEX_SUFFIX = ".spgi"
+_INDEX_MAGIC = b"SPGGFAIX"
+_INDEX_VERSION = 4
+# magic, version, byte order, flags, GFA size, GFA mtime_ns, GFA content hash, number of sections
+_INDEX_HEADER = struct.Struct("<8sIIIQq16sI")
+# section name, offset, length in bytes
+_INDEX_SECTION = struct.Struct("<16sQQ")
+_INDEX_SECTIONS = (
+    ("seg_key", "q"),
+    ("SRank", "h"),
+    ("sample_code", "i"),
+    ("seq_offset", "q"),
+    ("seq_buffer", "B"),
+    ("seq_file_offset", "q"),
+    ("seq_length", "q"),
+    ("row_of_num", "q"),
+    ("link_from", "q"),
+    ("link_to", "q"),
+    ("link_orient", "B"),
+    ("link_SRank", "h"),
+    ("samples", "B"),
+    ("odd_names", "B"),
+    ("gfa_path", "B"),
+    ("sample_SRank", "h"),
+    ("rank_seg_offset", "q"),
+    ("rank_seg_row", "q"),
+    ("rank_link_offset", "q"),
+    ("rank_link_row", "q"),
+    ("path_names", "B"),
+    ("path_offset", "q"),
+    ("path_step", "q"),
+)
+# Bits of the flags field of the index header
+_INDEX_LAZY_SEQ = 1
+_INDEX_WITH_PATHS = 2
+_HASH_SAMPLE_SIZE = 1 << 20
+_CHUNKS_PER_WORKER = 4
+
+
+def _parse_seg_num(segID: str) -> int:
+    """Return the number of an rGFA style segment ID ("s<int>"), or -1 for any other name"""
+    digits = segID[1:]
+    if segID[:1] != "s" or not digits.isdigit() or (digits[0] == "0" and digits != "0"):
+        return -1
+    return int(digits)
+
+
+def _split_line_aligned(file_path: str, n_chunks: int) -> list[int]:
+    """Byte offsets cutting the file into about `n_chunks` ranges, each boundary at the start of a line"""
+    size = os.path.getsize(file_path)
+    bounds = [0]
+    with open(file_path, "rb") as f:
+        for i in range(1, n_chunks):
+            pos = size * i // n_chunks
+            if pos <= bounds[-1]:
+                continue
+            f.seek(pos - 1)
+            f.readline()
+            pos = f.tell()
+            if pos >= size:
+                break
+            if pos > bounds[-1]:
+                bounds.append(pos)
+    bounds.append(size)
+    return bounds
+
+
+def _parse_gfa_chunk(
+    file_path: str, start: int, end: int, lazy_seq: bool, with_paths: bool
+) -> "Minigfa":
+    """Worker of the parallel parser, parse the lines in [start, end) of the file into a partial Minigfa"""
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        chunk = f.read(end - start)
+    part = Minigfa(with_paths=with_paths)
+    if lazy_seq:
+        part._lazy_seq = True
+        part._parse_lines_lazy(io.BytesIO(chunk), start)
+    else:
+        # Decode like `open(file_path, "r")` does in the serial parser
+        part._parse_lines(io.TextIOWrapper(io.BytesIO(chunk)))
+    return part
+
+
+def _group_by_rank(ranks: Sequence[int]) -> tuple[array, array]:
+    """Counting sort of row indices by rank, return the offsets per rank and the grouped rows"""
+    counts = [0] * (max(ranks, default=-1) + 2)
+    for rank in ranks:
+        counts[rank + 1] += 1
+    offsets = array("q", accumulate(counts))
+    position = list(offsets[:-1])
+    rows = array("q", bytes(8 * len(ranks)))
+    for row, rank in enumerate(ranks):
+        rows[position[rank]] = row
+        position[rank] += 1
+    return offsets, rows
+
+
+def file_fingerprint(file_path: str) -> tuple[int, int, bytes]:
+    """Size, mtime and a content hash of a GFA or BED file, what the GFA index and the walk manifest are checked against.
+
+    The hash covers the first and the last MiB of the file, so checking a multi-GB graph stays cheap.
+    """
+    stat = os.stat(file_path)
+    digest = blake2b(digest_size=16)
+    digest.update(stat.st_size.to_bytes(8, "little"))
+    with open(file_path, "rb") as f:
+        digest.update(f.read(_HASH_SAMPLE_SIZE))
+        if stat.st_size > _HASH_SAMPLE_SIZE:
+            f.seek(max(_HASH_SAMPLE_SIZE, stat.st_size - _HASH_SAMPLE_SIZE))
+            digest.update(f.read())
+    return stat.st_size, stat.st_mtime_ns, digest.digest()
 
 
 class Minigfa:
     """
         Composite data storing GFA file information.
-        Notice:Only lines S and L can be processed, lines starting with other letters are discarded
+        Notice:Only lines S and L can be processed, lines starting with other letters are discarded, except W and P lines with `with_paths=True`
 
         The path of the GFA file that is preferably passed in when constructing the object.If you don't do this, you will just get an empty object. Please call the build_Minigfa method to construct
+
+        Segments and links are kept in a columnar table instead of one object per line: every segment gets a row index,
+        and its rank, sample name code and sequence offsets are stored in typed arrays next to one shared sequence buffer.
+        `s<int>` segment IDs are resolved through an array sized to the largest segment number, so they are expected to be
+        numbered densely from 0 or 1 as minigraph does; other names go through a dict. As with S-lines read into a dict,
+        a segment ID defined twice keeps the position of its first S-line and the fields of the last one.
+        With `lazy_seq=True` no sequence is loaded, only its byte offset and length in the GFA file are recorded,
+        and `get_seq` reads it from a memory map of the file, optionally through an LRU cache of `seq_cache_size` sequences.
+        After the first parse the tables are written to a binary index next to the GFA file (`<file_path>.spgi`),
+        later constructions on the unchanged file map that index instead of parsing the text again.
+        With `with_paths=True` the W-lines and P-lines are kept as well, as arrays of interned oriented nodes, so that the
+        walks of the samples can be read from the file instead of being searched in the graph.
     Examples:
             >>> myGfa = Minigfa("pangenome.gfa")
             >>> myGfa2 = Minigfa()
             >>> myGfa2.build_Minigfa("pangenome.gfa")
+            >>> myGfa3 = Minigfa.open_index("pangenome.gfa.spgi")
 
     """
 
-    S_line_factory = dict[str, _Segment]
-    L_line_factory = list[_Link]
-
-    def __init__(self, file_path: Optional[str] = None) -> None:
-        self.S_line = self.S_line_factory()
-        self.L_line = self.L_line_factory()
+    def __init__(
+        self,
+        file_path: Optional[str] = None,
+        use_index: bool = True,
+        workers: int = 1,
+        lazy_seq: bool = False,
+        seq_cache_size: int = 0,
+        with_paths: bool = False,
+    ) -> None:
+        self._file_path: Optional[str] = None
+        # Index the tables are mapped from, and the GFA fingerprint recorded in it
+        self._index_path: Optional[str] = None
+        self._index_fingerprint: Optional[tuple[int, int, bytes]] = None
+        # Segment table, one row per S-line in file order.
+        # A segment key is the number of a "s<int>" segment ID, or -(k + 1) for the k-th other name
+        self._seg_key = array("q")
+        self._SRank = array("h")
+        self._sample_code = array("i")
+        # Row i owns _seq_buffer[_seq_offset[i]:_seq_offset[i + 1]]
+        self._seq_offset = array("q", [0])
+        self._seq_buffer = bytearray()
+        # Lazy sequences: row i is at _seq_file_offset[i] in the GFA file and has _seq_length[i] bases
+        self._lazy_seq = lazy_seq
+        self._seq_file_offset = array("q")
+        self._seq_length = array("q")
+        self._gfa_map: Optional[mmap.mmap] = None
+        self._seq_cache: Optional[OrderedDict[int, str]] = (
+            OrderedDict() if seq_cache_size > 0 else None
+        )
+        self._seq_cache_size = seq_cache_size
+        # Link table, one row per L-line in file order
+        self._link_from = array("q")
+        self._link_to = array("q")
+        # Bit 0: fromOrient is "-", bit 1: toOrient is "-"
+        self._link_orient = bytearray()
+        self._link_SRank = array("h")
+        # Path table, one row per W-line or P-line in file order, with `with_paths`.
+        # A step is `2 * segment key + strand`, the steps of path i are _path_step[_path_offset[i]:_path_offset[i + 1]]
+        self._with_paths = with_paths
+        self._path_names: list[str] = []
+        self._path_offset = array("q", [0])
+        self._path_step = array("q")
+        self._path_rows: Optional[dict[str, list[int]]] = None
+        # Interned names
+        self._samples: list[str] = []
+        self._sample_table: dict[str, int] = {}
+        self._sample_SRank = array("h")  # sample code -> SR
+        self._odd_names: list[str] = []
+        self._odd_keys: dict[str, int] = {}
+        # SR -> rows, the rows of SR r are _rank_seg_row[_rank_seg_offset[r]:_rank_seg_offset[r + 1]]
+        self._rank_seg_offset = array("q", [0])
+        self._rank_seg_row = array("q")
+        self._rank_link_offset = array("q", [0])
+        self._rank_link_row = array("q")
+        # Segment key -> row
+        self._row_of_num = array("q")
+        self._row_of_name: dict[str, int] = {}
         if file_path != None:
-            self.build_Minigfa(file_path)
-
-    def build_Minigfa(self, file_path: str) -> None:
+            self.build_Minigfa(file_path, use_index, workers)
+
+    def __getstate__(self) -> dict:
+        # Tables mapped from an index are views of the mapping, which is reopened instead of copying its pages
+        if self._index_path is not None:
+            return {
+                "_index_path": self._index_path,
+                "_index_fingerprint": self._index_fingerprint,
+                "_file_path": self._file_path,
+                "_seq_cache_size": self._seq_cache_size,
+                "_with_paths": self._with_paths,
+            }
+        state = self.__dict__.copy()
+        state["_gfa_map"] = None
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        if state.get("_index_path") is not None:
+            gfa = Minigfa(
+                seq_cache_size=state["_seq_cache_size"],
+                with_paths=state["_with_paths"],
+            )
+            gfa._file_path = state["_file_path"]
+            if not gfa._load_index(state["_index_path"], state["_index_fingerprint"]):
+                raise ValueError(
+                    f"GFA index {state['_index_path']} was rewritten since it was mapped"
+                )
+            state = gfa.__dict__
+        self.__dict__.update(state)
+
+    def build_Minigfa(
+        self, file_path: str, use_index: bool = True, workers: int = 1
+    ) -> None:
+        """Build the tables from a GFA file.
+
+        Args:
+            file_path (str): GFA file path
+            use_index (bool, optional): Whether to map the binary index of the file if it is up to date, and to write one after parsing otherwise. Defaults to True.
+            workers (int, optional): Number of processes parsing line-aligned chunks of the file. The tables are identical to a serial parse. Defaults to 1.
+
+        Notice: An up-to-date index is used whatever `lazy_seq` is, its sequences are read from the mapped index or GFA file on demand.
+        """
         try:
-            with open(file_path, "r") as file:
-                for lineno, line in enumerate(file, start=1):
-                    temp = line.strip()
-                    if temp.startswith("S"):
-                        easy_line = line.strip().split("\t")
-                        self.S_line[easy_line[1]] = _Segment(temp)
-                    elif temp.startswith("L"):
-                        self.L_line.append(_Link(temp))
-                    else:
-                        continue
+            fingerprint = file_fingerprint(file_path)
         except FileNotFoundError:
             print(f"Error: File '{file_path}' not found.")
             exit(1)
+        self._file_path = file_path
+        index_path = file_path + _INDEX_SUFFIX
+        if use_index and os.path.exists(index_path):
+            try:
+                if self._load_index(index_path, fingerprint):
+                    logger.info(f"Load GFA index {index_path}")
+                    return
+            except (OSError, ValueError, struct.error):
+                logger.warning(
+                    f"GFA index {index_path} is broken, parse {file_path} again"
+                )
+        if workers > 1:
+            self._parse_parallel(file_path, workers)
+        elif self._lazy_seq:
+            with open(file_path, "rb") as file:
+                self._parse_lines_lazy(file, 0)
+        else:
+            with open(file_path, "r") as file:
+                self._parse_lines(file)
+        self._build_lookups()
+        if use_index:
+            try:
+                self._write_index(index_path, fingerprint)
+            except OSError as e:
+                logger.warning(f"Unable to write GFA index {index_path}: {e}")
+
+    def _parse_lines(self, lines: Iterable[str]) -> None:
+        for line in lines:
+            if line.startswith("S"):
+                self._add_segment(line.rstrip("\n").split("\t"))
+            elif line.startswith("L"):
+                self._add_link(line.rstrip("\n").split("\t"))
+            elif self._with_paths and line[:1] in ("W", "P"):
+                self._add_path(line.rstrip("\r\n").split("\t"))
+            else:
+                continue
+
+    def _parse_lines_lazy(self, lines: Iterable[bytes], offset: int) -> None:
+        """Parse binary lines starting at byte `offset` of the GFA file, recording sequence positions instead of sequences"""
+        for line in lines:
+            if line.startswith(b"S"):
+                easy_line = line.split(b"\t", 7)
+                self._add_segment_meta(
+                    easy_line[1].decode(),
+                    easy_line[4].decode(),
+                    easy_line[6].rstrip(b"\r\n").decode(),
+                )
+                self._seq_file_offset.append(
+                    offset + len(easy_line[0]) + len(easy_line[1]) + 2
+                )
+                self._seq_length.append(len(easy_line[2]))
+            elif line.startswith(b"L"):
+                self._add_link(line.decode().rstrip("\r\n").split("\t"))
+            elif self._with_paths and line[:1] in (b"W", b"P"):
+                self._add_path(line.decode().rstrip("\r\n").split("\t"))
+            offset += len(line)
+
+    def _parse_parallel(self, file_path: str, workers: int) -> None:
+        """Parse line-aligned byte ranges of the file in worker processes and merge the partial tables in file order"""
+        bounds = _split_line_aligned(file_path, workers * _CHUNKS_PER_WORKER)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for part in executor.map(
+                _parse_gfa_chunk,
+                repeat(file_path),
+                bounds[:-1],
+                bounds[1:],
+                repeat(self._lazy_seq),
+                repeat(self._with_paths),
+            ):
+                self._merge_part(part)
+
+    def _merge_part(self, part: "Minigfa") -> None:
+        """Append the tables of a Minigfa parsed from the next chunk of the same file"""
+        key_map = {key: self._get_seg_key(name) for name, key in part._odd_keys.items()}
+
+        def remap(keys: array) -> array:
+            """Translate the keys of the other names of `part` to the keys of this Minigfa"""
+            if not key_map:
+                return keys
+            return array("q", (key_map.get(k, k) for k in keys))
+
+        for name, row in part._row_of_name.items():
+            self._row_of_name[name] = len(self._SRank) + row
+        self._seg_key.extend(remap(part._seg_key))
+        code_map = []
+        for code, sample in enumerate(part._samples):
+            code_map.append(self._intern_sample(sample))
+            if code_map[-1] == len(self._sample_SRank):
+                self._sample_SRank.append(part._sample_SRank[code])
+        if code_map == list(range(len(code_map))):
+            self._sample_code.extend(part._sample_code)
+        else:
+            self._sample_code.extend(
+                array("i", (code_map[c] for c in part._sample_code))
+            )
+        self._SRank.extend(part._SRank)
+        if self._lazy_seq:
+            self._seq_file_offset.extend(part._seq_file_offset)
+            self._seq_length.extend(part._seq_length)
+        else:
+            base = len(self._seq_buffer)
+            self._seq_buffer += part._seq_buffer
+            self._seq_offset.extend(
+                array("q", (base + x for x in part._seq_offset[1:]))
+            )
+        self._link_from.extend(remap(part._link_from))
+        self._link_to.extend(remap(part._link_to))
+        self._link_orient += part._link_orient
+        self._link_SRank.extend(part._link_SRank)
+        if key_map:
+            steps = array(
+                "q",
+                (
+                    key_map.get(step >> 1, step >> 1) << 1 | step & 1
+                    for step in part._path_step
+                ),
+            )
+        else:
+            steps = part._path_step
+        base = len(self._path_step)
+        self._path_names.extend(part._path_names)
+        self._path_offset.extend(array("q", (base + x for x in part._path_offset[1:])))
+        self._path_step.extend(steps)
+
+    def build_index(self, index_path: Optional[str] = None) -> str:
+        """Write the binary index of the parsed GFA file.
+
+        Args:
+            index_path (str | None, optional): Index file location. Defaults to `<file_path>.spgi` next to the GFA file.
+
+        Returns:
+            str: The index file location
+        """
+        if self._file_path is None:
+            raise ValueError(
+                "Minigfa must be built from a GFA file before writing its index"
+            )
+        if index_path is None:
+            index_path = self._file_path + _INDEX_SUFFIX
+        self._write_index(index_path, file_fingerprint(self._file_path))
+        return index_path
+
+    @classmethod
+    def open_index(cls, index_path: str, with_paths: bool = False) -> "Minigfa":
+        """Map a binary index written by `build_index` without checking it against its GFA file.
+
+        The tables are read-only views of the mapped file, so several processes opening the same index share it through the page cache.
+        The path table of the index is only kept with `with_paths=True`.
+
+        Raises:
+            ValueError: The file is not a GFA index, or was written by another version or on a machine with another byte order.
+        """
+        gfa = cls(with_paths=with_paths)
+        if not gfa._load_index(index_path, None):
+            raise ValueError(f"{index_path} was written by an incompatible SimPG")
+        return gfa
+
+    def _get_seg_key(self, segID: str) -> int:
+        num = _parse_seg_num(segID)
+        if num >= 0:
+            return num
+        key = self._odd_keys.get(segID)
+        if key is None:
+            key = -len(self._odd_names) - 1
+            self._odd_keys[segID] = key
+            self._odd_names.append(segID)
+        return key
+
+    def _key_to_segID(self, key: int) -> str:
+        return f"s{key}" if key >= 0 else self._odd_names[-key - 1]
+
+    def _add_segment(self, easy_line: list[str]) -> None:
+        self._add_segment_meta(easy_line[1], easy_line[4], easy_line[6])
+        self._seq_buffer += easy_line[2].encode("ascii")
+        self._seq_offset.append(len(self._seq_buffer))
+
+    def _add_segment_meta(self, segID: str, SN_tag: str, SR_tag: str) -> None:
+        key = self._get_seg_key(segID)
+        if key < 0:
+            self._row_of_name[segID] = len(self._SRank)
+        self._seg_key.append(key)
+        code = self._intern_sample(SN_tag.split(":")[2].split("#")[0])
+        SRank = int(SR_tag.split(":")[2])
+        self._sample_code.append(code)
+        self._SRank.append(SRank)
+        if code == len(self._sample_SRank):
+            # The SR of a sample is the one of its first segment
+            self._sample_SRank.append(SRank)
+
+    def _intern_sample(self, sample: str) -> int:
+        code = self._sample_table.get(sample)
+        if code is None:
+            code = len(self._samples)
+            self._sample_table[sample] = code
+            self._samples.append(sample)
+        return code
+
+    def _add_link(self, easy_line: list[str]) -> None:
+        self._link_from.append(self._get_seg_key(easy_line[1]))
+        self._link_to.append(self._get_seg_key(easy_line[3]))
+        self._link_orient.append((easy_line[2] == "-") | (easy_line[4] == "-") << 1)
+        self._link_SRank.append(int(easy_line[6].split(":")[2]))
+
+    def _add_path(self, easy_line: list[str]) -> None:
+        """Add a W-line (named `SampleId#HapIndex#SeqId`) or a P-line (named by its PathName)"""
+        if easy_line[0] == "W":
+            self._path_names.append("#".join(easy_line[1:4]))
+            walk = easy_line[6]
+            starts = [i for i, c in enumerate(walk) if c in "<>"]
+            for start, end in zip(starts, starts[1:] + [len(walk)]):
+                key = self._get_seg_key(walk[start + 1 : end])
+                self._path_step.append(key << 1 | (walk[start] == "<"))
+        else:
+            self._path_names.append(easy_line[1])
+            for step in easy_line[2].split(","):
+                key = self._get_seg_key(step[:-1])
+                self._path_step.append(key << 1 | (step[-1] == "-"))
+        self._path_offset.append(len(self._path_step))
+
+    def _build_lookups(self) -> None:
+        """Index rows by segment number so that `s<int>` IDs are resolved without a dict, and group segments and links by SR"""
+        max_num = max(
+            max(self._seg_key, default=-1),
+            max(self._link_from, default=-1),
+            max(self._link_to, default=-1),
+            max(self._path_step, default=-1) >> 1,
+        )
+        self._row_of_num = array("q", [-1]) * (max_num + 1)
+        for row, key in enumerate(self._seg_key):
+            if key >= 0:
+                self._row_of_num[key] = row
+        n_numbered = len(self._row_of_num) - self._row_of_num.count(-1)
+        if n_numbered + len(self._row_of_name) < len(self._seg_key):
+            self._merge_duplicate_segments()
+            for row, key in enumerate(self._seg_key):
+                if key >= 0:
+                    self._row_of_num[key] = row
+        self._rank_seg_offset, self._rank_seg_row = _group_by_rank(self._SRank)
+        self._rank_link_offset, self._rank_link_row = _group_by_rank(self._link_SRank)
+
+    def _merge_duplicate_segments(self) -> None:
+        """Keep one row per segment ID defined by several S-lines, at the row of the first one with the fields of the last one"""
+        last_row: dict[int, int] = {}
+        for row, key in enumerate(self._seg_key):
+            last_row[key] = row
+        rows = list(last_row.values())
+        self._seg_key = array("q", last_row)
+        self._SRank = array("h", (self._SRank[row] for row in rows))
+        self._sample_code = array("i", (self._sample_code[row] for row in rows))
+        if self._lazy_seq:
+            self._seq_file_offset = array(
+                "q", (self._seq_file_offset[row] for row in rows)
+            )
+            self._seq_length = array("q", (self._seq_length[row] for row in rows))
+        else:
+            seq_buffer = bytearray()
+            seq_offset = array("q", [0])
+            for row in rows:
+                seq_buffer += self._seq_buffer[
+                    self._seq_offset[row] : self._seq_offset[row + 1]
+                ]
+                seq_offset.append(len(seq_buffer))
+            self._seq_buffer = seq_buffer
+            self._seq_offset = seq_offset
+        self._row_of_name = {
+            self._odd_names[-key - 1]: row
+            for row, key in enumerate(self._seg_key)
+            if key < 0
+        }
+
+    def _write_index(
+        self, index_path: str, fingerprint: tuple[int, int, bytes]
+    ) -> None:
+        blobs = {
+            "samples": "\n".join(self._samples).encode("utf-8"),
+            "odd_names": "\n".join(self._odd_names).encode("utf-8"),
+            "gfa_path": os.path.abspath(self._file_path or "").encode("utf-8"),
+            "path_names": "\n".join(self._path_names).encode("utf-8"),
+        }
+        sections = []
+        offset = _INDEX_HEADER.size + _INDEX_SECTION.size * len(_INDEX_SECTIONS)
+        for name, _ in _INDEX_SECTIONS:
+            data = blobs[name] if name in blobs else getattr(self, "_" + name)
+            data = memoryview(data).cast("B")
+            offset += -offset % 8
+            sections.append((name, offset, data))
+            offset += len(data)
+        tmp_path = f"{index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(
+                _INDEX_HEADER.pack(
+                    _INDEX_MAGIC,
+                    _INDEX_VERSION,
+                    sys.byteorder == "little",
+                    self._lazy_seq * _INDEX_LAZY_SEQ
+                    | self._with_paths * _INDEX_WITH_PATHS,
+                    *fingerprint,
+                    len(sections),
+                )
+            )
+            for name, offset, data in sections:
+                f.write(_INDEX_SECTION.pack(name.encode("ascii"), offset, len(data)))
+            for name, offset, data in sections:
+                f.write(b"\0" * (offset - f.tell()))
+                f.write(data)
+        os.replace(tmp_path, index_path)
+
+    def _load_index(
+        self, index_path: str, fingerprint: Optional[tuple[int, int, bytes]]
+    ) -> bool:
+        """Map the index file. Return False if it was not written for `fingerprint`"""
+        with open(index_path, "rb") as f:
+            magic, version, little, flags, size, mtime_ns, digest, n_sections = (
+                _INDEX_HEADER.unpack(f.read(_INDEX_HEADER.size))
+            )
+            if magic != _INDEX_MAGIC:
+                raise ValueError(f"{index_path} is not a GFA index")
+            if version != _INDEX_VERSION or little != (sys.byteorder == "little"):
+                return False
+            if fingerprint is not None and (size, mtime_ns, digest) != fingerprint:
+                return False
+            if self._with_paths and not flags & _INDEX_WITH_PATHS:
+                # Written without the W/P lines, which are needed now
+                return False
+            table = [
+                _INDEX_SECTION.unpack(f.read(_INDEX_SECTION.size))
+                for _ in range(n_sections)
+            ]
+            buffer = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        typecodes = dict(_INDEX_SECTIONS)
+        for raw_name, offset, length in table:
+            name = raw_name.rstrip(b"\0").decode("ascii")
+            view = buffer[offset : offset + length]
+            if name == "samples":
+                self._samples = str(view, "utf-8").split("\n") if length else []
+            elif name == "odd_names":
+                self._odd_names = str(view, "utf-8").split("\n") if length else []
+            elif name.startswith("path_") and not self._with_paths:
+                # Paths that were not requested are left out, whatever run wrote the index
+                continue
+            elif name == "path_names":
+                self._path_names = str(view, "utf-8").split("\n") if length else []
+            elif name == "gfa_path":
+                if self._file_path is None:
+                    self._file_path = str(view, "utf-8")
+            else:
+                setattr(self, "_" + name, view.cast(typecodes[name]))
+        self._lazy_seq = bool(flags & _INDEX_LAZY_SEQ)
+        self._index_path = index_path
+        self._index_fingerprint = (size, mtime_ns, digest)
+        self._path_rows = None
+        self._gfa_map = None
+        self._sample_table = {name: code for code, name in enumerate(self._samples)}
+        self._odd_keys = {name: -k - 1 for k, name in enumerate(self._odd_names)}
+        self._row_of_name = {}
+        if self._odd_names:
+            for row, key in enumerate(self._seg_key):
+                if key < 0:
+                    self._row_of_name[self._odd_names[-key - 1]] = row
+        return True
+
+    def _get_row(self, segID: str) -> int:
+        num = _parse_seg_num(segID)
+        if 0 <= num < len(self._row_of_num):
+            row = self._row_of_num[num]
+            if row >= 0:
+                return row
+        elif num < 0 and segID in self._row_of_name:
+            return self._row_of_name[segID]
+        raise KeyError(segID)
+
+    def _get_segID(self, row: int) -> str:
+        return self._key_to_segID(self._seg_key[row])
+
+    def get_segment_id(self, segID: str) -> int:
+        """Intern a segment ID as a dense integer.
+
+        `s<int>` IDs are interned as their number, any other name gets an integer after the largest segment number.
+        """
+        num = _parse_seg_num(segID)
+        if num >= 0:
+            return num
+        key = self._odd_keys.get(segID)
+        if key is None:
+            raise KeyError(segID)
+        return len(self._row_of_num) - key - 1
+
+    def get_segment_name(self, seg_id: int) -> str:
+        """Translate an interned segment ID back to the segment ID in the GFA file"""
+        if seg_id < len(self._row_of_num):
+            return f"s{seg_id}"
+        return self._odd_names[seg_id - len(self._row_of_num)]
+
+    def get_segment_id_bound(self) -> int:
+        """Return an upper bound (exclusive) of all interned segment IDs, the size of arrays indexed by them"""
+        return len(self._row_of_num) + len(self._odd_names)
+
+    def get_other_segIDs(self) -> list[str]:
+        """Return the segment IDs that are not `s<int>`, in the order of their interned IDs after the largest segment number"""
+        return list(self._odd_names)
+
+    def get_node_id(self, segID: str, orient: str) -> int:
+        """Intern an oriented node (segID, orient) as `2 * segment id + strand`, strand is 1 for "-" and 0 for "+" """
+        return 2 * self.get_segment_id(segID) + (orient == "-")
+
+    def get_node(self, node_id: int) -> tuple[str, str]:
+        """Translate an interned oriented node back to the tuple (segID, orient)"""
+        return self.get_segment_name(node_id >> 1), "-" if node_id & 1 else "+"
+
+    def get_SRank_by_sample(self, sample_name: str) -> int:
+        """Return the SR of a sample, or -1 if no segment is derived from it"""
+        code = self._sample_table.get(sample_name)
+        return -1 if code is None else self._sample_SRank[code]
+
+    def get_all_sample(self) -> Generator[tuple[str, int], Any, None]:
+        """Generate all samples
+
+        Yields:
+            tuple[str, int]: Returns a two-tuple, sample name, SRank in order
+        """
+        yield from zip(self._samples, self._sample_SRank)
+
+    def get_segID_by_SRank(self, SRank: int) -> Generator[str, Any, None]:
+        """Generate the IDs of the segments whose SR is `SRank`, in file order"""
+        if 0 <= SRank < len(self._rank_seg_offset) - 1:
+            for i in range(
+                self._rank_seg_offset[SRank], self._rank_seg_offset[SRank + 1]
+            ):
+                yield self._get_segID(self._rank_seg_row[i])
+
+    def get_segment_id_by_sample(self, sample_name: str) -> array:
+        """Return the interned IDs (see `get_segment_id`) of the segments derived from a sample, in file order"""
+        code = self._sample_table.get(sample_name)
+        if code is None:
+            return array("q")
+        bound = len(self._row_of_num)
+        return array(
+            "q",
+            (
+                key if key >= 0 else bound - key - 1
+                for key in compress(self._seg_key, map(code.__eq__, self._sample_code))
+            ),
+        )
+
+    def get_Link_by_SRank(
+        self, SRank: int
+    ) -> Generator[tuple[str, str, str, str, int], Any, None]:
+        """Generate the links whose SR is `SRank` in file order, as five-tuples like `get_all_Link`"""
+        if 0 <= SRank < len(self._rank_link_offset) - 1:
+            for i in range(
+                self._rank_link_offset[SRank], self._rank_link_offset[SRank + 1]
+            ):
+                link = self._rank_link_row[i]
+                orient = self._link_orient[link]
+                yield (
+                    self._key_to_segID(self._link_from[link]),
+                    "-" if orient & 1 else "+",
+                    self._key_to_segID(self._link_to[link]),
+                    "-" if orient & 2 else "+",
+                    SRank,
+                )
 
     def get_linear_reference(self) -> str:
-        return self.S_line["s1"].source_sample
+        return self.get_source_sample("s1")
 
     def get_all_segID(self) -> Generator[str, Any, None]:
         """Generate all segment IDs
@@ -94,17 +730,131 @@ class Minigfa:
         Yields:
             str: return a segment ID
         """
-        for segID in self.S_line.keys():
-            yield segID
+        for row in range(len(self._seg_key)):
+            yield self._get_segID(row)
 
     def get_seq(self, segID: str) -> str:
-        return self.S_line[segID].seq
+        row = self._get_row(segID)
+        if not self._lazy_seq:
+            return str(
+                self._seq_buffer[self._seq_offset[row] : self._seq_offset[row + 1]],
+                "ascii",
+            )
+        cache = self._seq_cache
+        if cache is not None and row in cache:
+            cache.move_to_end(row)
+            return cache[row]
+        if self._gfa_map is None:
+            with open(self._file_path, "rb") as f:
+                self._gfa_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        start = self._seq_file_offset[row]
+        seq = str(self._gfa_map[start : start + self._seq_length[row]], "ascii")
+        if cache is not None:
+            cache[row] = seq
+            if len(cache) > self._seq_cache_size:
+                cache.popitem(last=False)
+        return seq
 
     def get_source_sample(self, segID: str) -> str:
-        return self.S_line[segID].source_sample
+        return self._samples[self._sample_code[self._get_row(segID)]]
 
     def get_SRank(self, segID: str) -> int:
-        return self.S_line[segID].SRank
+        return self._SRank[self._get_row(segID)]
+
+    def get_all_Link_id(self) -> Generator[tuple[int, int, int], Any, None]:
+        """Generate all links as interned oriented nodes, without building segment ID strings
+
+        Yields:
+
+            tuple[int, int, int]: Returns a three-tuple, from node ID, to node ID, SRank in order
+        """
+        bound = len(self._row_of_num)
+        for from_key, to_key, orient, SRank in zip(
+            self._link_from, self._link_to, self._link_orient, self._link_SRank
+        ):
+            if from_key < 0:
+                from_key = bound - from_key - 1
+            if to_key < 0:
+                to_key = bound - to_key - 1
+            yield 2 * from_key + (orient & 1), 2 * to_key + (orient >> 1), SRank
+
+    def get_Link_by_rows(
+        self, rows: Iterable[int]
+    ) -> Generator[tuple[str, str, str, str, int], Any, None]:
+        """Generate the links at the given rows (their 0-based order among the L-lines), as five-tuples like `get_all_Link`"""
+        for link in rows:
+            orient = self._link_orient[link]
+            yield (
+                self._key_to_segID(self._link_from[link]),
+                "-" if orient & 1 else "+",
+                self._key_to_segID(self._link_to[link]),
+                "-" if orient & 2 else "+",
+                self._link_SRank[link],
+            )
+
+    def get_Link_id_by_rows(
+        self, rows: Iterable[int]
+    ) -> Generator[tuple[int, int, int], Any, None]:
+        """Generate the links at the given rows as interned oriented nodes, like `get_all_Link_id`"""
+        bound = len(self._row_of_num)
+        for link in rows:
+            from_key = self._link_from[link]
+            to_key = self._link_to[link]
+            orient = self._link_orient[link]
+            if from_key < 0:
+                from_key = bound - from_key - 1
+            if to_key < 0:
+                to_key = bound - to_key - 1
+            yield (
+                2 * from_key + (orient & 1),
+                2 * to_key + (orient >> 1),
+                self._link_SRank[link],
+            )
+
+    def get_file_path(self) -> Optional[str]:
+        """Return the GFA file the tables were built from, None for a Minigfa not built from a file"""
+        return self._file_path
+
+    def has_paths(self) -> bool:
+        """Return whether the W-lines and P-lines were kept (`with_paths=True`), even if the file has none"""
+        return self._with_paths
+
+    def _get_path(self, row: int) -> list[tuple[str, str]]:
+        return [
+            (self._key_to_segID(step >> 1), "-" if step & 1 else "+")
+            for step in self._path_step[
+                self._path_offset[row] : self._path_offset[row + 1]
+            ]
+        ]
+
+    def get_all_path(self) -> Generator[tuple[str, list[tuple[str, str]]], Any, None]:
+        """Generate the W-lines and P-lines in file order
+
+        Yields:
+            tuple[str, list[tuple[str, str]]]: Returns a two-tuple, path name, and the oriented segments (segID, orient) of the path
+        """
+        for row, name in enumerate(self._path_names):
+            yield name, self._get_path(row)
+
+    def get_paths_of_sample(
+        self, sample_name: str
+    ) -> Generator[list[tuple[str, str]], Any, None]:
+        """Generate the oriented segments of the paths of a sample, in file order.
+
+        A path belongs to `sample_name` if its name (`SampleId#HapIndex#SeqId` for a W-line) is `sample_name` or
+        starts with `sample_name#`, so both a sample and one of its haplotypes (`SampleId#HapIndex`) can be asked for.
+        """
+        if self._path_rows is None:
+            self._path_rows = {}
+            for row, name in enumerate(self._path_names):
+                prefixes = {name}
+                parts = name.split("#")
+                for i in range(1, len(parts)):
+                    prefixes.add("#".join(parts[:i]))
+                for prefix in prefixes:
+                    self._path_rows.setdefault(prefix, []).append(row)
+        for row in self._path_rows.get(sample_name, ()):
+            yield self._get_path(row)
 
     def get_all_Link(self) -> Generator[tuple[str, str, str, str, int], Any, None]:
         """Generate all segment meesages
@@ -113,8 +863,17 @@ class Minigfa:
 
             tuple[str, str, str, str, int]: Returns a five-tuple, fromID, fromOrient, toID,toOrient, SRank in order
         """
-        for link in self.L_line:
-            yield link.fromID, link.fromOrient, link.toID, link.toOrient, link.SRank
+        key_to_segID = self._key_to_segID
+        for from_key, to_key, orient, SRank in zip(
+            self._link_from, self._link_to, self._link_orient, self._link_SRank
+        ):
+            yield (
+                key_to_segID(from_key),
+                "-" if orient & 1 else "+",
+                key_to_segID(to_key),
+                "-" if orient & 2 else "+",
+                SRank,
+            )
 
 
 class _bedLine:
@@ -133,42 +892,114 @@ class Minibed:
        This class is iterable.Each iteration yields a five-tuple, chr_num, is_invered, segs_num, possibal_path_num,list_of_segments in order from one line in BED file.
 
        The path of the BED file that is preferably passed in when constructing the object.If you don't do this, you will just get an empty object. Please call the build_Minigfa method to construct.
+
+       The file is parsed once into arrays indexed by bubble (one bubble per BED line): chromosome codes, inversion flags,
+       and the segments of all bubbles flattened into one list with offsets, so iterating it again costs no disk I/O.
     """
 
     def __init__(self, file_path: Optional[str] = None) -> None:
         self.filePath: Optional[str] = None
+        self._chr_names: list[str] = []
+        self._chr_table: dict[str, int] = {}
+        self._chr_code = array("i")
+        self._is_inverted = bytearray()
+        self._segs_num = array("q")
+        self._possible_paths_num = array("q")
+        # Bubble i owns _segments[_seg_offset[i]:_seg_offset[i + 1]], the first is its source and the last its sink
+        self._segments: list[str] = []
+        self._seg_offset = array("q", [0])
+        # Segment ID -> first bubble listing it, and all bubbles for the segments listed by several bubbles
+        self._bubble_of_seg: dict[str, int] = {}
+        self._bubbles_of_shared_seg: dict[str, list[int]] = {}
+        # Chromosome code -> (first bubble, last bubble + 1)
+        self._chr_bubble_range: list[tuple[int, int]] = []
+        self._sources: dict[str, str] = {}
+        self._sinks: dict[str, str] = {}
         if file_path is not None:
-            self.filePath = file_path
+            self.build_Minibed(file_path)
 
     def build_Minibed(self, file_path: str) -> None:
         self.filePath = file_path
-
-    def __iter__(self) -> Generator[tuple[str, bool, int, int, list[str]], Any, None]:
-        if self.filePath is None:
-            raise TypeError("You must give Minibed a file_path")
         try:
-            with open(self.filePath, "r") as fileStream:
+            with open(file_path, "r") as fileStream:
                 for line in fileStream:
-                    temp = _bedLine(line)
-                    yield temp.chr, temp.is_inverved, temp.segs_num, temp.possible_paths_num, temp.list_of_segments
+                    if line.strip():
+                        self._add_bubble(_bedLine(line))
         except FileNotFoundError:
             print(f"Error: File '{self.filePath}' not found.")
             exit(1)
+        segments_of_chr = dict[str, list[str]]()
+        for bubble in range(len(self._chr_code)):
+            chr = self._chr_names[self._chr_code[bubble]]
+            list_of_segments = self._segments[
+                self._seg_offset[bubble] : self._seg_offset[bubble + 1]
+            ]
+            if chr in segments_of_chr:
+                segments_of_chr[chr].extend(list_of_segments)
+            else:
+                segments_of_chr[chr] = list_of_segments
+        for chr, list_of_segments in segments_of_chr.items():
+            self._sources[chr] = list_of_segments[0]
+            self._sinks[chr] = list_of_segments[-1]
+
+    def _add_bubble(self, bed_line: _bedLine) -> None:
+        bubble = len(self._chr_code)
+        code = self._chr_table.get(bed_line.chr)
+        if code is None:
+            code = len(self._chr_names)
+            self._chr_table[bed_line.chr] = code
+            self._chr_names.append(bed_line.chr)
+            self._chr_bubble_range.append((bubble, bubble + 1))
+        else:
+            self._chr_bubble_range[code] = (self._chr_bubble_range[code][0], bubble + 1)
+        self._chr_code.append(code)
+        self._is_inverted.append(bed_line.is_inverved)
+        self._segs_num.append(bed_line.segs_num)
+        self._possible_paths_num.append(bed_line.possible_paths_num)
+        for segID in bed_line.list_of_segments:
+            first = self._bubble_of_seg.setdefault(segID, bubble)
+            if first != bubble:
+                shared = self._bubbles_of_shared_seg.setdefault(segID, [first])
+                if shared[-1] != bubble:
+                    shared.append(bubble)
+        self._segments.extend(bed_line.list_of_segments)
+        self._seg_offset.append(len(self._segments))
+
+    def __len__(self) -> int:
+        return len(self._chr_code)
+
+    def __iter__(self) -> Generator[tuple[str, bool, int, int, list[str]], Any, None]:
+        if self.filePath is None:
+            raise TypeError("You must give Minibed a file_path")
+        for bubble in range(len(self._chr_code)):
+            yield self.get_bubble(bubble)
+
+    def get_bubble(self, bubble: int) -> tuple[str, bool, int, int, list[str]]:
+        """Return the five-tuple of the `bubble`-th BED line, like an iteration does"""
+        return (
+            self._chr_names[self._chr_code[bubble]],
+            bool(self._is_inverted[bubble]),
+            self._segs_num[bubble],
+            self._possible_paths_num[bubble],
+            self._segments[self._seg_offset[bubble] : self._seg_offset[bubble + 1]],
+        )
+
+    def get_bubbles_of_segment(self, segID: str) -> list[int]:
+        """Return the indices of the bubbles (BED lines) listing a segment, usually one, two for the source or sink shared by adjacent bubbles"""
+        if segID in self._bubbles_of_shared_seg:
+            return self._bubbles_of_shared_seg[segID]
+        bubble = self._bubble_of_seg.get(segID)
+        return [] if bubble is None else [bubble]
+
+    def get_chr_bubble_range(self, chr: str) -> range:
+        """Return the range of bubble indices from the first to the last bubble of a chromosome"""
+        code = self._chr_table.get(chr)
+        if code is None:
+            return range(0)
+        return range(*self._chr_bubble_range[code])
 
-    @cache
     def get_linear_sources_and_sinks(self) -> tuple[dict[str, str], dict[str, str]]:
-        bed_line = dict[str, list[str]]()
-        sources = dict[str, str]()
-        sinks = dict[str, str]()
-        for chr, _, _, _, list_of_Segment in self:
-            if chr in bed_line.keys():
-                bed_line[chr].extend(list_of_Segment)
-            else:
-                bed_line[chr] = list_of_Segment
-        for chr_and_bedLine in bed_line.items():
-            sources[chr_and_bedLine[0]] = chr_and_bedLine[1][0]
-            sinks[chr_and_bedLine[0]] = chr_and_bedLine[1][-1]
-        return sources, sinks
+        return self._sources, self._sinks
 
 
 if __name__ == "__main__":
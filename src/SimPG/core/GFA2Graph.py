@@ -1,21 +1,25 @@
 """Parse the GFA file,get the Pangenome graph"""
 
-import pickle
 import networkx as nx
 from . import logger
+from array import array
 from collections import Counter, deque
-from typing import Optional
+from concurrent.futures import ProcessPoolExecutor
+from itertools import count
+from typing import Iterable, Optional, Union
 from ..classes import Minigfa, Minibed
+from ..graph import CSRGraph, number_weakly_connected_components, save_graph
 import os
 import time
 
 __all__ = ["turn_GFA_to_DiGraph"]
 
+_ORIENT_BIT = {"+": 1, "-": 2}
+
 
 def _save_graph(graph, s: str) -> None:
-    """Save a graph in pickle format"""
-    with open(s, "wb") as f:
-        pickle.dump(graph, f)
+    """Save a graph as a snapshot, see `save_graph`"""
+    save_graph(graph, s)
 
 
 def _save_to_tmp(content, filename: str) -> str:
@@ -30,9 +34,8 @@ def _save_to_tmp(content, filename: str) -> str:
     os.makedirs(tmp_dir, exist_ok=True)
     # Construct the full path of the file
     file_path = os.path.join(tmp_dir, filename)
-    # Open the file and write the content (if the file does not exist, create a new one, if it exists, overwrite it)
-    with open(file_path, "wb") as f:
-        pickle.dump(content, f)
+    # Write the graph snapshot (if the file does not exist, create a new one, if it exists, overwrite it)
+    save_graph(content, file_path)
     return file_path
 
 
@@ -57,24 +60,103 @@ def _generate_sequence(start_str, end_str) -> list[tuple[str, str]]:
     return seq
 
 
-def _turn_GFA_to_DiGraph_complex(
-    gfa_message: Minigfa, bed_message: Minibed
-) -> nx.DiGraph:
-    """turn GFA to DiGraph with bed message
-
-    Args:
-        gfa_message (Minigfa): GFA data message
-        bed_message (Minibed): Bed data message
+def _prune_dangling_ends(
+    G: nx.DiGraph, keep_sources: set[tuple[str, str]], keep_sinks: set[tuple[str, str]]
+) -> dict[tuple[str, str], str]:
+    """Remove the nodes with zero in-degree other than `keep_sources`, then the nodes with zero out-degree other than `keep_sinks`,
+    including the chains left dangling by each removal.
 
     Returns:
-        nx.DiGraph:Pan-genome graph structure(from 5' to 3' we think)
+        dict[tuple[str, str], str]: Every removed node, with "source" or "sink"
     """
+    pruned: dict[tuple[str, str], str] = {}
+    for reason, degree, neighbours, keep in (
+        ("source", G.in_degree, G.successors, keep_sources),
+        ("sink", G.out_degree, G.predecessors, keep_sinks),
+    ):
+        degree_left = dict(degree())
+        queue = deque(n for n, d in degree_left.items() if d == 0 and n not in keep)
+        removed = 0
+        while queue:
+            n = queue.popleft()
+            for m in neighbours(n):
+                degree_left[m] -= 1
+                if degree_left[m] == 0 and m not in keep:
+                    queue.append(m)
+            G.remove_node(n)
+            pruned[n] = reason
+            removed += 1
+        logger.debug(f"Pruned {removed} dangling {reason} nodes")
+    return pruned
+
+
+class _BedLayout:
+    """Positions of the BED segments, shared by every part of the complex build"""
+
+    def __init__(self, gfa_message: Minigfa, bed_message: Minibed) -> None:
+
+        def find_twice(strings):
+            # Count the number of times all strings appear
+            cnt = Counter(strings)
+            # Only keep strings that occur 2 times
+            return [s for s, c in cnt.items() if c >= 2]
+
+        self.sources, self.sinks = bed_message.get_linear_sources_and_sinks()
+        last_key = next(reversed(self.sinks))
+        last_value = self.sinks[last_key]
+        self.last_linear_int = gfa_message.get_segment_id(last_value)
+        # (bubble, chromosome, segID) of the segments listed twice in an inverted bubble, in BED order
+        self.double_segments: list[tuple[int, str, str]] = []
+        # Chromosome of every BED segment, and the pairs of chromosomes sharing a segment
+        self.chr_of_segment: dict[str, str] = {}
+        self.joined_chromosomes: set[tuple[str, str]] = set()
+        all_bedline_list: list[str] = []
+        last_chr = object()
+        for bubble, (chr, is_inverved, _, _, seg_in_bubble) in enumerate(bed_message):
+            cur_chr = chr
+            if last_chr != cur_chr:
+                all_bedline_list.append(self.sources[chr])
+                self._set_chromosome(self.sources[chr], chr)
+                last_chr = cur_chr
+            all_bedline_list.extend(seg_in_bubble[1:])
+            for segname in seg_in_bubble[1:]:
+                self._set_chromosome(segname, chr)
+            if is_inverved:
+                for segname in find_twice(seg_in_bubble):
+                    self.double_segments.append((bubble, chr, segname))
+        self.double_set = {segname for _, _, segname in self.double_segments}
+        self.all_bedline_set = set(all_bedline_list)
+        self.first_pos: dict[str, int] = {}
+        self.last_pos: dict[str, int] = {}
+        for idx, x in enumerate(all_bedline_list):
+            # If it appears for the first time, record first_pos
+            self.first_pos.setdefault(x, idx)
+            # Update last_pos each time, and the final one is the "last time"
+            self.last_pos[x] = idx
+
+    def _set_chromosome(self, segname: str, chr: str) -> None:
+        first = self.chr_of_segment.setdefault(segname, chr)
+        if first != chr:
+            self.joined_chromosomes.add((first, chr))
+
+
+def _build_complex_part(
+    gfa_message: Minigfa,
+    layout: _BedLayout,
+    chromosomes: list[str],
+    links: Iterable[tuple[int, tuple, tuple]],
+    record_order: bool = False,
+) -> tuple[nx.DiGraph, list[tuple[int, tuple]], Optional[dict], Optional[dict]]:
+    """Build the graph of some chromosomes from their links, given as (row, `get_all_Link` tuple, `get_all_Link_id` tuple) in file order.
 
-    def find_twice(strings):
-        # Count the number of times all strings appear
-        cnt = Counter(strings)
-        # Only keep strings that occur 2 times
-        return [s for s, c in cnt.items() if c >= 2]
+    Every link is oriented in one pass. The orientations a segment already has in the graph are kept as a bitmask indexed by its interned ID.
+    A link between a segment of an inverted bubble and a segment that has no orientation yet, and whose first and last positions in the BED leave the order open,
+    waits for the end of the pass and is then placed next to the orientation its other segment got.
+
+    Returns:
+        The graph, the (row, link) of the links that still have nothing to follow, and with `record_order` the creation key of every node and edge,
+        which orders them like a build of all chromosomes at once.
+    """
 
     def double_pass_one(seg_in_double, seg_not_in):
         if first_pos[seg_not_in] < first_pos[seg_in_double]:
@@ -88,384 +170,305 @@ def _turn_GFA_to_DiGraph_complex(
         return "+" if one_orient == "-" else "-"
 
     G = nx.DiGraph()
-    sources: dict[str, str] = {}
-    sinks: dict[str, str] = {}
-    sources, sinks = bed_message.get_linear_sources_and_sinks()
-    last_key = next(reversed(sinks))
-    last_value = sinks[last_key]
-    last_linear_int = int(last_value[1:])
-    sum = 0
-    sum_double: list[str] = []
-    all_bedline_list: list[str] = []
-    for chr in sinks.keys():
+    # Orientations of every segment present in G, bit 1 for "+" and bit 2 for "-"
+    orient_bits = bytearray(gfa_message.get_segment_id_bound())
+    # Creation keys (phase, chromosome / bubble / link row, sequence number)
+    node_key: Optional[dict] = {} if record_order else None
+    edge_key: Optional[dict] = {} if record_order else None
+    stage = (0, 0)
+
+    def new_node(label, SR):
+        if node_key is not None and label not in node_key:
+            node_key[label] = (*stage, len(node_key))
+        G.add_node(label, SR=SR)
+
+    def add_node(segID, seg, orient):
+        new_node((segID, orient), gfa_message.get_SRank(segID))
+        orient_bits[seg] |= _ORIENT_BIT[orient]
+
+    def add_edge(u, u_seg, v, v_seg, SRi):
+        if node_key is not None:
+            for label in (u, v):
+                if label not in node_key:
+                    node_key[label] = (*stage, len(node_key))
+            if (u, v) not in edge_key:
+                edge_key[(u, v)] = (*stage, len(edge_key))
+        G.add_edge(u, v, SR=SRi, weight=0)
+        orient_bits[u_seg] |= _ORIENT_BIT[u[1]]
+        orient_bits[v_seg] |= _ORIENT_BIT[v[1]]
+
+    def has_orient(seg, orient):
+        return orient_bits[seg] & _ORIENT_BIT[orient]
+
+    def place(link, forward, add_from, add_to):
+        """Add a link as (from, fromOrient) -> (to, toOrient), or as its reverse complement if not `forward`"""
+        from_id, from_orient, to_id, to_orient, SRi, from_seg, to_seg = link
+        if not forward:
+            from_orient = reverse_orient(from_orient)
+            to_orient = reverse_orient(to_orient)
+        if add_from:
+            add_node(from_id, from_seg, from_orient)
+        if add_to:
+            add_node(to_id, to_seg, to_orient)
+        if forward:
+            add_edge((from_id, from_orient), from_seg, (to_id, to_orient), to_seg, SRi)
+        else:
+            add_edge((to_id, to_orient), to_seg, (from_id, from_orient), from_seg, SRi)
+
+    sources, sinks = layout.sources, layout.sinks
+    last_linear_int = layout.last_linear_int
+    sum_double_set = layout.double_set
+    all_bedline_set = layout.all_bedline_set
+    first_pos = layout.first_pos
+    last_pos = layout.last_pos
+    chr_order = {chr: idx for idx, chr in enumerate(sinks)}
+    chromosome_set = set(chromosomes)
+    for chr in chromosomes:
+        stage = (0, chr_order[chr])
         temp_list = _generate_sequence(sources[chr], sinks[chr])
         for u, v in zip(temp_list[:-1], temp_list[1:]):
-            G.add_node(u, SR=0)
-            G.add_node(v, SR=0)
-            G.add_edge(u, v, SR=0, weight=0)
-    last_chr = object()
-    for chr, is_inverved, _, _, seg_in_bubble in bed_message:
-        cur_chr = chr
-        if last_chr != cur_chr:
-            all_bedline_list.append(sources[chr])
-            last_chr = cur_chr
-        all_bedline_list.extend(seg_in_bubble[1:])
-        if is_inverved:
-            temp = find_twice(seg_in_bubble)
-            for segname in temp:
-                if int(segname[1:]) > last_linear_int:
-                    sum += 1
-                sum_double.extend(temp)
-                G.add_node((segname, "+"), SR=gfa_message.get_SRank(segname))
-                G.add_node((segname, "-"), SR=gfa_message.get_SRank(segname))
-    sum_double_set = set(sum_double)
-    all_bedline_set = set(all_bedline_list)
-    first_pos = {}
-    last_pos = {}
-    for idx, x in enumerate(all_bedline_list):
-        # If it appears for the first time, record first_pos
-        first_pos.setdefault(x, idx)
-        # Update last_pos each time, and the final one is the "last time"
-        last_pos[x] = idx
+            u_seg = gfa_message.get_segment_id(u[0])
+            v_seg = gfa_message.get_segment_id(v[0])
+            new_node(u, 0)
+            new_node(v, 0)
+            add_edge(u, u_seg, v, v_seg, 0)
+    for bubble, chr, segname in layout.double_segments:
+        if chr in chromosome_set:
+            stage = (1, bubble)
+            seg = gfa_message.get_segment_id(segname)
+            add_node(segname, seg, "+")
+            add_node(segname, seg, "-")
 
     num = 0
-    cache_link = deque()
-    for from_id, from_orient, to_id, to_orient, SRi in gfa_message.get_all_Link():
+    # Links waiting for the orientation of their non-inverted segment, with True if that segment is the "to" end
+    pending_links: list[tuple[int, tuple, bool]] = []
+    for (
+        row,
+        (from_id, from_orient, to_id, to_orient, SRi),
+        (
+            from_node,
+            to_node,
+            _,
+        ),
+    ) in links:
+        # Interned segment IDs, linear reference segments are numbered up to last_linear_int
+        from_seg = from_node >> 1
+        to_seg = to_node >> 1
         num += 1
         if num % 200000 == 0:
             logger.debug(f"Already finish {num} Links")
         if from_id not in all_bedline_set or to_id not in all_bedline_set:
             continue
-        if from_id in sum_double_set and to_id in sum_double_set:
-            G.add_node((from_id, from_orient), SR=gfa_message.get_SRank(from_id))
-            G.add_node((to_id, to_orient), SR=gfa_message.get_SRank(to_id))
-            G.add_node(
-                (from_id, reverse_orient(from_orient)),
-                SR=gfa_message.get_SRank(from_id),
-            )
-            G.add_node(
-                (to_id, reverse_orient(to_orient)), SR=gfa_message.get_SRank(to_id)
-            )
-            G.add_edge(
-                (from_id, from_orient),
-                (to_id, to_orient),
-                SR=SRi,
-                weight=0,
-            )
-            G.add_edge(
-                (to_id, reverse_orient(to_orient)),
-                (from_id, reverse_orient(from_orient)),
-                SR=SRi,
-                weight=0,
-            )
-        elif from_id not in sum_double_set and to_id not in sum_double_set:
-            if int(from_id[1:]) <= last_linear_int:
-                if from_orient == "+":
-                    G.add_node((to_id, to_orient), SR=gfa_message.get_SRank(to_id))
-                    G.add_edge(
-                        (from_id, from_orient),
-                        (to_id, to_orient),
-                        SR=SRi,
-                        weight=0,
-                    )
-                if from_orient == "-":
-                    G.add_node(
-                        (to_id, reverse_orient(to_orient)),
-                        SR=gfa_message.get_SRank(to_id),
-                    )
-                    G.add_edge(
-                        (to_id, reverse_orient(to_orient)),
-                        (from_id, reverse_orient(from_orient)),
-                        SR=SRi,
-                        weight=0,
-                    )
-            elif int(to_id[1:]) <= last_linear_int:
-                if to_orient == "+":
-                    G.add_node(
-                        (from_id, from_orient), SR=gfa_message.get_SRank(from_id)
-                    )
-                    G.add_edge(
-                        (from_id, from_orient),
-                        (to_id, to_orient),
-                        SR=SRi,
-                        weight=0,
-                    )
-                if to_orient == "-":
-                    G.add_node(
-                        (from_id, reverse_orient(from_orient)),
-                        SR=gfa_message.get_SRank(from_id),
-                    )
-                    G.add_edge(
-                        (to_id, reverse_orient(to_orient)),
-                        (from_id, reverse_orient(from_orient)),
-                        SR=SRi,
-                        weight=0,
-                    )
+        stage = (2, row)
+        link = (from_id, from_orient, to_id, to_orient, SRi, from_seg, to_seg)
+        from_double = from_id in sum_double_set
+        to_double = to_id in sum_double_set
+        if from_double and to_double:
+            add_node(from_id, from_seg, from_orient)
+            add_node(to_id, to_seg, to_orient)
+            add_node(from_id, from_seg, reverse_orient(from_orient))
+            add_node(to_id, to_seg, reverse_orient(to_orient))
+            place(link, True, False, False)
+            place(link, False, False, False)
+        elif not from_double and not to_double:
+            if from_seg <= last_linear_int:
+                place(link, from_orient == "+", False, True)
+            elif to_seg <= last_linear_int:
+                place(link, to_orient == "+", True, False)
+            elif has_orient(from_seg, from_orient) or has_orient(to_seg, to_orient):
+                place(link, True, True, True)
+            elif has_orient(from_seg, reverse_orient(from_orient)) or has_orient(
+                to_seg, reverse_orient(to_orient)
+            ):
+                place(link, False, True, True)
             else:
-                if (from_id, from_orient) in G or (to_id, to_orient) in G:
-                    G.add_node(
-                        (from_id, from_orient), SR=gfa_message.get_SRank(from_id)
-                    )
-                    G.add_node((to_id, to_orient), SR=gfa_message.get_SRank(to_id))
-                    G.add_edge(
-                        (from_id, from_orient),
-                        (to_id, to_orient),
-                        SR=SRi,
-                        weight=0,
-                    )
-                elif (from_id, reverse_orient(from_orient)) in G or (
-                    to_id,
-                    reverse_orient(to_orient),
-                ) in G:
-                    G.add_node(
-                        (from_id, reverse_orient(from_orient)),
-                        SR=gfa_message.get_SRank(from_id),
-                    )
-                    G.add_node(
-                        (to_id, reverse_orient(to_orient)),
-                        SR=gfa_message.get_SRank(to_id),
-                    )
-                    G.add_edge(
-                        (to_id, reverse_orient(to_orient)),
-                        (from_id, reverse_orient(from_orient)),
-                        SR=SRi,
-                        weight=0,
-                    )
+                place(link, first_pos[from_id] < first_pos[to_id], True, True)
+        elif from_double:
+            if to_seg <= last_linear_int:
+                place(link, to_orient == "+", False, False)
+            elif has_orient(to_seg, to_orient):
+                place(link, True, False, False)
+            elif has_orient(to_seg, reverse_orient(to_orient)):
+                place(link, False, False, False)
+            else:
+                flag = double_pass_one(from_id, to_id)
+                if flag == 0:
+                    pending_links.append((row, link, True))
                 else:
-                    # cache_link.append((from_id, from_orient, to_id, to_orient, SRi, 0))
-                    # logging.info(f"error!{from_id} to {to_id}")
-                    if first_pos[from_id] < first_pos[to_id]:
-                        G.add_node(
-                            (from_id, from_orient), SR=gfa_message.get_SRank(from_id)
-                        )
-                        G.add_node((to_id, to_orient), SR=gfa_message.get_SRank(to_id))
-                        G.add_edge(
-                            (from_id, from_orient),
-                            (to_id, to_orient),
-                            SR=SRi,
-                            weight=0,
-                        )
-                    else:
-                        G.add_node(
-                            (from_id, reverse_orient(from_orient)),
-                            SR=gfa_message.get_SRank(from_id),
-                        )
-                        G.add_node(
-                            (to_id, reverse_orient(to_orient)),
-                            SR=gfa_message.get_SRank(to_id),
-                        )
-                        G.add_edge(
-                            (to_id, reverse_orient(to_orient)),
-                            (from_id, reverse_orient(from_orient)),
-                            SR=SRi,
-                            weight=0,
-                        )
-
+                    place(link, flag == -1, False, True)
         else:
-            if from_id in sum_double:
-                if int(to_id[1:]) <= last_linear_int:
-                    if to_orient == "+":
-                        G.add_edge(
-                            (from_id, from_orient),
-                            (to_id, to_orient),
-                            SR=SRi,
-                            weight=0,
-                        )
-                        continue
-                    elif to_orient == "-":
-                        G.add_edge(
-                            (to_id, reverse_orient(to_orient)),
-                            (from_id, reverse_orient(from_orient)),
-                            SR=SRi,
-                            weight=0,
-                        )
-                        continue
-                else:
-                    if (to_id, to_orient) in G:
-                        G.add_edge(
-                            (from_id, from_orient),
-                            (to_id, to_orient),
-                            SR=SRi,
-                            weight=0,
-                        )
-                    elif (to_id, reverse_orient(to_orient)) in G:
-                        G.add_edge(
-                            (to_id, reverse_orient(to_orient)),
-                            (from_id, reverse_orient(from_orient)),
-                            SR=SRi,
-                            weight=0,
-                        )
-                    else:
-                        flag = double_pass_one(from_id, to_id)
-                        if flag == 1:
-                            G.add_node(
-                                (to_id, reverse_orient(to_orient)),
-                                SR=gfa_message.get_SRank(to_id),
-                            )
-                            G.add_edge(
-                                (to_id, reverse_orient(to_orient)),
-                                (from_id, reverse_orient(from_orient)),
-                                SR=SRi,
-                                weight=0,
-                            )
-                        elif flag == -1:
-                            G.add_node(
-                                (to_id, to_orient),
-                                SR=gfa_message.get_SRank(to_id),
-                            )
-                            G.add_edge(
-                                (from_id, from_orient),
-                                (to_id, to_orient),
-                                SR=SRi,
-                                weight=0,
-                            )
-                        elif flag == 0:
-                            cache_link.append(
-                                (from_id, from_orient, to_id, to_orient, SRi, 1)
-                            )
-            elif to_id in sum_double:
-                if int(from_id[1:]) <= last_linear_int:
-                    if from_orient == "+":
-                        G.add_edge(
-                            (from_id, from_orient),
-                            (to_id, to_orient),
-                            SR=SRi,
-                            weight=0,
-                        )
-                        continue
-                    elif from_orient == "-":
-                        G.add_edge(
-                            (to_id, reverse_orient(to_orient)),
-                            (from_id, reverse_orient(from_orient)),
-                            SR=SRi,
-                            weight=0,
-                        )
-                        continue
-                else:
-                    if (from_id, from_orient) in G:
-                        G.add_edge(
-                            (from_id, from_orient),
-                            (to_id, to_orient),
-                            SR=SRi,
-                            weight=0,
-                        )
-                    elif (from_id, reverse_orient(from_orient)) in G:
-                        G.add_edge(
-                            (to_id, reverse_orient(to_orient)),
-                            (from_id, reverse_orient(from_orient)),
-                            SR=SRi,
-                            weight=0,
-                        )
-                    else:
-                        flag = double_pass_one(to_id, from_id)
-                        if flag == 1:
-                            G.add_node(
-                                (from_id, from_orient),
-                                SR=gfa_message.get_SRank(from_id),
-                            )
-                            G.add_edge(
-                                (from_id, from_orient),
-                                (to_id, to_orient),
-                                SR=SRi,
-                                weight=0,
-                            )
-                        elif flag == -1:
-                            G.add_node(
-                                (from_id, reverse_orient(from_orient)),
-                                SR=gfa_message.get_SRank(from_id),
-                            )
-                            G.add_edge(
-                                (to_id, reverse_orient(to_orient)),
-                                (from_id, reverse_orient(from_orient)),
-                                SR=SRi,
-                                weight=0,
-                            )
-                        elif flag == 0:
-                            cache_link.append(
-                                (from_id, from_orient, to_id, to_orient, SRi, 2)
-                            )
-    last_n = 0
-    while cache_link:
-        n = len(cache_link)  # The number of original elements in this round
-        if last_n == n:
-            break
-        for _ in range(n):
-            link = cache_link.popleft()
-            from_id, from_orient, to_id, to_orient, SRi, flag = link
-            if flag == 0:
-                if (from_id, from_orient) in G or (to_id, to_orient) in G:
-                    G.add_edge(
-                        (from_id, from_orient),
-                        (to_id, to_orient),
-                        SR=SRi,
-                        weight=0,
-                    )
-                elif (from_id, reverse_orient(from_orient)) in G or (
-                    to_id,
-                    reverse_orient(to_orient),
-                ) in G:
-                    G.add_edge(
-                        (to_id, reverse_orient(to_orient)),
-                        (from_id, reverse_orient(from_orient)),
-                        SR=SRi,
-                        weight=0,
-                    )
-                else:
-                    cache_link.append(link)
-            if flag == 1:
-                if (to_id, to_orient) in G:
-                    G.add_edge(
-                        (from_id, from_orient),
-                        (to_id, to_orient),
-                        SR=SRi,
-                        weight=0,
-                    )
-                elif (to_id, reverse_orient(to_orient)) in G:
-                    G.add_edge(
-                        (to_id, reverse_orient(to_orient)),
-                        (from_id, reverse_orient(from_orient)),
-                        SR=SRi,
-                        weight=0,
-                    )
-                else:
-                    cache_link.append(link)
-            if flag == 2:
-                if (from_id, from_orient) in G:
-                    G.add_edge(
-                        (from_id, from_orient),
-                        (to_id, to_orient),
-                        SR=SRi,
-                        weight=0,
-                    )
-                elif (from_id, reverse_orient(from_orient)) in G:
-                    G.add_edge(
-                        (to_id, reverse_orient(to_orient)),
-                        (from_id, reverse_orient(from_orient)),
-                        SR=SRi,
-                        weight=0,
-                    )
+            if from_seg <= last_linear_int:
+                place(link, from_orient == "+", False, False)
+            elif has_orient(from_seg, from_orient):
+                place(link, True, False, False)
+            elif has_orient(from_seg, reverse_orient(from_orient)):
+                place(link, False, False, False)
+            else:
+                flag = double_pass_one(to_id, from_id)
+                if flag == 0:
+                    pending_links.append((row, link, False))
                 else:
-                    cache_link.append(link)
-        last_n = n
-        logger.info(
-            f"This round of processing is completed, a total of {n} edges, and the next round is about to begin"
+                    place(link, flag == 1, True, False)
+    # Placing a waiting link adds no orientation, so one pass over them sees the final orientations
+    unresolved_links = []
+    for row, link, wait_for_to in pending_links:
+        stage = (3, row)
+        from_id, from_orient, to_id, to_orient, SRi, from_seg, to_seg = link
+        seg, orient = (to_seg, to_orient) if wait_for_to else (from_seg, from_orient)
+        if has_orient(seg, orient):
+            place(link, True, False, False)
+        elif has_orient(seg, reverse_orient(orient)):
+            place(link, False, False, False)
+        else:
+            unresolved_links.append(
+                (row, (from_id, from_orient, to_id, to_orient, SRi))
+            )
+    return G, unresolved_links, node_key, edge_key
+
+
+# Inputs of the parallel build, inherited by (or sent once to) every worker process
+_complex_worker_state: Optional[tuple[Minigfa, _BedLayout]] = None
+
+
+def _init_complex_worker(gfa_message: Minigfa, layout: _BedLayout) -> None:
+    global _complex_worker_state
+    _complex_worker_state = (gfa_message, layout)
+
+
+def _build_complex_group(
+    chromosomes: list[str], rows: array
+) -> tuple[list, list, list]:
+    """Worker of the parallel build, build the graph of a group of chromosomes and return it as lists of keyed nodes and edges"""
+    gfa_message, layout = _complex_worker_state
+    links = zip(
+        rows, gfa_message.get_Link_by_rows(rows), gfa_message.get_Link_id_by_rows(rows)
+    )
+    G, unresolved_links, node_key, edge_key = _build_complex_part(
+        gfa_message, layout, chromosomes, links, record_order=True
+    )
+    nodes = [(node_key[n], n, attrs.get("SR")) for n, attrs in G.nodes(data=True)]
+    edges = [
+        (edge_key[(u, v)], u, v, attrs["SR"]) for u, v, attrs in G.edges(data=True)
+    ]
+    return nodes, edges, unresolved_links
+
+
+def _group_chromosomes(
+    gfa_message: Minigfa, layout: _BedLayout
+) -> list[tuple[list[str], array]]:
+    """Partition the chromosomes into groups no link crosses, with the rows of the links of each group.
+
+    Chromosomes are independent unless a link or a segment is shared between them, such chromosomes are built together.
+    """
+    chromosomes = list(layout.sinks)
+    parent = list(range(len(chromosomes)))
+
+    def find(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    chr_code = {chr: idx for idx, chr in enumerate(chromosomes)}
+    chr_of_seg = array("i", [-1]) * gfa_message.get_segment_id_bound()
+    for segname, chr in layout.chr_of_segment.items():
+        try:
+            seg = gfa_message.get_segment_id(segname)
+        except KeyError:
+            # Not in the GFA file, so in no link
+            continue
+        chr_of_seg[seg] = chr_code[chr]
+    for a, b in layout.joined_chromosomes:
+        parent[find(chr_code[a])] = find(chr_code[b])
+    link_rows = array("q")
+    link_chr = array("i")
+    for row, (from_node, to_node, _) in enumerate(gfa_message.get_all_Link_id()):
+        a = chr_of_seg[from_node >> 1]
+        b = chr_of_seg[to_node >> 1]
+        if a < 0 or b < 0:
+            continue
+        if a != b:
+            parent[find(a)] = find(b)
+        link_rows.append(row)
+        link_chr.append(a)
+    groups: dict[int, tuple[list[str], array]] = {}
+    for idx, chr in enumerate(chromosomes):
+        groups.setdefault(find(idx), ([], array("q")))[0].append(chr)
+    for row, code in zip(link_rows, link_chr):
+        groups[find(code)][1].append(row)
+    return list(groups.values())
+
+
+def _build_complex_parallel(
+    gfa_message: Minigfa, layout: _BedLayout, workers: int
+) -> tuple[nx.DiGraph, list[tuple[int, tuple]]]:
+    """Build the groups of chromosomes in worker processes and stitch them, ordering nodes and edges by their creation keys"""
+    groups = _group_chromosomes(gfa_message, layout)
+    logger.info(
+        f"Build {len(layout.sinks)} chromosomes as {len(groups)} independent groups in {min(workers, len(groups))} processes"
+    )
+    # Largest groups first, so that they do not end up last on a busy worker
+    groups.sort(key=lambda group: len(group[1]), reverse=True)
+    nodes, edges, unresolved = [], [], []
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(groups)),
+        initializer=_init_complex_worker,
+        initargs=(gfa_message, layout),
+    ) as executor:
+        for part_nodes, part_edges, part_unresolved in executor.map(
+            _build_complex_group,
+            [chromosomes for chromosomes, _ in groups],
+            [rows for _, rows in groups],
+        ):
+            nodes.extend(part_nodes)
+            edges.extend(part_edges)
+            unresolved.extend(part_unresolved)
+    nodes.sort(key=lambda x: x[0])
+    edges.sort(key=lambda x: x[0])
+    unresolved.sort(key=lambda x: x[0])
+    G = nx.DiGraph()
+    G.add_nodes_from((n, {} if SR is None else {"SR": SR}) for _, n, SR in nodes)
+    G.add_edges_from((u, v, {"SR": SR, "weight": 0}) for _, u, v, SR in edges)
+    return G, unresolved
+
+
+def _turn_GFA_to_DiGraph_complex(
+    gfa_message: Minigfa, bed_message: Minibed, workers: int = 1
+) -> nx.DiGraph:
+    """turn GFA to DiGraph with bed message
+
+    Links that cannot be oriented are reported in `G.graph["unresolved_links"]`.
+    With `workers` > 1, groups of chromosomes no link crosses are built in worker processes and stitched in the order of a serial build.
+
+    Args:
+        gfa_message (Minigfa): GFA data message
+        bed_message (Minibed): Bed data message
+        workers (int, optional): Number of worker processes. Defaults to 1.
+
+    Returns:
+        nx.DiGraph:Pan-genome graph structure(from 5' to 3' we think)
+    """
+    layout = _BedLayout(gfa_message, bed_message)
+    if workers > 1 and len(layout.sinks) > 1:
+        G, unresolved = _build_complex_parallel(gfa_message, layout, workers)
+    else:
+        G, unresolved, _, _ = _build_complex_part(
+            gfa_message,
+            layout,
+            list(layout.sinks),
+            zip(count(), gfa_message.get_all_Link(), gfa_message.get_all_Link_id()),
         )
-    if len(cache_link) > 0:
-        logger.warning(f"cache_link remaining:{[(x[0],x[2]) for x in cache_link]}")
-    sources_graph = [n for n in G.nodes() if G.in_degree(n) == 0]
-    sinks_graph = [n for n in G.nodes() if G.out_degree(n) == 0]
-    chrNum = len(sources.keys())
-    while len(sources_graph) > chrNum:
-        for x in sources_graph[chrNum:]:
-            G.remove_node(x)
-        sources_graph = [n for n in G.nodes() if G.in_degree(n) == 0]
-        logger.debug(sources_graph)
-    sinks_graph = [n for n in G.nodes() if G.out_degree(n) == 0]
-    while len(sinks_graph) > chrNum:
-        for x in sinks_graph[chrNum:]:
-            G.remove_node(x)
-        sinks_graph = [n for n in G.nodes() if G.out_degree(n) == 0]
-        logger.debug(sinks_graph)
+    unresolved_links = [link for _, link in unresolved]
+    if len(unresolved_links) > 0:
+        logger.warning(
+            f"{len(unresolved_links)} links can not be oriented:{[(x[0], x[2]) for x in unresolved_links]}"
+        )
+    G.graph["unresolved_links"] = unresolved_links
+    G.graph["pruned_nodes"] = _prune_dangling_ends(
+        G,
+        keep_sources={(segID, "+") for segID in layout.sources.values()},
+        keep_sinks={(segID, "+") for segID in layout.sinks.values()},
+    )
     return G
 
 
@@ -496,7 +499,9 @@ def turn_GFA_to_DiGraph(
     is_output_inspection_results_in_graph: bool = False,
     is_saved_as_pickle: bool = False,
     file_path: Optional[str] = None,
-) -> nx.DiGraph:
+    graph_engine: str = "networkx",
+    workers: int = 1,
+) -> Union[nx.DiGraph, CSRGraph]:
     """
     Convert the GFA file information and Bed file information (optional, if default, you may find some loops or paths that should not exist in your graph) into a directed graph.
     You can choose whether to output the key parameter information of the graph and whether to save it.
@@ -506,31 +511,40 @@ def turn_GFA_to_DiGraph(
         gfa_maessage (Minigfa): Composite data storing GFA file information
         bed_message (Minibed | None, optional): Composite data storing Bed file information. Defaults to None.
         is_output_inspection_results (bool, optional): Whether to output the key parameters of the graph to stdout. Defaults to False.
-        is_saved_as_pickle (bool, optional): Whether to save as a pickle file for reuse. Defaults to False.
-        file_path (str | None, optional): If you choose to save as a pickle file,the graph will be saved in `file_path`. By default, the file name will be `myMinigraph.pl` in folder /tmp under your working folder.
+        is_saved_as_pickle (bool, optional): Whether to save the graph as a snapshot for reuse, reopen it with `load_graph`. Defaults to False.
+        file_path (str | None, optional): If you choose to save the graph,the snapshot will be saved in `file_path`. By default, the file name will be `myMinigraph.spg` in folder /tmp under your working folder.
+        graph_engine (str, optional): "networkx" returns a networkx.DiGraph, "csr" returns the compact array-backed `CSRGraph`. Defaults to "networkx".
+        workers (int, optional): With `bed_message`, build groups of chromosomes that no link crosses in this many processes. The graph is identical to the serial build. Defaults to 1.
+
+    Raises:
+        ValueError: Unknown `graph_engine`.
 
     Returns:
-        DiGraph: Directed graph representing the pan-genome.We think direction is 5' end to 3' end as you follow the diagram,and the ID of each node is a tuple, the first element is the ID of the segment in GFA, and the second element is the symbol "+" or "-". "-" represents the reverse complementary sequence of the connected segment sequence
+        DiGraph | CSRGraph: Directed graph representing the pan-genome.We think direction is 5' end to 3' end as you follow the diagram,and the ID of each node is a tuple, the first element is the ID of the segment in GFA, and the second element is the symbol "+" or "-". "-" represents the reverse complementary sequence of the connected segment sequence
     """
+    if graph_engine not in ("networkx", "csr"):
+        raise ValueError(f"Unknown graph_engine {graph_engine!r}")
     starttime = time.time()
     if bed_message is None:
         Minigraph = _turn_GFA_to_DiGraph_simple(gfa_message)
     elif bed_message is not None:
-        Minigraph = _turn_GFA_to_DiGraph_complex(gfa_message, bed_message)
+        Minigraph = _turn_GFA_to_DiGraph_complex(gfa_message, bed_message, workers)
+    if graph_engine == "csr":
+        Minigraph = CSRGraph.from_networkx(Minigraph)
     logger.info(
         "Finish turn GFA to Digraph in %0.2f seconds." % (time.time() - starttime)
     )
     if is_saved_as_pickle:
         if file_path is None:
-            _save_to_tmp(Minigraph, "myMinigraph.pl")
+            _save_to_tmp(Minigraph, "myMinigraph.spg")
         else:
             _save_graph(Minigraph, file_path)
     if is_output_inspection_results_in_graph:
-        count1 = nx.number_weakly_connected_components(Minigraph)
+        count1 = number_weakly_connected_components(Minigraph)
         print("=================Key information of Minigraph=================")
         print("The number of weakly connected components of the graph: ", count1)
-        print("Number of nodes in the graph: ", nx.number_of_nodes(Minigraph))
-        print("Number of edges in the graph: ", nx.number_of_edges(Minigraph))
+        print("Number of nodes in the graph: ", Minigraph.number_of_nodes())
+        print("Number of edges in the graph: ", Minigraph.number_of_edges())
         sources = [n for n in Minigraph.nodes() if Minigraph.in_degree(n) == 0]
         sinks = [n for n in Minigraph.nodes() if Minigraph.out_degree(n) == 0]
         print(
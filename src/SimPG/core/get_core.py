@@ -1,8 +1,11 @@
 """Get the core sequence nodes of the crowd"""
 
 import pickle
-from collections import Counter
+from array import array
+from itertools import chain
 from ..classes import Minigfa
+from ..frequency import NodeFrequency
+from ..walks import open_walks
 from . import logger
 from typing import Optional
 import os
@@ -13,7 +16,7 @@ __all__ = ["get_coreSeg_in_Pangenome"]
 
 def _get_coreSeg_in_Pangenome(
     gfa_message: Minigfa, every_sample_Whole_Genome_Sequencing_filepath: str
-) -> set[tuple[str, str]]:
+) -> tuple[set[tuple[str, str]], NodeFrequency]:
 
     core_segs_only: set[tuple[str, str]] = set()
     """
@@ -28,40 +31,82 @@ def _get_coreSeg_in_Pangenome(
         return core_segs_only
     """
     starttime = time.time()
-    dic_path = {}
-    with open(every_sample_Whole_Genome_Sequencing_filepath, "rb") as f:
-        while True:
-            try:
-                key, path_list = pickle.load(f)
-                if path_list is None:
-                    logger.warning(
-                        f"Find a path_list is None.This should be because there is No target_SR for {key}"
-                    )
-                    continue
-            except EOFError:
-                break
-            dic_path[key] = path_list
-    counter = Counter()
-    idx = 1
-    for path in dic_path.values():
-        if path is None:
-            continue
-
-        segs = [p for p in path]
-        for s in segs:
-            counter[s] += 1
-        # print(f"finish{idx}")
-        idx += 1
-    core_segs_only = {s for s, c in counter.items() if c == len(dic_path)}
-    out: set[tuple[str, str]] = set()
-    linear_sample = gfa_message.get_linear_reference()
-    for segID, orient in core_segs_only:
-        if orient == "+" and gfa_message.get_source_sample(segID) == linear_sample:
-            out.add((segID, orient))
+    n_walks = 0
+    size = 2 * gfa_message.get_segment_id_bound()
+    with open_walks(every_sample_Whole_Genome_Sequencing_filepath) as walks:
+        # Number of walks passing each oriented node, indexed by the node ID interned by the GFA.
+        # A walk adds at most 1 to a node, so no count exceeds the number of walks and the smallest lanes holding it are enough
+        typecode = "B" if len(walks) < 1 << 8 else "H" if len(walks) < 1 << 16 else "I"
+        counts = array(typecode, [0]) * size
+        # Segments that are not `s<int>` are interned in another order by the store and by the GFA
+        odd_ids: dict[int, int] = {}
+
+        def index(node: int) -> int:
+            if node >= 0:
+                return node
+            node_id = odd_ids.get(node)
+            if node_id is None:
+                node_id = odd_ids[node] = gfa_message.get_node_id(*walks.get_node(node))
+            return node_id
+
+        first, last, has_head, head = walks.get_reference()
+        heads = {head[bubble] for bubble in range(len(first)) if has_head[bubble]}
+        # Number of walks stored as alleles, and how many of them leave the reference run of each bubble
+        n_delta = 0
+        deviations = array("i", [0]) * len(first)
+        # Bubble whose reference run passes each segment, -1 if none
+        ref_bubble = None
+        for key in walks:
+            # Each walk counts a node once however often it passes it
+            alleles = walks.get_alleles(key)
+            if alleles is not None:
+                if ref_bubble is None:
+                    ref_bubble = array("i", [-1]) * gfa_message.get_segment_id_bound()
+                    for bubble, (f, l) in enumerate(zip(first, last)):
+                        if l > f:
+                            ref_bubble[f + 1 : l + 1] = array("i", [bubble]) * (l - f)
+                for bubble in alleles:
+                    deviations[bubble] += 1
+                nodes = set(chain.from_iterable(alleles.values()))
+                nodes -= heads
+                for node in nodes:
+                    if node >= 0 and not node & 1:
+                        bubble = ref_bubble[node >> 1]
+                        if bubble >= 0 and bubble not in alleles:
+                            # Counted with the reference run of the bubble, which the walk keeps
+                            continue
+                    counts[index(node)] += 1
+                n_delta += 1
+                n_walks += 1
+                continue
+            nodes = walks.get_nodes(key)
+            if nodes is None:
+                logger.warning(
+                    f"Find a path_list is None.This should be because there is No target_SR for {key}"
+                )
+                continue
+            if min(nodes, default=0) < 0:
+                nodes = [index(node) for node in nodes]
+            seen = bytearray(size)
+            for node in nodes:
+                if not seen[node]:
+                    seen[node] = 1
+                    counts[node] += 1
+            n_walks += 1
+            del nodes, seen
+        if n_delta:
+            # The reference runs are counted for all the walks keeping them at once, segment by segment
+            for node in heads:
+                counts[index(node)] += n_delta
+            for seg_id, bubble in enumerate(ref_bubble):
+                if bubble >= 0:
+                    counts[2 * seg_id] += n_delta - deviations[bubble]
+    frequency = NodeFrequency.from_counts(gfa_message, counts, n_walks)
+    out = frequency.get_core() if n_walks else set()
     logger.info(
         f"Finish getting the core sequence nodes in {(time.time() - starttime):.2f} seconds.There are {len(out)} nodes in the pan-genome that are core sequence nodes"
     )
-    return out
+    return out, frequency
 
 
 def _save_something(something, s: str) -> None:
@@ -94,6 +139,7 @@ def get_coreSeg_in_Pangenome(
     every_sample_Whole_Genome_Sequencing_filepath: Optional[str] = None,
     is_saved_as_pickle: bool = False,
     file_path: Optional[str] = None,
+    frequency_file: Optional[str] = None,
 ) -> set[tuple[str, str]]:
     """
     Get the core sequence nodes belonging to a certain group of people
@@ -101,9 +147,10 @@ def get_coreSeg_in_Pangenome(
 
     Args:
         gfa_message (Minigfa): Composite data storing GFA file information.
-        every_sample_Whole_Genome_Sequencing_filepath (str | None, optional): The file location of the walking route of each sample. The default is the my_walks.pl file in the tmp folder of the working directory
+        every_sample_Whole_Genome_Sequencing_filepath (str | None, optional): The file location of the walking route of each sample. The default is the my_walks.spw file in the tmp folder of the working directory
         is_saved_as_pickle (bool, optional): Whether to save as a pickle file for reuse. Defaults to False.
         file_path (str | None, optional): If you choose to save as a pickle file,the graph will be saved in `file_path`. By default, the file name will be `myCoreseg.pl` in folder /tmp under your working folder.
+        frequency_file (str | None, optional): If given, the number of walks passing each oriented node and the number of walks are saved in `frequency_file`, read it with `open_node_frequency` to get the core nodes at other thresholds without reading the walks again. With `is_saved_as_pickle`, they are saved in `myNodeFrequency.spnf` in folder /tmp under your working folder by default.
 
 
     Returns:
@@ -111,12 +158,17 @@ def get_coreSeg_in_Pangenome(
     """
     if every_sample_Whole_Genome_Sequencing_filepath is None:
         every_sample_Whole_Genome_Sequencing_filepath = os.path.join(
-            os.getcwd(), "tmp", "my_walks.pl"
+            os.getcwd(), "tmp", "my_walks.spw"
         )
-    out_set = _get_coreSeg_in_Pangenome(
+    out_set, frequency = _get_coreSeg_in_Pangenome(
         gfa_message=gfa_message,
         every_sample_Whole_Genome_Sequencing_filepath=every_sample_Whole_Genome_Sequencing_filepath,
     )
+    if frequency_file is None and is_saved_as_pickle:
+        os.makedirs(os.path.join(os.getcwd(), "tmp"), exist_ok=True)
+        frequency_file = os.path.join(os.getcwd(), "tmp", "myNodeFrequency.spnf")
+    if frequency_file is not None:
+        frequency.save(frequency_file)
     if is_saved_as_pickle:
         if file_path is None:
             _save_to_tmp(out_set, "myCoreseg.pl")
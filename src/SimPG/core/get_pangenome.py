@@ -1,10 +1,11 @@
 """Assemble a pan-genome for a specific population"""
 
-import pickle
 import networkx as nx
 from ..classes import Minibed
+from ..graph import CSRGraph, number_weakly_connected_components, save_graph
+from ..walks import open_walks
 from . import logger
-from typing import Optional
+from typing import Optional, Union
 import os
 import time
 
@@ -12,9 +13,8 @@ __all__ = ["simulate_Population_Pangenome"]
 
 
 def _save_graph(graph, s: str) -> None:
-    """Save a graph in pickle format"""
-    with open(s, "wb") as f:
-        pickle.dump(graph, f)
+    """Save a graph as a snapshot, see `save_graph`"""
+    save_graph(graph, s)
 
 
 def _save_to_tmp(content, filename: str) -> str:
@@ -30,9 +30,8 @@ def _save_to_tmp(content, filename: str) -> str:
     os.makedirs(tmp_dir, exist_ok=True)
     # Construct the full path of the file
     file_path = os.path.join(tmp_dir, filename)
-    # Open the file and write the content (if the file does not exist, create a new one, if it exists, overwrite it)
-    with open(file_path, "wb") as f:
-        pickle.dump(content, f)
+    # Write the graph snapshot (if the file does not exist, create a new one, if it exists, overwrite it)
+    save_graph(content, file_path)
     return file_path
 
 
@@ -57,6 +56,32 @@ def _generate_sequence(start_str, end_str) -> list[tuple[str, str]]:
     return seq
 
 
+class _CSREdgeCollector:
+    """Collect deduplicated edges the way `nx.DiGraph.add_edge` would, keeping only integer pairs until the CSRGraph is built"""
+
+    def __init__(self) -> None:
+        self._index: dict[tuple[str, str], int] = {}
+        self._labels: list[tuple[str, str]] = []
+        self._edges: dict[tuple[int, int], None] = {}
+
+    def _node(self, label: tuple[str, str]) -> int:
+        node = self._index.get(label)
+        if node is None:
+            node = self._index[label] = len(self._labels)
+            self._labels.append(label)
+        return node
+
+    def add_edge(self, u: tuple[str, str], v: tuple[str, str]) -> None:
+        self._edges[(self._node(u), self._node(v))] = None
+
+    def to_graph(self) -> CSRGraph:
+        return CSRGraph.from_edges(
+            self._labels,
+            (u for u, _ in self._edges),
+            (v for _, v in self._edges),
+        )
+
+
 def simulate_Population_Pangenome(
     bed_message: Minibed,
     every_sample_Whole_Genome_Sequencing_filepath: Optional[str] = None,
@@ -64,44 +89,93 @@ def simulate_Population_Pangenome(
     is_output_inspection_results_in_graph: bool = False,
     is_saved_as_pickle: bool = False,
     file_path: Optional[str] = None,
-) -> nx.DiGraph:
+    graph_engine: str = "networkx",
+) -> Union[nx.DiGraph, CSRGraph]:
     """Simulate the pan-genome of a specific population
 
     Args:
         bed_message (Minibed): Composite data storing Bed file information.
-        every_sample_Whole_Genome_Sequencing_filepath (str |None, optional): The file location of the walking route of each sample.The default is the `my_walks.pl` file in the tmp folder of the working directory
+        every_sample_Whole_Genome_Sequencing_filepath (str |None, optional): The file location of the walking route of each sample.The default is the `my_walks.spw` file in the tmp folder of the working directory
         is_added_linear_reference_genome(bool,optional): Whether to add a linear reference genome in new pan-genome graph.Defaults to False.
         is_output_inspection_results (bool, optional): Whether to output the key parameters of the graph to stdout. Defaults to False.
-        is_saved_as_pickle (bool, optional): Whether to save as a pickle file for reuse. Defaults to False.
-        file_path (str | None, optional): If you choose to save as a pickle file,the graph will be saved in `file_path`. By default, the file name will be `myPangenome.pl` in folder /tmp under your working folder.
+        is_saved_as_pickle (bool, optional): Whether to save the graph as a snapshot for reuse, reopen it with `load_graph`. Defaults to False.
+        file_path (str | None, optional): If you choose to save the graph,the snapshot will be saved in `file_path`. By default, the file name will be `myPangenome.spg` in folder /tmp under your working folder.
+        graph_engine (str, optional): "networkx" returns a networkx.DiGraph, "csr" returns the compact array-backed `CSRGraph`. Defaults to "networkx".
+
+    Raises:
+        ValueError: Unknown `graph_engine`.
 
     Returns:
-        nx.DiGraph: Pan-genome graph
+        nx.DiGraph | CSRGraph: Pan-genome graph
     """
+    if graph_engine not in ("networkx", "csr"):
+        raise ValueError(f"Unknown graph_engine {graph_engine!r}")
     if every_sample_Whole_Genome_Sequencing_filepath is None:
         every_sample_Whole_Genome_Sequencing_filepath = os.path.join(
-            os.getcwd(), "tmp", "my_walks.pl"
+            os.getcwd(), "tmp", "my_walks.spw"
         )
-    Pangenome_DiGraph = nx.DiGraph()
+    Pangenome_DiGraph = (
+        nx.DiGraph() if graph_engine == "networkx" else _CSREdgeCollector()
+    )
     sources, sinks = bed_message.get_linear_sources_and_sinks()
     # print(sources)
     # print(sources.values())
     starttime = time.time()
-    with open(every_sample_Whole_Genome_Sequencing_filepath, "rb") as f:
-        while True:
-            try:
-                key, path_list = pickle.load(f)
-                if path_list is None:
-                    logger.warning(
-                        f"Find a path_list is None.This should be because there is No target_SR for {key}.Jump out"
-                    )
-                    continue
-                for u, v in zip(path_list[:-1], path_list[1:]):
-                    if v[0] in sources.values():
-                        continue
-                    Pangenome_DiGraph.add_edge(u, v)
-            except EOFError:
-                break
+    source_segIDs = set(sources.values())
+    with open_walks(every_sample_Whole_Genome_Sequencing_filepath) as walks:
+        # Deduplicate the steps of all walks as packed node pairs first, in order of first appearance,
+        # so each edge is decoded and added once
+        steps: dict[tuple[int, int], None] = {}
+        first, last, has_head, head = walks.get_reference()
+        reference_added = bytearray(len(first))
+        for key in walks:
+            alleles = walks.get_alleles(key)
+            if alleles is not None:
+                # Walk the bubbles, the steps inside a reference run are the same for every walk and are added once
+                prev = None
+                for bubble in range(len(first)):
+                    if has_head[bubble]:
+                        if prev is not None:
+                            steps[(prev, head[bubble])] = None
+                        prev = head[bubble]
+                    allele = alleles.get(bubble)
+                    if allele is None:
+                        start, end = 2 * first[bubble] + 2, 2 * last[bubble]
+                        if start > end:
+                            continue
+                        if prev is not None:
+                            steps[(prev, start)] = None
+                        if not reference_added[bubble]:
+                            reference_added[bubble] = True
+                            steps.update(
+                                dict.fromkeys(
+                                    zip(
+                                        range(start, end, 2),
+                                        range(start + 2, end + 1, 2),
+                                    )
+                                )
+                            )
+                        prev = end
+                    elif allele:
+                        if prev is not None:
+                            steps[(prev, allele[0])] = None
+                        steps.update(dict.fromkeys(zip(allele[:-1], allele[1:])))
+                        prev = allele[-1]
+                continue
+            path_list = walks.get_nodes(key)
+            if path_list is None:
+                logger.warning(
+                    f"Find a path_list is None.This should be because there is No target_SR for {key}.Jump out"
+                )
+                continue
+            steps.update(dict.fromkeys(zip(path_list[:-1], path_list[1:])))
+            del path_list
+        get_node = walks.get_node
+        for u, v in steps:
+            v = get_node(v)
+            if v[0] in source_segIDs:
+                continue
+            Pangenome_DiGraph.add_edge(get_node(u), v)
     if is_added_linear_reference_genome:
         for chr in sources.keys():
             start_segID = sources[chr]
@@ -109,9 +183,11 @@ def simulate_Population_Pangenome(
             linear_list = _generate_sequence(start_segID, end_segID)
             for node_from, node_to in zip(linear_list[:-1], linear_list[1:]):
                 Pangenome_DiGraph.add_edge(node_from, node_to)
+    if graph_engine == "csr":
+        Pangenome_DiGraph = Pangenome_DiGraph.to_graph()
     if is_saved_as_pickle:
         if file_path is None:
-            _save_to_tmp(Pangenome_DiGraph, "myPangenome.pl")
+            _save_to_tmp(Pangenome_DiGraph, "myPangenome.spg")
         else:
             _save_graph(Pangenome_DiGraph, file_path)
     logger.info(
@@ -119,11 +195,11 @@ def simulate_Population_Pangenome(
         % (time.time() - starttime)
     )
     if is_output_inspection_results_in_graph:
-        count1 = nx.number_weakly_connected_components(Pangenome_DiGraph)
+        count1 = number_weakly_connected_components(Pangenome_DiGraph)
         print("=================Key information of new graph=================")
         print("The number of weakly connected components of the graph: ", count1)
-        print("Number of nodes in the graph: ", nx.number_of_nodes(Pangenome_DiGraph))
-        print("Number of edges in the graph: ", nx.number_of_edges(Pangenome_DiGraph))
+        print("Number of nodes in the graph: ", Pangenome_DiGraph.number_of_nodes())
+        print("Number of edges in the graph: ", Pangenome_DiGraph.number_of_edges())
         sources = [
             n for n in Pangenome_DiGraph.nodes() if Pangenome_DiGraph.in_degree(n) == 0
         ]
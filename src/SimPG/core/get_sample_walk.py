@@ -1,28 +1,60 @@
 """Extract the walking route of individual genome sequence mapping in the graph"""
 
+import json
 import pickle
 import networkx as nx
 from collections import deque
-from typing import List, Tuple, Any, Optional
+from typing import List, Tuple, Any, NamedTuple, Optional, Union
 from . import logger
-from ..classes import Minibed, Minigfa
+from ..classes import Minibed, Minigfa, file_fingerprint
+from ..graph import CSRGraph
+from ..walks import WalkWriter, _WalkCache
 import os
+import time
+import math
+import heapq
+import hashlib
+from bisect import bisect_right
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 
 __all__ = ["simulate_population_every_walk"]
 
 
-def _find_constrained_path(G: nx.DiGraph, source, target, sr_value) -> None | list[Any]:
+class _SearchBudget(NamedTuple):
+    """Limits of the state search of one bubble"""
+
+    max_states: int = 1_000_000
+    time_limit: float = 30.0
+
+
+def _find_constrained_path(
+    G: nx.DiGraph,
+    source,
+    target,
+    required_nodes: set,
+    required_edges: set,
+    budget: _SearchBudget = _SearchBudget(),
+) -> tuple[None | list[Any], int, int]:
     """
     In a directed graph G, find a path from source to target,
-    Requires that all nodes and edges with attribute SR==sr_value must be passed through.
-    If it exists, return the node list; otherwise return None.
+    Requires that all nodes in `required_nodes` and edges in `required_edges` must be passed through.
+
+    The search is breadth-first over (node, bitmask of the required nodes and edges passed) states. When it has
+    discovered `budget.max_states` states or run for `budget.time_limit` seconds, it stops and returns the discovered
+    path to target that passes the most required nodes and edges.
+
+    Returns:
+      path (list): list of nodes in the source->target path, or None if no path is found.
+      uncovered_nodes (int): number of required nodes the path does not pass.
+      uncovered_edges (int): number of required edges the path does not pass.
     """
 
-    # 1. Constructing the set of nodes and edges that must be passed
-    required_nodes = {v for v, d in G.nodes(data=True) if d.get("SR") == sr_value}
-    required_edges = {
-        (u, v) for u, v, d in G.edges(data=True) if d.get("SR") == sr_value
-    }
+    # 1. Give every node and edge that must be passed a bit
+    node_bit = {v: 1 << i for i, v in enumerate(required_nodes)}
+    edge_bit = {e: 1 << (len(node_bit) + i) for i, e in enumerate(required_edges)}
+    nodes_mask = (1 << len(node_bit)) - 1
+    full_mask = (1 << (len(node_bit) + len(edge_bit))) - 1
     # logger.info(f"{len(required_nodes)},{len(required_edges)}")
     # 2. Reverse BFS: Mark all nodes that can reach the target
     reachable = set([target])
@@ -37,29 +69,32 @@ def _find_constrained_path(G: nx.DiGraph, source, target, sr_value) -> None | li
 
     if source not in reachable:
         # The starting point cannot reach the end point
-        return None
+        return None, len(node_bit), len(edge_bit)
 
     # 3. BFS state search
-    #  state = (current node, visited nodes frozenset, visited edges frozenset)
-    init_nodes = frozenset({source} & required_nodes)
-    init_state = (source, init_nodes, frozenset())
-
+    #  state = (current node, bitmask of the nodes and edges passed)
+    init_state = (source, node_bit.get(source, 0))
     queue = deque([init_state])
-    visited = set([init_state])  # Deduplication: The queued state set
-    parent = {init_state: None}  # To rebuild the path
+    parent = {init_state: None}  # Deduplication and rebuilding the path
+    best = init_state if source == target else None
+    deadline = time.monotonic() + budget.time_limit
+    popped = 0
+    exhausted = False
 
     while queue:
-        u, vis_n, vis_e = queue.popleft()
+        state = queue.popleft()
+        u, mask = state
 
         # Check whether the goal has been achieved
-        if u == target and vis_n == required_nodes and vis_e == required_edges:
-            # Reconstruct the node path from source to target
-            path = []
-            st = (u, vis_n, vis_e)
-            while st:
-                path.append(st[0])
-                st = parent[st]
-            return list(reversed(path))
+        if u == target and mask == full_mask:
+            return _rebuild_path(parent, state), 0, 0
+
+        popped += 1
+        if len(parent) >= budget.max_states or (
+            popped % 1024 == 0 and time.monotonic() > deadline
+        ):
+            exhausted = True
+            break
 
         # Enumerate all outgoing edges to transfer
         for v in G.successors(u):
@@ -67,118 +102,256 @@ def _find_constrained_path(G: nx.DiGraph, source, target, sr_value) -> None | li
             if v not in reachable:
                 continue
 
-            # Update the must-pass node set and must-pass edge set
-            new_vis_n = vis_n | ({v} if v in required_nodes else frozenset())
-            edge = (u, v)
-            new_vis_e = vis_e | ({edge} if edge in required_edges else frozenset())
-
-            new_state = (v, new_vis_n, new_vis_e)
-            if new_state in visited:
+            # Update the passed nodes and edges
+            new_state = (v, mask | node_bit.get(v, 0) | edge_bit.get((u, v), 0))
+            if new_state in parent:
                 continue
 
-            visited.add(new_state)
-            parent[new_state] = (u, vis_n, vis_e)
+            parent[new_state] = state
             queue.append(new_state)
+            if v == target and (
+                best is None or new_state[1].bit_count() > best[1].bit_count()
+            ):
+                best = new_state
 
-    # Search completed, no solution
-    return None
+    if not exhausted or best is None:
+        # Search completed with no solution, or no path to target found within the budget
+        return None, len(node_bit), len(edge_bit)
+    uncovered_nodes = len(node_bit) - (best[1] & nodes_mask).bit_count()
+    uncovered_edges = len(edge_bit) - (best[1] >> len(node_bit)).bit_count()
+    logger.warning(
+        f"Search budget exhausted from {source} to {target} after {len(parent)} states, "
+        f"the best path passes {len(node_bit) - uncovered_nodes}/{len(node_bit)} required nodes "
+        f"and {len(edge_bit) - uncovered_edges}/{len(edge_bit)} required edges"
+    )
+    return _rebuild_path(parent, best), uncovered_nodes, uncovered_edges
 
 
-import math
+def _rebuild_path(parent: dict, state) -> list[Any]:
+    """Reconstruct the node path from the search tree"""
+    path = []
+    while state:
+        path.append(state[0])
+        state = parent[state]
+    return list(reversed(path))
+
+
+def _topological_index(G: nx.DiGraph) -> None | dict[Any, int]:
+    """Return the position of every node in a topological order of G (Kahn's algorithm), or None if G has a cycle"""
+    in_degree = {v: d for v, d in G.in_degree()}
+    queue = deque(v for v, d in in_degree.items() if d == 0)
+    index = {}
+    while queue:
+        u = queue.popleft()
+        index[u] = len(index)
+        for v in G.successors(u):
+            in_degree[v] -= 1
+            if in_degree[v] == 0:
+                queue.append(v)
+    if len(index) < len(in_degree):
+        return None
+    return index
+
+
+def _find_dag_constrained_path(
+    G: nx.DiGraph,
+    topo_index: dict[Any, int],
+    source,
+    target,
+    required_nodes,
+    required_edges,
+) -> None | list[Any]:
+    """
+    In a directed acyclic graph G, find a path from source to target that passes through all required nodes and edges.
+    If it exists, return the node list; otherwise return None.
+
+    In a DAG the required elements can only be met in topological order, so they must form a chain
+    source -> ... -> target in which every required edge joins two consecutive waypoints. The path is the
+    concatenation of the shortest paths between consecutive waypoints; each one is searched breadth-first within
+    the topological range of its two ends, so the ranges are disjoint and the search is linear in the size of G.
+    Among the shortest paths, the one found is the first in successor order, the same path `_find_constrained_path`
+    returns.
+    """
+    if source not in topo_index or target not in topo_index:
+        return None
+    waypoints = {source, target} | set(required_nodes)
+    for u, v in required_edges:
+        waypoints.add(u)
+        waypoints.add(v)
+    chain = sorted(waypoints, key=topo_index.__getitem__)
+    if chain[0] != source or chain[-1] != target:
+        return None
+    position = {w: i for i, w in enumerate(chain)}
+    for u, v in required_edges:
+        if position[v] != position[u] + 1:
+            return None
+
+    path = [source]
+    for a, b in zip(chain, chain[1:]):
+        low, high = topo_index[a], topo_index[b]
+        # Nodes of the range that can reach b
+        reach_b = {b}
+        queue = deque([b])
+        while queue:
+            v = queue.popleft()
+            for u in G.predecessors(v):
+                if u not in reach_b and low <= topo_index[u]:
+                    reach_b.add(u)
+                    queue.append(u)
+        if a not in reach_b:
+            return None
+        # Breadth-first search from a, the first discovery of b gives the path
+        parent = {a: None}
+        queue = deque([a])
+        while b not in parent:
+            u = queue.popleft()
+            for v in G.successors(u):
+                if v in reach_b and v not in parent:
+                    parent[v] = u
+                    queue.append(v)
+        segment = []
+        v = b
+        while v != a:
+            segment.append(v)
+            v = parent[v]
+        path.extend(reversed(segment))
+    return path
+
+
+def _distance_table(
+    adj: list[list[tuple[int, float]]], source: int, zero_one: bool
+) -> tuple[list[float], list[int]]:
+    """Shortest distances and parents from `source` over an indexed adjacency list.
+    0-1 BFS when every weight is 0 or 1, Dijkstra otherwise.
+    """
+    dist = [math.inf] * len(adj)
+    parent = [-1] * len(adj)
+    dist[source] = 0
+    if zero_one:
+        queue = deque([source])
+        while queue:
+            u = queue.popleft()
+            d = dist[u]
+            for v, w in adj[u]:
+                if d + w < dist[v]:
+                    dist[v] = d + w
+                    parent[v] = u
+                    if w == 0:
+                        queue.appendleft(v)
+                    else:
+                        queue.append(v)
+    else:
+        heap = [(0, source)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if d > dist[u]:
+                continue
+            for v, w in adj[u]:
+                if d + w < dist[v]:
+                    dist[v] = d + w
+                    parent[v] = u
+                    heapq.heappush(heap, (d + w, v))
+    return dist, parent
 
 
 def _prize_collecting_path(G: nx.DiGraph, s, t, V_star, E_star, delta_max=math.inf):
     """
     Find an s->t path in directed graph G that covers as many nodes in V_star and edges in E_star as possible.
 
+    Required nodes and edges are inserted greedily into the s->t path, the one with the smallest extra length first.
+    Distances come from one BFS (0-1 BFS, the weights are 0 or 1) per element end over arrays indexed by node. The gains
+    of the insertions are kept in a heap, and each insertion only adds the gains of the two segments it creates.
+
     Returns:
       path (list): list of nodes in the s->t path, or None if no valid path.
       uncovered_nodes (int): number of nodes in V_star not covered.
       uncovered_edges (int): number of edges in E_star not covered.
     """
-    # --- 1. Identify compressed nodes and map pseudo-edge nodes ---
-    nodes = set(V_star)
-    pseudo = {("e", u, v) for (u, v) in E_star}
-    V_hat = {s, t} | nodes | pseudo
-
-    mapping = {}
-    edge_weight = {}
-    for z in V_hat:
-        if isinstance(z, tuple) and z[0] == "e":
-            _, u, v = z
-            mapping[z] = (u, v)
-            edge_weight[z] = G[u][v].get("weight", 1)
-        else:
-            mapping[z] = (z, z)
-
-    # --- 2. Precompute shortest-path lengths ---
-    end_points = {mapping[z][1] for z in V_hat}
-    dists = {x: nx.single_source_dijkstra_path_length(G, x) for x in end_points}
-
-    # --- 3. Build compressed complete digraph H ---
-    H = nx.DiGraph()
-    reward = {z: 1 for z in nodes | pseudo}
-    reward[s] = reward[t] = 0
-    for z in V_hat:
-        H.add_node(z)
-    for z1 in V_hat:
-        end1 = mapping[z1][1]
-        for z2 in V_hat - {z1}:
-            start2 = mapping[z2][0]
-            dist = dists.get(end1, {}).get(start2, math.inf)
-            if math.isinf(dist):
-                continue
-            w = dist + edge_weight.get(z2, 0)
-            H.add_edge(z1, z2, weight=w)
+    # --- 1. Index the graph and the elements: 0 is s, 1 is t, then nodes and edges to cover ---
+    labels = list(G)
+    index = {v: i for i, v in enumerate(labels)}
+    adj = [[] for _ in labels]
+    zero_one = True
+    for u, v, d in G.edges(data=True):
+        w = d.get("weight", 1)
+        zero_one = zero_one and w in (0, 1)
+        adj[index[u]].append((index[v], w))
+    if s not in index or t not in index:
+        return None, len(V_star), len(E_star)
+    nodes = [z for z in V_star if z != s and z != t]
+    starts = [index[s], index[t]] + [index[z] for z in nodes]
+    ends = list(starts)
+    edge_weight = [0] * len(starts)
+    for u, v in E_star:
+        starts.append(index[u])
+        ends.append(index[v])
+        edge_weight.append(G[u][v].get("weight", 1))
+    first_edge = 2 + len(nodes)
 
-    # --- 4. Greedy insertion in H ---
-    P = [s, t]
-    covered = set()
+    # --- 2. Distance tables from every element end ---
+    tables = {x: _distance_table(adj, x, zero_one) for x in set(ends)}
 
-    def best_insert():
-        best = (0, None, None)
-        for z in V_hat - {s, t} - covered:
-            for i in range(len(P) - 1):
-                u, v = P[i], P[i + 1]
-                if not H.has_edge(u, z) or not H.has_edge(z, v):
-                    continue
-                w_uv = H[u][v]["weight"]
-                extra = H[u][z]["weight"] + H[z][v]["weight"] - w_uv
-                if extra > delta_max:
-                    continue
-                gain = reward[z] / extra if extra > 0 else reward[z] * 1e6
-                if gain > best[0]:
-                    best = (gain, z, i + 1)
-        return best
-
-    while True:
-        gain, z, pos = best_insert()
-        if z is None or gain <= 0:
-            break
-        P.insert(pos, z)
+    def cost(z1, z2):
+        """Length of the shortest walk leaving z1 and covering z2"""
+        return tables[ends[z1]][0][starts[z2]] + edge_weight[z2]
+
+    # --- 3. Greedy insertion, P is a linked list from s (0) to t (1) ---
+    following = {0: 1}
+
+    def insertion(z, u):
+        """Gain of inserting z between u and the element following it, or None"""
+        v = following[u]
+        extra = cost(u, z) + cost(z, v) - cost(u, v)
+        if math.isinf(extra) or extra > delta_max:
+            return None
+        return 1 / extra if extra > 0 else 1e6
+
+    # Gains of inserting every element into every segment (u, following[u]), an entry is stale once z is covered or
+    # the segment has been split
+    heap = []
+    for z in range(2, len(starts)):
+        gain = insertion(z, 0)
+        if gain is not None:
+            heap.append((-gain, z, 0, 1))
+    heapq.heapify(heap)
+    covered = set()
+    while heap:
+        _, z, u, v = heapq.heappop(heap)
+        if z in covered or following[u] != v:
+            continue
+        following[u] = z
+        following[z] = v
         covered.add(z)
+        # Only the two new segments bring new gains
+        for y in range(2, len(starts)):
+            if y in covered:
+                continue
+            for left, right in ((u, z), (z, v)):
+                gain = insertion(y, left)
+                if gain is not None:
+                    heapq.heappush(heap, (-gain, y, left, right))
 
     # Determine uncovered counts
-    uncov_nodes = len(nodes - covered)
-    uncov_edges = len(pseudo - covered)
+    uncov_nodes = sum(1 for z in range(2, first_edge) if z not in covered)
+    uncov_edges = sum(1 for z in range(first_edge, len(starts)) if z not in covered)
 
-    # --- 5. Reconstruct original path or handle no path ---
-    try:
-        path = []
-        for i in range(len(P) - 1):
-            z1, z2 = P[i], P[i + 1]
-            u1 = mapping[z1][1]
-            u2 = mapping[z2][0]
-            sub = nx.shortest_path(G, u1, u2, weight="weight")
-            if i > 0:
-                sub = sub[1:]
-            path.extend(sub)
-            if z2 in pseudo:
-                _, u, v = z2
-                if path[-1] != v:
-                    path.append(v)
-    except nx.NetworkXNoPath:
-        return None, uncov_nodes, uncov_edges
+    # --- 4. Reconstruct original path or handle no path ---
+    path = [s]
+    z1 = 0
+    while z1 != 1:
+        z2 = following[z1]
+        dist, parent = tables[ends[z1]]
+        x = starts[z2]
+        if math.isinf(dist[x]):
+            return None, uncov_nodes, uncov_edges
+        sub = []
+        while x != ends[z1]:
+            sub.append(labels[x])
+            x = parent[x]
+        path.extend(reversed(sub))
+        if z2 >= first_edge and path[-1] != labels[ends[z2]]:
+            path.append(labels[ends[z2]])
+        z1 = z2
 
     return path, uncov_nodes, uncov_edges
 
@@ -204,42 +377,322 @@ def _generate_sequence(start_str, end_str) -> list[tuple[str, str]]:
     return seq
 
 
-def _simulate_sample_path(
-    gfa_message: Minigfa, bed_message: Minibed, G_full: nx.DiGraph, sample_name: str
+def _is_reference_allele(
+    path: list[tuple[str, str]], list_of_segments: list[str]
+) -> bool:
+    """Whether the walk through a bubble (without its first node) is the reference run of the bubble"""
+    return (
+        len(path) == int(list_of_segments[-1][1:]) - int(list_of_segments[0][1:])
+        and path == _generate_sequence(list_of_segments[0], list_of_segments[-1])[1:]
+    )
+
+
+def _get_bubbles_with_SR(
+    gfa_message: Minigfa, bed_message: Minibed, target_SR: int
+) -> set[int]:
+    """Return the bubbles that may hold a node or an edge whose SR is target_SR.
+    The other bubbles are known to be passed along the linear reference without building their subgraph.
+    """
+    bubbles = set[int]()
+    for segID in gfa_message.get_segID_by_SRank(target_SR):
+        bubbles.update(bed_message.get_bubbles_of_segment(segID))
+    for from_id, _, to_id, _, _ in gfa_message.get_Link_by_SRank(target_SR):
+        bubbles.update(bed_message.get_bubbles_of_segment(from_id))
+        bubbles.update(bed_message.get_bubbles_of_segment(to_id))
+    return bubbles
+
+
+def _bubble_subgraph(
+    G_full: Union[nx.DiGraph, CSRGraph], nodes: list[tuple[str, str]]
+) -> nx.DiGraph:
+    """Return an editable networkx copy of the subgraph of one bubble"""
+    if isinstance(G_full, CSRGraph):
+        return G_full.subgraph(nodes).to_networkx()
+    return G_full.subgraph(nodes).copy()
+
+
+def _solve_bubble(
+    tempG: nx.DiGraph,
+    list_of_segments: list[str],
+    required_nodes: set,
+    required_edges: set,
+    budget: _SearchBudget = _SearchBudget(),
+) -> tuple[list[tuple[str, str]], bool]:
+    """Return the walk of a sample through one bubble, without its first node, and whether it can be cached.
+    A path cut short by the search budget depends on timing and is not cached.
+
+    Args:
+        tempG (nx.DiGraph): Subgraph of the bubble, with the nodes and edges whose SR is greater than the SR of the sample removed.
+        list_of_segments (list[str]): Segments of the bubble in the BED line.
+        required_nodes (set): Nodes of `tempG` whose SR is the SR of the sample.
+        required_edges (set): Edges of `tempG` whose SR is the SR of the sample.
+        budget (_SearchBudget): Limits of the state search in a cyclic bubble.
+    """
+    start_segID = (list_of_segments[0], "+")
+    end_segID = (list_of_segments[-1], "+")
+    logger.debug(f"{start_segID} to {end_segID}")
+    topo_index = _topological_index(tempG)
+    if topo_index is not None:
+        path = _find_dag_constrained_path(
+            tempG, topo_index, start_segID, end_segID, required_nodes, required_edges
+        )
+    else:
+        path, uncovered_nodes_count, uncovered_edges_count = _find_constrained_path(
+            tempG, start_segID, end_segID, required_nodes, required_edges, budget
+        )
+        if path is not None and (uncovered_nodes_count or uncovered_edges_count):
+            # Cut short by the budget, keep whichever of it and the approximation passes more required elements
+            approx, approx_nodes_count, approx_edges_count = _prize_collecting_path(
+                tempG, start_segID, end_segID, required_nodes, required_edges, 4
+            )
+            if approx is not None and approx_nodes_count + approx_edges_count < (
+                uncovered_nodes_count + uncovered_edges_count
+            ):
+                path = approx
+            return path[1:], False
+    if path is not None:
+        return path[1:], True
+    # logger.warning(f"from {start_segID} to {end_segID} don't find path")
+    logger.info(
+        f"Preparing an approximation algorithm from {start_segID} to {end_segID}"
+    )
+    path, uncovered_nodes_count, uncovered_edges_count = _prize_collecting_path(
+        tempG, start_segID, end_segID, required_nodes, required_edges, 4
+    )
+    if path is None:
+        logger.error(f"Approximation algorithm fails from {start_segID} to {end_segID}")
+        return [], True
+    logger.debug(
+        f"Total nodes:{len(required_nodes)},uncovered nodes:{uncovered_nodes_count},total edges:{len(required_edges)},uncovered edges:{uncovered_edges_count}"
+    )
+    return path[1:], True
+
+
+class _SolutionCache:
+    """LRU cache of bubble solutions.
+
+    A key is (bubble, nodes and edges left in the rank-filtered subgraph, required nodes, required edges). The filtered
+    subgraph only grows with the rank, so its size identifies it within a bubble. Only searches with a non-empty
+    requirement are cached, every required node or edge carries the SR of the sample, so the other inputs of the
+    search are fixed by the key.
+    """
+
+    _FORMAT = "SimPG bubble solution cache"
+    _VERSION = 1
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[tuple, list[tuple[str, str]]] = OrderedDict()
+        # Worker processes record their new entries to send them back to the parent
+        self._new: Optional[list[tuple[tuple, list[tuple[str, str]]]]] = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: tuple) -> Optional[list[tuple[str, str]]]:
+        path = self._entries.get(key)
+        if path is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return path
+
+    def put(self, key: tuple, path: list[tuple[str, str]]) -> None:
+        self._entries[key] = path
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        if self._new is not None:
+            self._new.append((key, path))
+
+    def track_new(self) -> None:
+        self._new = []
+
+    def take_new(self) -> tuple[list[tuple[tuple, list[tuple[str, str]]]], int, int]:
+        """Return the entries added and the counters since the last call, and reset them"""
+        delta = (self._new or [], self.hits, self.misses)
+        self._new = [] if self._new is not None else None
+        self.hits = self.misses = 0
+        return delta
+
+    def merge(
+        self, delta: tuple[list[tuple[tuple, list[tuple[str, str]]]], int, int]
+    ) -> None:
+        entries, hits, misses = delta
+        for key, path in entries:
+            self.put(key, path)
+        self.hits += hits
+        self.misses += misses
+
+    def load(self, file_path: str, fingerprint: str) -> None:
+        """Load the entries saved by `save` for the same graph and BED"""
+        try:
+            with open(file_path, "rb") as f:
+                saved = pickle.load(f)
+        except FileNotFoundError:
+            return
+        if (
+            saved.get("format") != self._FORMAT
+            or saved.get("version") != self._VERSION
+            or saved.get("fingerprint") != fingerprint
+        ):
+            logger.warning(
+                f"{file_path} was saved for another graph or version, it is ignored"
+            )
+            return
+        for key, path in saved["entries"]:
+            self.put(key, path)
+        logger.info(f"Load {len(saved['entries'])} bubble solutions from {file_path}")
+
+    def save(self, file_path: str, fingerprint: str) -> None:
+        tmp_path = f"{file_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(
+                {
+                    "format": self._FORMAT,
+                    "version": self._VERSION,
+                    "fingerprint": fingerprint,
+                    "entries": list(self._entries.items()),
+                },
+                f,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        os.replace(tmp_path, file_path)
+
+
+def _graph_digest(bed_message: Minibed, G_full: Union[nx.DiGraph, CSRGraph]) -> str:
+    """Digest of the graph (nodes, edges and their SR) and of the bubbles, fed one item at a time in sorted order"""
+    digest = hashlib.blake2b(digest_size=16)
+    for node in sorted((n, d.get("SR")) for n, d in G_full.nodes(data=True)):
+        digest.update(repr(node).encode())
+    digest.update(b";")
+    for edge in sorted((u, v, d.get("SR")) for u, v, d in G_full.edges(data=True)):
+        digest.update(repr(edge).encode())
+    for _, _, _, _, list_of_segments in bed_message:
+        digest.update(f"{list_of_segments[0]},{list_of_segments[-1]};".encode())
+    return digest.hexdigest()
+
+
+def _walk_inputs(
+    gfa_message: Minigfa, bed_message: Minibed, G_full: Union[nx.DiGraph, CSRGraph]
+) -> dict:
+    """Fingerprints of the GFA and BED files, the inputs the walks and the cached bubble solutions depend on.
+    Files are fingerprinted by size, mtime and a hash of their ends, a graph or BED built without a file by the digest of its content.
+    """
+    inputs = {}
+    for name, file_path in (
+        ("gfa", gfa_message.get_file_path()),
+        ("bed", bed_message.filePath),
+    ):
+        if file_path is None:
+            return {"graph": _graph_digest(bed_message, G_full)}
+        size, mtime_ns, digest = file_fingerprint(file_path)
+        inputs[name] = [size, mtime_ns, digest.hex()]
+    return inputs
+
+
+# Bump when a change of the search gives other walks, the keys of the sample walk cache depend on it
+_SOLVER_VERSION = 1
+_MANIFEST_SUFFIX = ".manifest"
+_MANIFEST_FORMAT = "SimPG walk manifest"
+_MANIFEST_VERSION = 1
+
+
+def _walk_manifest(inputs: dict, use_paths: bool, budget: _SearchBudget) -> dict:
+    """Input fingerprints (see `_walk_inputs`) and settings the walks depend on, a resume only appends to walks written under the same manifest"""
+    return {
+        "format": _MANIFEST_FORMAT,
+        "version": _MANIFEST_VERSION,
+        "inputs": inputs,
+        "settings": {
+            "use_paths": use_paths,
+            "search_max_states": budget.max_states,
+            "search_time_limit": budget.time_limit,
+        },
+    }
+
+
+def _sample_walk_key(manifest: dict, sample_name: str) -> str:
+    """Key of a sample walk in the sample walk cache, a digest of the input fingerprints and settings of the manifest, the solver version and the sample"""
+    return hashlib.blake2b(
+        json.dumps(
+            [_SOLVER_VERSION, manifest["inputs"], manifest["settings"], sample_name]
+        ).encode("utf-8"),
+        digest_size=16,
+    ).hexdigest()
+
+
+def _read_manifest(file_path: str) -> Optional[dict]:
+    try:
+        with open(file_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_manifest(file_path: str, manifest: dict) -> None:
+    tmp_path = f"{file_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, file_path)
+
+
+def _walk_from_paths(
+    gfa_message: Minigfa, sample_name: str
 ) -> None | List[Tuple[str, str]]:
+    """Read the walk of a sample from its W-lines or P-lines, None if the GFA file has none for it.
+
+    The lines are concatenated in file order, a line that mostly steps through reverse segments is reversed first,
+    so that every part runs along the reference strand like the walks found in the graph.
+    """
+    walk: List[Tuple[str, str]] = []
+    for path in gfa_message.get_paths_of_sample(sample_name):
+        if 2 * sum(orient == "-" for _, orient in path) > len(path):
+            path = [
+                (segID, "+" if orient == "-" else "-")
+                for segID, orient in reversed(path)
+            ]
+        walk.extend(path)
+    return walk or None
 
-    def get_SR_by_sample_name() -> int:
-        for segID in gfa_message.get_all_segID():
-            if gfa_message.get_source_sample(segID) == sample_name:
-                # print(gfa_message.get_SRank(segID))
-                return gfa_message.get_SRank(segID)
-        return -1
 
-    Genome_Sequencing_with_segment: List[Tuple[str, str]] = []
-    target_SR = get_SR_by_sample_name()
+def _simulate_sample_path(
+    gfa_message: Minigfa,
+    bed_message: Minibed,
+    G_full: Union[nx.DiGraph, CSRGraph],
+    sample_name: str,
+    cache: Optional[_SolutionCache] = None,
+    budget: _SearchBudget = _SearchBudget(),
+    use_paths: bool = False,
+) -> None | List[Tuple[str, str]] | dict[int, List[Tuple[str, str]]]:
+    """Return the walk of a sample as its alleles, the walks through the bubbles where it leaves the linear reference
+    (see `WalkWriter.add`), or as the list of its nodes when it is read from the W-lines or P-lines
+    """
+
+    if use_paths:
+        walk = _walk_from_paths(gfa_message, sample_name)
+        if walk is not None:
+            return walk
+    alleles: dict[int, List[Tuple[str, str]]] = {}
+    target_SR = gfa_message.get_SRank_by_sample(sample_name)
     if target_SR == -1:
         logger.warning(f"No target_SR for {sample_name}")
         return None
-    sources, sinks = bed_message.get_linear_sources_and_sinks()
-    last_chr = object()
-    for chr, _, _, _, list_of_segments in bed_message:
-        cur_chr = chr
-        if last_chr != cur_chr:
-            Genome_Sequencing_with_segment.append((sources[chr], "+"))
-            last_chr = cur_chr
+    bubbles_with_SR = _get_bubbles_with_SR(gfa_message, bed_message, target_SR)
+    for bubble in sorted(bubbles_with_SR):
+        list_of_segments = bed_message.get_bubble(bubble)[4]
         list_of_segments_double = [
             (x, sign) for x in list_of_segments for sign in ("+", "-")
         ]
-        tempG = G_full.subgraph(list_of_segments_double).copy()
+        tempG = _bubble_subgraph(G_full, list_of_segments_double)
         has_node = any(attrs["SR"] == target_SR for _, attrs in tempG.nodes(data=True))
         has_edge = any(
             attrs["SR"] == target_SR for _, _, attrs in tempG.edges(data=True)
         )
         if not (has_node or has_edge):
-            linear_segments = _generate_sequence(
-                list_of_segments[0], list_of_segments[-1]
-            )
-            Genome_Sequencing_with_segment.extend(linear_segments[1:])
             continue
 
         # 1. Delete nodes whose attribute SR is greater than the threshold
@@ -254,55 +707,29 @@ def _simulate_sample_path(
         ]
         for u, v in edges_to_remove:
             tempG.remove_edge(u, v)
-        start_segID = (list_of_segments[0], "+")
-        end_segID = (list_of_segments[-1], "+")
-        logger.debug(f"{start_segID} to {end_segID}")
         required_nodes = {v for v, d in tempG.nodes(data=True) if d["SR"] == target_SR}
         required_edges = {
             (u, v) for u, v, d in tempG.edges(data=True) if d["SR"] == target_SR
         }
-        if (
-            nx.number_of_edges(tempG)
-            * (2 ** len(required_nodes))
-            * (2 ** len(required_edges))
-            < 300000000000
-        ):
-            path = _find_constrained_path(tempG, start_segID, end_segID, target_SR)
-        else:
-            logger.info(
-                f"Preparing an approximation algorithm from {start_segID} to {end_segID}"
+        key = path = None
+        if cache is not None and (required_nodes or required_edges):
+            key = (
+                bubble,
+                tempG.number_of_nodes(),
+                tempG.number_of_edges(),
+                frozenset(required_nodes),
+                frozenset(required_edges),
             )
-            path = None
+            path = cache.get(key)
         if path is None:
-            # logger.warning(f"from {start_segID} to {end_segID} don't find path")
-            if (target_SR == 11 and start_segID == ("s238674", "+")) or (
-                target_SR == 3 and start_segID == ("s411304", "+")
-            ):
-                linear_segments = _generate_sequence(
-                    list_of_segments[0], list_of_segments[-1]
-                )
-                Genome_Sequencing_with_segment.extend(linear_segments[1:])
-                logger.info(f"{len(required_nodes)} ->{0},{len(required_edges)} -> {0}")
-                continue
-            path, uncovered_nodes_count, uncovered_edges_count = _prize_collecting_path(
-                tempG, start_segID, end_segID, required_nodes, required_edges, 4
+            path, cacheable = _solve_bubble(
+                tempG, list_of_segments, required_nodes, required_edges, budget
             )
-            if path is None:
-                logger.error(
-                    f"Approximation algorithm fails from {start_segID} to {end_segID}"
-                )
-            else:
-                logger.debug(
-                    f"Total nodes:{len(required_nodes)},uncovered nodes:{uncovered_nodes_count},total edges:{len(required_edges)},uncovered edges:{uncovered_edges_count}"
-                )
-                Genome_Sequencing_with_segment.extend(path[1:])
-        else:
-            Genome_Sequencing_with_segment.extend(path[1:])
-    if Genome_Sequencing_with_segment is None:
-        logging.error("This Genome_Sequencing_with_segment is None")
-        return None
-    else:
-        return Genome_Sequencing_with_segment
+            if key is not None and cacheable:
+                cache.put(key, path)
+        if not _is_reference_allele(path, list_of_segments):
+            alleles[bubble] = path
+    return alleles
 
 
 def _save_to_tmp(filename: str) -> str:
@@ -321,26 +748,376 @@ def _save_to_tmp(filename: str) -> str:
     return file_path
 
 
+# Read-only inputs of the walk workers, set once per process by the pool initializer
+_walk_worker_state: Optional[
+    tuple[
+        Minigfa,
+        Minibed,
+        Union[nx.DiGraph, CSRGraph],
+        Optional[_SolutionCache],
+        _SearchBudget,
+        bool,
+    ]
+] = None
+
+
+def _init_walk_worker(
+    gfa_message: Minigfa,
+    bed_message: Minibed,
+    G_full: Union[nx.DiGraph, CSRGraph],
+    cache: Optional[_SolutionCache],
+    budget: _SearchBudget,
+    use_paths: bool,
+) -> None:
+    global _walk_worker_state
+    if cache is not None:
+        cache.track_new()
+    _walk_worker_state = (gfa_message, bed_message, G_full, cache, budget, use_paths)
+
+
+def _simulate_sample_in_worker(
+    sample_name: str,
+) -> tuple[
+    tuple[str, None | List[Tuple[str, str]] | dict[int, List[Tuple[str, str]]]],
+    Optional[tuple],
+]:
+    """Extract the walk of one sample from the inputs inherited by the worker, with the new cache entries"""
+    gfa_message, bed_message, G_full, cache, budget, use_paths = _walk_worker_state
+    logger.info(f"Begin simulate {sample_name} genome sequencing with segment")
+    walk = _simulate_sample_path(
+        gfa_message, bed_message, G_full, sample_name, cache, budget, use_paths
+    )
+    return (sample_name, walk), None if cache is None else cache.take_new()
+
+
+def _simulate_population_parallel(
+    gfa_message: Minigfa,
+    bed_message: Minibed,
+    G_full: Union[nx.DiGraph, CSRGraph],
+    samples: list[str],
+    writer: WalkWriter,
+    workers: int,
+    cache: Optional[_SolutionCache] = None,
+    budget: _SearchBudget = _SearchBudget(),
+    use_paths: bool = False,
+    sample_cache: Optional[_WalkCache] = None,
+    keys: Optional[dict[str, str]] = None,
+) -> None:
+    """Extract the walks in worker processes, the parent is the only one adding them to `writer`.
+    A sample found in `sample_cache` under its key in `keys` is copied from it at its place instead, the walks extracted are cached.
+    """
+    if keys is None:
+        keys = {}
+    cached = set[str]()
+    if sample_cache is not None:
+        cached = {
+            sample_name for sample_name in samples if keys[sample_name] in sample_cache
+        }
+    missing = [sample_name for sample_name in samples if sample_name not in cached]
+    workers = max(1, min(workers, len(missing)))
+    logger.info(f"Simulate {len(missing)} sample walks in {workers} processes")
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_walk_worker,
+        initargs=(gfa_message, bed_message, G_full, cache, budget, use_paths),
+    ) as executor:
+        # map yields in submission order, so the walks are written as soon as every earlier sample is done
+        results = executor.map(_simulate_sample_in_worker, missing)
+        for sample_name in samples:
+            if sample_name in cached:
+                if sample_cache.copy_to(keys[sample_name], writer, sample_name):
+                    continue
+                # Evicted by another run since, extract it here
+                record = (
+                    sample_name,
+                    _simulate_sample_path(
+                        gfa_message,
+                        bed_message,
+                        G_full,
+                        sample_name,
+                        cache,
+                        budget,
+                        use_paths,
+                    ),
+                )
+                delta = None
+            else:
+                record, delta = next(results)
+            writer.add(*record)
+            if sample_cache is not None:
+                sample_cache.put(keys[sample_name], writer)
+            if delta is not None and cache is not None:
+                cache.merge(delta)
+            del record
+
+
+class _BubbleView:
+    """The subgraph of one bubble, extracted once and shared by every sample.
+
+    Nodes and edges are kept in the order of the subgraph together with their ranks, so the view of a sample is the
+    same graph that removing the nodes and edges whose SR is greater than its SR from a copy of the subgraph gives.
+    """
+
+    def __init__(self, tempG: nx.DiGraph) -> None:
+        self.nodes = list(tempG.nodes(data=True))
+        self.edges = list(tempG.edges(data=True))
+        node_SR = {n: attrs["SR"] for n, attrs in self.nodes}
+        # An edge is kept while its own SR and the SR of both of its nodes are at most the sample's SR
+        self.edge_rank = [
+            max(attrs["SR"], node_SR[u], node_SR[v]) for u, v, attrs in self.edges
+        ]
+        self.node_ranks = sorted(node_SR.values())
+        self.edge_ranks = sorted(self.edge_rank)
+        self.ranks = set(node_SR.values())
+        self.ranks.update(attrs["SR"] for _, _, attrs in self.edges)
+        self.required_nodes = dict[int, set]()
+        for n, SR in node_SR.items():
+            self.required_nodes.setdefault(SR, set()).add(n)
+        self.required_edges = dict[int, set]()
+        for (u, v, attrs), rank in zip(self.edges, self.edge_rank):
+            if attrs["SR"] == rank:
+                self.required_edges.setdefault(rank, set()).add((u, v))
+
+    def solve(
+        self,
+        bubble: int,
+        list_of_segments: list[str],
+        target_SR: int,
+        cache: Optional[_SolutionCache] = None,
+        budget: _SearchBudget = _SearchBudget(),
+    ) -> list[tuple[str, str]]:
+        """Return the walk of the sample whose SR is `target_SR` through the bubble, without its first node"""
+        required_nodes = self.required_nodes.get(target_SR, set())
+        required_edges = self.required_edges.get(target_SR, set())
+        key = None
+        if cache is not None and (required_nodes or required_edges):
+            key = (
+                bubble,
+                bisect_right(self.node_ranks, target_SR),
+                bisect_right(self.edge_ranks, target_SR),
+                frozenset(required_nodes),
+                frozenset(required_edges),
+            )
+            path = cache.get(key)
+            if path is not None:
+                return path
+        tempG = nx.DiGraph()
+        tempG.add_nodes_from(
+            (n, attrs) for n, attrs in self.nodes if attrs["SR"] <= target_SR
+        )
+        tempG.add_edges_from(
+            edge for edge, rank in zip(self.edges, self.edge_rank) if rank <= target_SR
+        )
+        path, cacheable = _solve_bubble(
+            tempG, list_of_segments, required_nodes, required_edges, budget
+        )
+        if key is not None and cacheable:
+            cache.put(key, path)
+        return path
+
+
+def _chromosome_runs(bed_message: Minibed) -> list[range]:
+    """Split the bubbles into runs of consecutive BED lines on the same chromosome"""
+    runs = list[range]()
+    start, last_chr = 0, object()
+    for bubble, (chr, _, _, _, _) in enumerate(bed_message):
+        if chr != last_chr:
+            if bubble > start:
+                runs.append(range(start, bubble))
+            start, last_chr = bubble, chr
+    if len(bed_message) > start:
+        runs.append(range(start, len(bed_message)))
+    return runs
+
+
+def _simulate_bubble_run(
+    bed_message: Minibed,
+    G_full: Union[nx.DiGraph, CSRGraph],
+    targets: list[tuple[int, set[int]]],
+    bubbles: range,
+    cache: Optional[_SolutionCache] = None,
+    budget: _SearchBudget = _SearchBudget(),
+) -> list[dict[int, list[tuple[str, str]]]]:
+    """Walk every sample through a run of bubbles of one chromosome, one bubble at a time, and return the alleles of each sample
+    (the walks through the bubbles where it leaves the reference).
+
+    Args:
+        targets (list[tuple[int, set[int]]]): SR of each sample and the bubbles that may hold its nodes or edges.
+        bubbles (range): Consecutive bubbles on the same chromosome.
+    """
+    chr = bed_message.get_bubble(bubbles.start)[0]
+    logger.info(f"Begin simulate {len(targets)} samples on {chr}")
+    parts = [{} for _ in targets]
+    for bubble in bubbles:
+        list_of_segments = bed_message.get_bubble(bubble)[4]
+        view = None
+        for part, (target_SR, bubbles_with_SR) in zip(parts, targets):
+            if bubble in bubbles_with_SR:
+                if view is None:
+                    view = _BubbleView(
+                        _bubble_subgraph(
+                            G_full,
+                            [
+                                (x, sign)
+                                for x in list_of_segments
+                                for sign in ("+", "-")
+                            ],
+                        )
+                    )
+                if target_SR in view.ranks:
+                    path = view.solve(
+                        bubble, list_of_segments, target_SR, cache, budget
+                    )
+                    if not _is_reference_allele(path, list_of_segments):
+                        part[bubble] = path
+    return parts
+
+
+# Read-only inputs of the bubble workers, set once per process by the pool initializer
+_bubble_worker_state: Optional[
+    tuple[
+        Minibed,
+        Union[nx.DiGraph, CSRGraph],
+        list[tuple[int, set[int]]],
+        Optional[_SolutionCache],
+        _SearchBudget,
+    ]
+] = None
+
+
+def _init_bubble_worker(
+    bed_message: Minibed,
+    G_full: Union[nx.DiGraph, CSRGraph],
+    targets: list[tuple[int, set[int]]],
+    cache: Optional[_SolutionCache],
+    budget: _SearchBudget,
+) -> None:
+    global _bubble_worker_state
+    if cache is not None:
+        cache.track_new()
+    _bubble_worker_state = (bed_message, G_full, targets, cache, budget)
+
+
+def _simulate_bubble_run_in_worker(
+    bubbles: range,
+) -> tuple[list[list[tuple[str, str]]], Optional[tuple]]:
+    bed_message, G_full, targets, cache, budget = _bubble_worker_state
+    parts = _simulate_bubble_run(bed_message, G_full, targets, bubbles, cache, budget)
+    return parts, None if cache is None else cache.take_new()
+
+
+def _simulate_population_by_bubble(
+    gfa_message: Minigfa,
+    bed_message: Minibed,
+    G_full: Union[nx.DiGraph, CSRGraph],
+    samples: list[str],
+    workers: int = 1,
+    cache: Optional[_SolutionCache] = None,
+    budget: _SearchBudget = _SearchBudget(),
+    use_paths: bool = False,
+) -> dict[str, None | List[Tuple[str, str]] | dict[int, List[Tuple[str, str]]]]:
+    """Extract the walks of all samples bubble by bubble, the subgraph of a bubble is built once for the population.
+    With `workers`, the chromosomes are walked in worker processes.
+    """
+    names = list[str]()
+    targets = list[tuple[int, set[int]]]()
+    walks: dict[
+        str, None | List[Tuple[str, str]] | dict[int, List[Tuple[str, str]]]
+    ] = {}
+    for sample_name in dict.fromkeys(samples):
+        if use_paths:
+            walk = _walk_from_paths(gfa_message, sample_name)
+            if walk is not None:
+                walks[sample_name] = walk
+                continue
+        target_SR = gfa_message.get_SRank_by_sample(sample_name)
+        if target_SR == -1:
+            logger.warning(f"No target_SR for {sample_name}")
+            walks[sample_name] = None
+            continue
+        names.append(sample_name)
+        targets.append(
+            (target_SR, _get_bubbles_with_SR(gfa_message, bed_message, target_SR))
+        )
+    for sample_name in names:
+        walks[sample_name] = {}
+    if not targets:
+        return walks
+    runs = _chromosome_runs(bed_message)
+    if workers > 1 and len(runs) > 1:
+        executor = ProcessPoolExecutor(
+            max_workers=min(workers, len(runs)),
+            initializer=_init_bubble_worker,
+            initargs=(bed_message, G_full, targets, cache, budget),
+        )
+        results = executor.map(_simulate_bubble_run_in_worker, runs)
+    else:
+        executor = None
+        results = (
+            (
+                _simulate_bubble_run(
+                    bed_message, G_full, targets, bubbles, cache, budget
+                ),
+                None,
+            )
+            for bubbles in runs
+        )
+    try:
+        for parts, delta in results:
+            for sample_name, part in zip(names, parts):
+                walks[sample_name].update(part)
+            if delta is not None:
+                cache.merge(delta)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return walks
+
+
 def simulate_population_every_walk(
     gfa_message: Minigfa,
     bed_message: Minibed,
-    G_full: nx.DiGraph,
+    G_full: Union[nx.DiGraph, CSRGraph],
     population: list[str] | str,
     saved_file_path: Optional[str] = None,
+    workers: int = 1,
+    walk_engine: str = "sample",
+    cache_size: int = 65536,
+    cache_file: Optional[str] = None,
+    search_max_states: int = 1_000_000,
+    search_time_limit: float = 30.0,
+    use_paths: bool = False,
+    resume: bool = False,
+    sample_cache_dir: Optional[str] = None,
+    sample_cache_max_size: int = 4 << 30,
 ) -> None:
     """
     Without the need for original individual genome sequence information involved in building a pan-genome, this function can extract the path of individual genome sequences mapped in the graph.
-    Notice:This function does not return anything.It will save the walking route of each sample in `saved_file_path` file.
+    Notice:This function does not return anything.It will save the walking route of each sample in `saved_file_path` file, read it with `open_walks`.
 
     Args:
         gfa_message (Minigfa): Composite data storing GFA file information.
         bed_message (Minibed): Composite data storing Bed file information.
-        G_full (nx.DiGraph):Pan-genome graph
+        G_full (nx.DiGraph | CSRGraph):Pan-genome graph
         population (list[str] | str):Input a list of sample names, or a text file with only one sample name per line
-        saved_file_path (str):Save file location.By default, it is saved in `my_walks.pl` in the `/tmp` folder of the working directory.
+        saved_file_path (str):Save file location, the walks are written as a walk store (see `open_walks`).By default, it is saved in `my_walks.spw` in the `/tmp` folder of the working directory.
+        workers (int):Number of worker processes. The samples are extracted in parallel over the graph inherited by the workers, and the walks are still written in the order of `population`. Defaults to 1.
+        walk_engine (str):"sample" extracts the samples one after another. "bubble" walks all samples through a bubble before moving on, so the subgraph of each bubble is built once for the population, at the cost of keeping every walk in memory until the end. Both give the same walks. Defaults to "sample".
+        cache_size (int):Number of bubble solutions kept in the least-recently-used solution cache, 0 disables the cache. Defaults to 65536.
+        cache_file (str):If given, the solution cache is loaded from this file when it was saved for the same GFA and BED files, and saved to it at the end, so later runs reuse the solutions. Defaults to None.
+        search_max_states (int):Most states the exact search of a cyclic bubble may discover, which bounds its memory. Defaults to 1000000.
+        search_time_limit (float):Most seconds the exact search of a cyclic bubble may run. When a limit is reached, the discovered path passing the most required nodes and edges is used, and the coverage is logged. Defaults to 30.0.
+        use_paths (bool):Read the walk of a sample from its W-lines or P-lines instead of searching the graph, when `gfa_message` was built with `with_paths=True` and the file has such lines for the sample (named `sample` or `sample#...`). The other samples are still searched. Defaults to False.
+        resume (bool):Checkpoint the walks as they are written, and continue the extraction written to `saved_file_path` by an earlier run with `resume=True` that was interrupted, or add the samples it lacks to the store it finished. The complete walks are kept, a walk cut off by the interruption is dropped, and only the samples not in the file are extracted. Such a run records the fingerprints of the GFA and BED files and the search settings in `saved_file_path + ".manifest"`, if they do not match the walks are extracted again from scratch. Without it the walks are written without checkpoints and cannot be resumed. Defaults to False.
+        sample_cache_dir (str):If given, a directory caching the walk of every sample extracted, shared by the runs on the same GFA and BED files, with any population. A sample found there is copied into `saved_file_path` instead of being extracted again. Its entry is keyed by the fingerprints of the GFA and BED files, the settings above that change a walk, the version of the search and the sample name. Defaults to None.
+        sample_cache_max_size (int):Most bytes the files of `sample_cache_dir` may take, the least recently used walks are removed beyond it. Defaults to 4 GiB.
+
+    Raises:
+        ValueError: Unknown `walk_engine`.
     """
+    if walk_engine not in ("sample", "bubble"):
+        raise ValueError(f"Unknown walk_engine {walk_engine!r}")
     import gc
-    import time
 
     samples = list[str]()
     if isinstance(population, str):
@@ -353,22 +1130,138 @@ def simulate_population_every_walk(
     else:
         samples = population
     if saved_file_path is None:
-        saved_file_path = _save_to_tmp("my_walks.pl")
+        saved_file_path = _save_to_tmp("my_walks.spw")
     starttime = time.time()
-    with open(saved_file_path, "wb") as f:
-        for sample_name in samples:
-            logger.info(f"Begin simulate {sample_name} genome sequencing with segment")
-            Genome_Sequencing_with_segment_out = _simulate_sample_path(
-                gfa_message, bed_message, G_full, sample_name
+    budget = _SearchBudget(search_max_states, search_time_limit)
+    use_paths = use_paths and gfa_message.has_paths()
+    inputs = _walk_inputs(gfa_message, bed_message, G_full)
+    cache = fingerprint = None
+    if cache_size > 0:
+        cache = _SolutionCache(cache_size)
+        if cache_file is not None:
+            fingerprint = json.dumps(inputs)
+            cache.load(cache_file, fingerprint)
+    manifest_path = saved_file_path + _MANIFEST_SUFFIX
+    manifest = _walk_manifest(inputs, use_paths, budget)
+    sample_cache = None
+    keys = dict[str, str]()
+    if sample_cache_dir is not None:
+        sample_cache = _WalkCache(sample_cache_dir, sample_cache_max_size)
+        keys = {
+            sample_name: _sample_walk_key(manifest, sample_name)
+            for sample_name in samples
+        }
+    checkpoint = resume
+    if resume:
+        saved_manifest = _read_manifest(manifest_path)
+        if saved_manifest != manifest:
+            # Without a manifest no checkpointed run wrote here yet, the extraction starts fresh
+            if saved_manifest is not None:
+                logger.warning(
+                    f"The walks in {saved_file_path} were not extracted from the same GFA and BED files and settings, extract them again"
+                )
+            resume = False
+    else:
+        # The walks written now are not the ones a stale manifest describes
+        try:
+            os.remove(manifest_path)
+        except FileNotFoundError:
+            pass
+    # With checkpoints every walk is synced to disk as soon as it is written, so an interrupted run can be resumed
+    with WalkWriter(
+        saved_file_path, bed_message, checkpoint=checkpoint, resume=resume
+    ) as writer:
+        if checkpoint and not resume:
+            # The manifest is written once the checkpoint files of an earlier run have been truncated
+            _write_manifest(manifest_path, manifest)
+        done = set(writer.samples())
+        if done:
+            samples = [
+                sample_name for sample_name in samples if sample_name not in done
+            ]
+            logger.info(
+                f"Resume {saved_file_path}: {len(done)} sample walks kept, {len(samples)} left"
             )
-            pickle.dump(
-                (sample_name, Genome_Sequencing_with_segment_out),
-                f,
-                protocol=pickle.HIGHEST_PROTOCOL,
+        if walk_engine == "bubble":
+            walks = _simulate_population_by_bubble(
+                gfa_message,
+                bed_message,
+                G_full,
+                [
+                    sample_name
+                    for sample_name in samples
+                    if sample_cache is None or keys[sample_name] not in sample_cache
+                ],
+                workers,
+                cache,
+                budget,
+                use_paths,
+            )
+            for sample_name in samples:
+                if sample_name not in walks:
+                    if sample_cache.copy_to(keys[sample_name], writer, sample_name):
+                        continue
+                    # Evicted by another run since, extract it alone
+                    walks[sample_name] = _simulate_sample_path(
+                        gfa_message,
+                        bed_message,
+                        G_full,
+                        sample_name,
+                        cache,
+                        budget,
+                        use_paths,
+                    )
+                writer.add(sample_name, walks[sample_name])
+                if sample_cache is not None:
+                    sample_cache.put(keys[sample_name], writer)
+        elif workers > 1 and len(samples) > 1:
+            _simulate_population_parallel(
+                gfa_message,
+                bed_message,
+                G_full,
+                samples,
+                writer,
+                workers,
+                cache,
+                budget,
+                use_paths,
+                sample_cache,
+                keys,
             )
-            # Release memory immediately after processing
-            del Genome_Sequencing_with_segment_out
-            gc.collect()
+        else:
+            for sample_name in samples:
+                if sample_cache is not None and sample_cache.copy_to(
+                    keys[sample_name], writer, sample_name
+                ):
+                    continue
+                logger.info(
+                    f"Begin simulate {sample_name} genome sequencing with segment"
+                )
+                Genome_Sequencing_with_segment_out = _simulate_sample_path(
+                    gfa_message,
+                    bed_message,
+                    G_full,
+                    sample_name,
+                    cache,
+                    budget,
+                    use_paths,
+                )
+                writer.add(sample_name, Genome_Sequencing_with_segment_out)
+                if sample_cache is not None:
+                    sample_cache.put(keys[sample_name], writer)
+                # Release memory immediately after processing
+                del Genome_Sequencing_with_segment_out
+                gc.collect()
+    if cache is not None:
+        logger.info(
+            f"Bubble solution cache: {cache.hits} hits, {cache.misses} misses, {len(cache)} entries"
+        )
+        if cache_file is not None:
+            cache.save(cache_file, fingerprint)
+    if sample_cache is not None:
+        logger.info(
+            f"Sample walk cache: {sample_cache.hits} hits, {sample_cache.misses} misses"
+        )
     logger.info(
         "Finish get every sample walk in %0.2f seconds." % (time.time() - starttime)
     )
@@ -4,8 +4,8 @@ import random
 from . import logger
 import json
 from ..classes import Minigfa
-from typing import Optional
-import re
+from ..graph import CSRGraph, has_path, descendants, weakly_connected_components
+from typing import Optional, Union
 import os
 import time
 
@@ -108,7 +108,7 @@ def _random_walk_with_loaded_weights(
         raise ValueError(f"The ending point {t!r} is not in the graph G")
     if s == t:
         return [s]
-    if not nx.has_path(G, s, t):
+    if not has_path(G, s, t):
         raise nx.NetworkXNoPath(
             f"There does not exist any path from {s!r} to {t!r} in the graph."
         )
@@ -119,7 +119,7 @@ def _random_walk_with_loaded_weights(
     # Precompute “which nodes can reach t”
     #    Using the reverse graph, do a DFS/BFS from t
     G_rev = G.reverse(copy=False)
-    reachable_to_t = set(nx.descendants(G_rev, t))
+    reachable_to_t = set(descendants(G_rev, t))
     reachable_to_t.add(t)
 
     while True:
@@ -188,7 +188,7 @@ def _random_walk_find_path_acyclic(
         return [s]
 
     # You can quickly determine: if s cannot reach t, there is no need to start a random walk
-    if not nx.has_path(G, s, t):
+    if not has_path(G, s, t):
         raise nx.NetworkXNoPath(
             f"There does not exist any path from {s!r} to {t!r} in the graph."
         )
@@ -273,7 +273,8 @@ def _reverse_complement(seq: str) -> str:
 
 
 def _get_chr_graph(
-    Pangenome_graph: nx.DiGraph, weak_comps: list[list[tuple[str, str]]]
+    Pangenome_graph: Union[nx.DiGraph, CSRGraph],
+    weak_comps: list[list[tuple[str, str]]],
 ):
     for idx, c in enumerate(weak_comps, start=1):
         yield idx, Pangenome_graph.subgraph(c).copy()
@@ -301,21 +302,16 @@ def _write_vcf(fileVCF, parts: list, gfa_messsage: Minigfa):
             segments.append(lst[start : len(lst)])
         return segments
 
+    linear_reference = gfa_messsage.get_linear_reference()
     Mutation_include = split_by_predicate(
         parts,
-        lambda seq: gfa_messsage.get_source_sample(seq[0])
-        == gfa_messsage.get_linear_reference()
-        and seq[1] == "+",
+        lambda seq: seq[1] == "+"
+        and gfa_messsage.get_source_sample(seq[0]) == linear_reference,
     )
     for mutation in Mutation_include:
-        # Regular expression processing
-        start = re.search(r"\d+", mutation[0][0])
-        end = re.search(r"\d+", mutation[-1][0])
-        if start and end:
-            num_start = int(start.group())
-            num_end = int(end.group())
-        else:
-            raise KeyError("re failed")
+        # Interned segment IDs are the numbers of the linear reference segments
+        num_start = gfa_messsage.get_segment_id(mutation[0][0])
+        num_end = gfa_messsage.get_segment_id(mutation[-1][0])
         if (len(mutation) == 1) or (len(mutation) == 2 and num_start + 1 == num_end):
             continue
         if num_start > num_end:
@@ -324,7 +320,9 @@ def _write_vcf(fileVCF, parts: list, gfa_messsage: Minigfa):
             )
             continue
         fileVCF.write(f"({mutation[0][0]},{mutation[-1][0]})\t")
-        lst_linear = [f"s{i}" for i in range(num_start, num_end + 1)]
+        lst_linear = [
+            gfa_messsage.get_segment_name(i) for i in range(num_start, num_end + 1)
+        ]
         fileVCF.write("(" + lst_linear[0] + "+")
         for x in lst_linear[1:]:
             fileVCF.write("," + x + "+")
@@ -346,7 +344,7 @@ def _ensure_dir_for_file(file_path):
 
 # todo
 def simulate_Whole_Genome_Sequencing_for_population(
-    Pangenome_graph: nx.DiGraph,
+    Pangenome_graph: Union[nx.DiGraph, CSRGraph],
     gfa_message: Minigfa,
     coreSeg: set[tuple[str, str]],
     file_out_folder: Optional[str] = None,
@@ -359,7 +357,7 @@ def simulate_Whole_Genome_Sequencing_for_population(
     Notice: This function will generate two folders under `file_out`, namely `{population_name}_simulate_fasta` and `{population_name}_simulate_vcf`. Thefasta files and vcf files will be saved in the following folders respectively.
 
     Args:
-        Pangenome_graph (nx.DiGraph): Pan-genome graph
+        Pangenome_graph (nx.DiGraph | CSRGraph): Pan-genome graph
         gfa_message (Minigfa): Composite data storing GFA file information.
         coreSeg (set[tuple[str, str]]): A collection of core sequence nodes
         file_out_folder (str |None, optional): Result output location. By default, the output is in the working directory.
@@ -378,7 +376,7 @@ def simulate_Whole_Genome_Sequencing_for_population(
         population_name = "my"
     for Number in range(1, sim_num + 1):
         logger.info(f"start simulate {Number:03d}")
-        weak_comps = list(nx.weakly_connected_components(Pangenome_graph))
+        weak_comps = list(weakly_connected_components(Pangenome_graph))
         _ensure_dir_for_file(
             file_path=f"{file_out_folder}/{population_name}_simulate_fasta/{population_name}_simulate{Number:03d}.fa"
         )
@@ -405,7 +403,7 @@ def simulate_Whole_Genome_Sequencing_for_population(
                     fileFa.write(f">chr{idx}\n")
                 coreSeg_inchr = coreSeg & {n for n in chr_graph.nodes()}
                 sorted_coreSeg_inchr = sorted(
-                    coreSeg_inchr, key=lambda item: int(item[0][1:])
+                    coreSeg_inchr, key=lambda item: gfa_message.get_segment_id(item[0])
                 )
                 fileFa.write(gfa_message.get_seq(sorted_coreSeg_inchr[0][0]))
                 for u, v in zip(sorted_coreSeg_inchr[:-1], sorted_coreSeg_inchr[1:]):
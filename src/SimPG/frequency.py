@@ -0,0 +1,209 @@
+"""Population frequency of the oriented nodes, the counts core detection derives the core nodes from"""
+
+from array import array
+from .classes import Minigfa, _parse_seg_num
+import os
+import struct
+import sys
+
+__all__ = ["NodeFrequency", "open_node_frequency"]
+
+_FREQ_MAGIC = b"SPGNFREQ"
+_FREQ_VERSION = 1
+# magic, version, byte order, typecode of the counts, number of walks, number of `s<int>` segment IDs,
+# lengths in bytes of the counts, the reference flags, the names of the other segments and the linear reference sample
+_FREQ_HEADER = struct.Struct("<8sIIc3xqqqqqq")
+
+
+class NodeFrequency:
+    """
+    Number of walks of a population passing each oriented node, indexed by `2 * segment id + strand` with the segment IDs
+    interned like `Minigfa.get_segment_id`, and the number of walks. A walk counts a node once however often it passes it.
+
+    The segments of the linear reference sample are flagged, so that the core nodes at any threshold are derived from the
+    counts without the GFA file or the walks. `get_coreSeg_in_Pangenome` builds it, `save` and `open_node_frequency` keep it.
+
+    Examples:
+            >>> frequency = open_node_frequency("tmp/myNodeFrequency.spnf")
+            >>> core = frequency.get_core()  # the core nodes of get_coreSeg_in_Pangenome
+            >>> soft_core = frequency.get_core(0.95)  # passed by at least 95% of the walks
+    """
+
+    def __init__(
+        self,
+        counts: array,
+        n_walks: int,
+        n_numbered: int,
+        odd_names: list[str],
+        reference: bytearray,
+        linear_reference: str,
+    ) -> None:
+        self.counts = counts
+        self.n_walks = n_walks
+        self.linear_reference = linear_reference
+        self._n_numbered = n_numbered
+        self._odd_names = odd_names
+        self._odd_ids = {name: k for k, name in enumerate(odd_names)}
+        self._reference = reference
+
+    @classmethod
+    def from_counts(
+        cls, gfa_message: Minigfa, counts: array, n_walks: int
+    ) -> "NodeFrequency":
+        """Wrap the counts of the oriented nodes interned by `gfa_message`, flagging the segments of its linear reference"""
+        linear_reference = gfa_message.get_linear_reference()
+        reference = bytearray(gfa_message.get_segment_id_bound())
+        for seg_id in gfa_message.get_segment_id_by_sample(linear_reference):
+            reference[seg_id] = 1
+        odd_names = gfa_message.get_other_segIDs()
+        return cls(
+            counts,
+            n_walks,
+            len(reference) - len(odd_names),
+            odd_names,
+            reference,
+            linear_reference,
+        )
+
+    def _segment_id(self, segID: str) -> int:
+        num = _parse_seg_num(segID)
+        if num >= 0:
+            return num
+        return self._n_numbered + self._odd_ids[segID]
+
+    def _get_node(self, node: int) -> tuple[str, str]:
+        seg_id = node >> 1
+        segID = (
+            f"s{seg_id}"
+            if seg_id < self._n_numbered
+            else self._odd_names[seg_id - self._n_numbered]
+        )
+        return segID, "-" if node & 1 else "+"
+
+    def get_count(self, segID: str, orient: str) -> int:
+        """Return the number of walks passing the oriented node (segID, orient)
+
+        Raises:
+            KeyError: `segID` is not a segment of the GFA file the counts were taken on.
+        """
+        node = 2 * self._segment_id(segID) + (orient == "-")
+        if node >= len(self.counts):
+            raise KeyError(segID)
+        return self.counts[node]
+
+    def get_frequency(self, segID: str, orient: str) -> float:
+        """Return the fraction of the walks passing the oriented node (segID, orient), 0.0 for an empty population"""
+        return self.get_count(segID, orient) / self.n_walks if self.n_walks else 0.0
+
+    def get_core(
+        self, threshold: float = 1.0, reference_only: bool = True
+    ) -> set[tuple[str, str]]:
+        """
+        Return the oriented nodes passed by at least a fraction `threshold` of the walks, none for an empty population.
+
+        Args:
+            threshold (float, optional): Fraction of the walks, 1.0 keeps the nodes passed by every walk. Defaults to 1.0.
+            reference_only (bool, optional): Keep only the forward strand of the segments of the linear reference sample,
+                like `get_coreSeg_in_Pangenome`. Defaults to True.
+
+        Raises:
+            ValueError: `threshold` is not in [0, 1].
+
+        Returns:
+            set[tuple[str, str]]: The (segID, orient) of the core nodes
+        """
+        if not 0.0 <= threshold <= 1.0:
+            raise ValueError(f"threshold must be in [0, 1], got {threshold}")
+        if self.n_walks == 0:
+            return set()
+        # Rounded first so that a fraction of the population such as 0.1 * 30 is not pushed to the next count
+        min_count = -int(-round(threshold * self.n_walks, 9) // 1)
+        counts = self.counts
+        if reference_only:
+            return {
+                self._get_node(2 * seg_id)
+                for seg_id, on_reference in enumerate(self._reference)
+                if on_reference and counts[2 * seg_id] >= min_count
+            }
+        return {self._get_node(node) for node, n in enumerate(counts) if n >= min_count}
+
+    def save(self, file_path: str) -> str:
+        """Save the counts as a node frequency file read by `open_node_frequency`, return `file_path`.
+        The file is written to a temporary name and renamed, so an interrupted save leaves no partial file.
+        """
+        odd_names = "\n".join(self._odd_names).encode("utf-8")
+        linear_reference = self.linear_reference.encode("utf-8")
+        counts = memoryview(self.counts).cast("B")
+        tmp_path = f"{file_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(
+                _FREQ_HEADER.pack(
+                    _FREQ_MAGIC,
+                    _FREQ_VERSION,
+                    sys.byteorder == "little",
+                    self.counts.typecode.encode("ascii"),
+                    self.n_walks,
+                    self._n_numbered,
+                    len(counts),
+                    len(self._reference),
+                    len(odd_names),
+                    len(linear_reference),
+                )
+            )
+            f.write(counts)
+            f.write(self._reference)
+            f.write(odd_names)
+            f.write(linear_reference)
+        os.replace(tmp_path, file_path)
+        return file_path
+
+
+def open_node_frequency(file_path: str) -> NodeFrequency:
+    """
+    Read a node frequency file saved by `get_coreSeg_in_Pangenome` (or `NodeFrequency.save`).
+
+    Args:
+        file_path (str): Node frequency file location
+
+    Raises:
+        ValueError: The file is not a node frequency file, or was written by another version or on a machine with another byte order.
+
+    Returns:
+        NodeFrequency: The counts of the oriented nodes and the number of walks
+    """
+    with open(file_path, "rb") as f:
+        data = f.read()
+    if len(data) < _FREQ_HEADER.size or data[:8] != _FREQ_MAGIC:
+        raise ValueError(f"{file_path} is not a node frequency file")
+    (
+        _,
+        version,
+        little,
+        typecode,
+        n_walks,
+        n_numbered,
+        counts_size,
+        reference_size,
+        odd_size,
+        linear_size,
+    ) = _FREQ_HEADER.unpack_from(data)
+    if version != _FREQ_VERSION or little != (sys.byteorder == "little"):
+        raise ValueError(f"{file_path} was written by an incompatible SimPG")
+    offset = _FREQ_HEADER.size
+    counts = array(typecode.decode("ascii"))
+    counts.frombytes(data[offset : offset + counts_size])
+    offset += counts_size
+    reference = bytearray(data[offset : offset + reference_size])
+    offset += reference_size
+    odd_names = (
+        str(data[offset : offset + odd_size], "utf-8").split("\n") if odd_size else []
+    )
+    offset += odd_size
+    linear_reference = str(data[offset : offset + linear_size], "utf-8")
+    return NodeFrequency(
+        counts, n_walks, n_numbered, odd_names, reference, linear_reference
+    )
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,652 @@
+"""Compact array-backed directed graph, an alternative to networkx.DiGraph for pangenome-scale graphs"""
+
+from array import array
+from collections import deque
+from itertools import accumulate
+from typing import Any, Generator, Hashable, Iterable, Optional, Union
+from .classes import _parse_seg_num
+import math
+import mmap as _mmap
+import os
+import pickle
+import struct
+import sys
+import networkx as nx
+
+__all__ = [
+    "CSRGraph",
+    "has_path",
+    "descendants",
+    "weakly_connected_components",
+    "number_weakly_connected_components",
+    "save_graph",
+    "load_graph",
+]
+
+_NO_SR = -1  # SR of a node or an edge without the attribute
+
+_SNAPSHOT_MAGIC = b"SPGGRAPH"
+_SNAPSHOT_VERSION = 1
+# magic, version, byte order, number of nodes, number of edges, number of sections
+_SNAPSHOT_HEADER = struct.Struct("<8sIIQQI")
+# section name, offset, length in bytes
+_SNAPSHOT_SECTION = struct.Struct("<16sQQ")
+_SNAPSHOT_SECTIONS = (
+    ("label_names", "B"),
+    ("label_offset", "q"),
+    ("label_orient", "B"),
+    ("seg_node", "q"),
+    ("odd_node", "q"),
+    ("node_SR", "h"),
+    ("out_offset", "q"),
+    ("out_target", "q"),
+    ("edge_SR", "h"),
+    ("edge_weight", "f"),
+    ("in_offset", "q"),
+    ("in_source", "q"),
+    ("in_edge", "q"),
+    ("graph_attrs", "B"),
+)
+
+
+def _group_by_source(
+    n_nodes: int, sources: array, *columns: array
+) -> tuple[array, list[array]]:
+    """Stable counting sort of edge columns by source node, return CSR offsets and the sorted columns"""
+    counts = [0] * (n_nodes + 1)
+    for u in sources:
+        counts[u + 1] += 1
+    offsets = array("q", accumulate(counts))
+    position = list(offsets[:-1])
+    order = array("q", bytes(8 * len(sources)))
+    for edge, u in enumerate(sources):
+        order[position[u]] = edge
+        position[u] += 1
+    return offsets, [
+        array(column.typecode, (column[e] for e in order)) for column in columns
+    ]
+
+
+class _LabelTable:
+    """Read-only sequence of (segID, orient) node labels, decoded on access from the name blob of a snapshot"""
+
+    def __init__(
+        self, names: memoryview, offset: memoryview, orient: memoryview
+    ) -> None:
+        self._names = names
+        self._offset = offset
+        self._orient = orient
+
+    def __len__(self) -> int:
+        return len(self._orient)
+
+    def __getitem__(self, node: int) -> tuple[str, str]:
+        name = str(self._names[self._offset[node] : self._offset[node + 1]], "utf-8")
+        return name, "-" if self._orient[node] else "+"
+
+    def __iter__(self):
+        return (self[node] for node in range(len(self)))
+
+
+class _LabelIndex:
+    """Label -> node number lookup of a snapshot. `s<int>` names are looked up in an array indexed by `2 * number + strand`"""
+
+    def __init__(self, seg_node: memoryview, odd: dict[tuple[str, str], int]) -> None:
+        self._seg_node = seg_node
+        self._odd = odd
+
+    def get(self, label: Hashable, default: Optional[int] = None) -> Optional[int]:
+        if not isinstance(label, tuple) or len(label) != 2:
+            return default
+        segID, orient = label
+        if not isinstance(segID, str) or orient not in ("+", "-"):
+            return default
+        num = _parse_seg_num(segID)
+        if num < 0:
+            return self._odd.get(label, default)
+        slot = 2 * num + (orient == "-")
+        if slot < len(self._seg_node) and self._seg_node[slot] >= 0:
+            return self._seg_node[slot]
+        return default
+
+    def __getitem__(self, label: Hashable) -> int:
+        node = self.get(label)
+        if node is None:
+            raise KeyError(label)
+        return node
+
+    def __contains__(self, label: Hashable) -> bool:
+        return self.get(label) is not None
+
+
+class CSRGraph:
+    """
+    Directed graph stored as compressed sparse rows (CSR).
+
+    Nodes are numbered 0..n-1 and translated to their labels, e.g. the oriented node tuples (segID, orient), through a name table.
+    Forward and reverse adjacency are offset/target arrays, the SR of every node and the SR and weight of every edge are typed arrays.
+    The graph is immutable and implements the operations SimPG uses on a networkx.DiGraph with the same names,
+    use `to_networkx()` / `from_networkx()` to convert.
+
+    Examples:
+            >>> G = CSRGraph.from_networkx(nx_graph)
+            >>> list(G.successors(("s1", "+")))
+            >>> nx_graph2 = G.to_networkx()
+    """
+
+    def __init__(
+        self,
+        labels: list[Hashable],
+        node_SR: array,
+        out_offset: array,
+        out_target: array,
+        edge_SR: array,
+        edge_weight: array,
+        graph: Optional[dict] = None,
+    ) -> None:
+        self._labels = labels
+        self._index: Optional[dict[Hashable, int]] = None
+        self._node_SR = node_SR
+        self._out_offset = out_offset
+        self._out_target = out_target
+        self._edge_SR = edge_SR
+        self._edge_weight = edge_weight
+        self._in_offset: Optional[array] = None
+        self._in_source: Optional[array] = None
+        # reverse adjacency slot -> forward edge index
+        self._in_edge: Optional[array] = None
+        self._reversed = False
+        self._snapshot_path: Optional[str] = None
+        self.graph: dict = {} if graph is None else graph
+
+    def __getstate__(self) -> dict:
+        # A graph mapped from a snapshot is reopened from the file instead of copying its pages
+        if self._snapshot_path is not None:
+            return {
+                "_snapshot_path": self._snapshot_path,
+                "_reversed": self._reversed,
+                "graph": self.graph,
+            }
+        state = self.__dict__.copy()
+        state["_index"] = None
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        if state.get("_snapshot_path") is not None:
+            state = {
+                **load_graph(state["_snapshot_path"]).__dict__,
+                "_reversed": state["_reversed"],
+                "graph": state["graph"],
+            }
+        self.__dict__.update(state)
+
+    @classmethod
+    def from_edges(
+        cls,
+        labels: list[Hashable],
+        sources: Iterable[int],
+        targets: Iterable[int],
+        node_SR: Optional[Iterable[int]] = None,
+        edge_SR: Optional[Iterable[int]] = None,
+        edge_weight: Optional[Iterable[float]] = None,
+    ) -> "CSRGraph":
+        """Build a graph from node labels and edge columns of node numbers. Edges keep their order within each source node"""
+        n = len(labels)
+        sources = array("q", sources)
+        targets = array("q", targets)
+        m = len(sources)
+        node_SR = array("h", [_NO_SR] * n if node_SR is None else node_SR)
+        edge_SR = array("h", [_NO_SR] * m if edge_SR is None else edge_SR)
+        edge_weight = array("f", [math.nan] * m if edge_weight is None else edge_weight)
+        offsets, (targets, edge_SR, edge_weight) = _group_by_source(
+            n, sources, targets, edge_SR, edge_weight
+        )
+        return cls(labels, node_SR, offsets, targets, edge_SR, edge_weight)
+
+    @classmethod
+    def from_networkx(cls, G: nx.DiGraph) -> "CSRGraph":
+        """Convert a networkx.DiGraph, keeping node order, adjacency order and the `SR` / `weight` attributes"""
+        labels = list(G.nodes)
+        index = {label: i for i, label in enumerate(labels)}
+        node_SR = array("h", (d.get("SR", _NO_SR) for _, d in G.nodes(data=True)))
+        out_offset = array("q", [0])
+        out_target = array("q")
+        edge_SR = array("h")
+        edge_weight = array("f")
+        for u in labels:
+            for v, d in G.adj[u].items():
+                out_target.append(index[v])
+                edge_SR.append(d.get("SR", _NO_SR))
+                edge_weight.append(d.get("weight", math.nan))
+            out_offset.append(len(out_target))
+        csr = cls(
+            labels, node_SR, out_offset, out_target, edge_SR, edge_weight, dict(G.graph)
+        )
+        csr._index = index
+        return csr
+
+    def to_networkx(self) -> nx.DiGraph:
+        """Convert to a networkx.DiGraph with the same node order, adjacency order and attributes"""
+        G = nx.DiGraph()
+        G.graph.update(self.graph)
+        for i, label in enumerate(self._labels):
+            SR = self._node_SR[i]
+            if SR == _NO_SR:
+                G.add_node(label)
+            else:
+                G.add_node(label, SR=SR)
+        for u, v, e in self._iter_edges():
+            attrs = self._edge_attrs(e)
+            G.add_edge(self._labels[u], self._labels[v], **attrs)
+        return G
+
+    # ---- internal helpers ----
+
+    def _node_index(self) -> dict[Hashable, int]:
+        if self._index is None:
+            self._index = {label: i for i, label in enumerate(self._labels)}
+        return self._index
+
+    def _build_reverse(self) -> None:
+        n = len(self._labels)
+        sources = array("q", bytes(8 * len(self._out_target)))
+        for u in range(n):
+            for e in range(self._out_offset[u], self._out_offset[u + 1]):
+                sources[e] = u
+        edges = array("q", range(len(self._out_target)))
+        self._in_offset, (self._in_source, self._in_edge) = _group_by_source(
+            n, self._out_target, sources, edges
+        )
+
+    def _forward(self) -> tuple[array, array]:
+        """Offsets and targets of the adjacency followed by `successors`"""
+        if not self._reversed:
+            return self._out_offset, self._out_target
+        if self._in_offset is None:
+            self._build_reverse()
+        return self._in_offset, self._in_source
+
+    def _backward(self) -> tuple[array, array]:
+        if self._reversed:
+            return self._out_offset, self._out_target
+        if self._in_offset is None:
+            self._build_reverse()
+        return self._in_offset, self._in_source
+
+    def _iter_edges(self) -> Generator[tuple[int, int, int], Any, None]:
+        """Generate (u, v, forward edge index) in node order"""
+        if not self._reversed:
+            for u in range(len(self._labels)):
+                for e in range(self._out_offset[u], self._out_offset[u + 1]):
+                    yield u, self._out_target[e], e
+        else:
+            offsets, targets = self._forward()
+            for u in range(len(self._labels)):
+                for slot in range(offsets[u], offsets[u + 1]):
+                    yield u, targets[slot], self._in_edge[slot]
+
+    def _edge_attrs(self, e: int) -> dict:
+        attrs = {}
+        if self._edge_SR[e] != _NO_SR:
+            attrs["SR"] = self._edge_SR[e]
+        if not math.isnan(self._edge_weight[e]):
+            weight = self._edge_weight[e]
+            attrs["weight"] = int(weight) if weight.is_integer() else weight
+        return attrs
+
+    def _find_edge(self, u: int, v: int) -> int:
+        """Forward edge index of u -> v, or -1"""
+        if self._reversed:
+            u, v = v, u
+        for e in range(self._out_offset[u], self._out_offset[u + 1]):
+            if self._out_target[e] == v:
+                return e
+        return -1
+
+    # ---- networkx-like interface ----
+
+    def __len__(self) -> int:
+        return len(self._labels)
+
+    def __iter__(self):
+        return iter(self._labels)
+
+    def __contains__(self, node: Hashable) -> bool:
+        return node in self._node_index()
+
+    def has_node(self, node: Hashable) -> bool:
+        return node in self
+
+    def has_edge(self, u: Hashable, v: Hashable) -> bool:
+        index = self._node_index()
+        if u not in index or v not in index:
+            return False
+        return self._find_edge(index[u], index[v]) >= 0
+
+    def number_of_nodes(self) -> int:
+        return len(self._labels)
+
+    def number_of_edges(self) -> int:
+        return len(self._out_target)
+
+    def nodes(self, data: bool = False) -> Generator[Any, Any, None]:
+        if not data:
+            yield from self._labels
+            return
+        for label, SR in zip(self._labels, self._node_SR):
+            yield label, ({} if SR == _NO_SR else {"SR": SR})
+
+    def edges(self, data: bool = False) -> Generator[tuple, Any, None]:
+        labels = self._labels
+        for u, v, e in self._iter_edges():
+            if data:
+                yield labels[u], labels[v], self._edge_attrs(e)
+            else:
+                yield labels[u], labels[v]
+
+    def successors(self, node: Hashable) -> Generator[Hashable, Any, None]:
+        offsets, targets = self._forward()
+        u = self._node_index()[node]
+        labels = self._labels
+        for slot in range(offsets[u], offsets[u + 1]):
+            yield labels[targets[slot]]
+
+    def predecessors(self, node: Hashable) -> Generator[Hashable, Any, None]:
+        """Unlike networkx, which keeps the order edges were added in, predecessors are generated in node order"""
+        offsets, sources = self._backward()
+        v = self._node_index()[node]
+        labels = self._labels
+        for slot in range(offsets[v], offsets[v + 1]):
+            yield labels[sources[slot]]
+
+    def out_degree(self, node: Hashable) -> int:
+        offsets, _ = self._forward()
+        u = self._node_index()[node]
+        return offsets[u + 1] - offsets[u]
+
+    def in_degree(self, node: Hashable) -> int:
+        offsets, _ = self._backward()
+        v = self._node_index()[node]
+        return offsets[v + 1] - offsets[v]
+
+    def get_node_SR(self, node: Hashable) -> int:
+        """Return the SR of a node, -1 if it has none"""
+        return self._node_SR[self._node_index()[node]]
+
+    def get_edge_SR(self, u: Hashable, v: Hashable) -> int:
+        """Return the SR of an edge, -1 if it has none"""
+        index = self._node_index()
+        e = self._find_edge(index[u], index[v])
+        if e < 0:
+            raise KeyError((u, v))
+        return self._edge_SR[e]
+
+    def reverse(self, copy: bool = True) -> "CSRGraph":
+        """Return the graph with every edge reversed. The arrays are shared, the graph is immutable either way"""
+        if self._in_offset is None:
+            self._build_reverse()
+        rev = CSRGraph.__new__(CSRGraph)
+        rev.__dict__.update(self.__dict__)
+        rev._reversed = not self._reversed
+        rev.graph = dict(self.graph) if copy else self.graph
+        return rev
+
+    def subgraph(self, nodes: Iterable[Hashable]) -> "CSRGraph":
+        """Return the subgraph induced on `nodes` as a new CSRGraph, nodes keep their relative order in this graph"""
+        index = self._node_index()
+        keep = sorted({index[n] for n in nodes if n in index})
+        new_of = {old: new for new, old in enumerate(keep)}
+        sources, targets, edge_SR, edge_weight = (
+            array("q"),
+            array("q"),
+            array("h"),
+            array("f"),
+        )
+        offsets, adjacency = self._forward()
+        for new_u, u in enumerate(keep):
+            for slot in range(offsets[u], offsets[u + 1]):
+                v = adjacency[slot]
+                if v in new_of:
+                    e = self._in_edge[slot] if self._reversed else slot
+                    sources.append(new_u)
+                    targets.append(new_of[v])
+                    edge_SR.append(self._edge_SR[e])
+                    edge_weight.append(self._edge_weight[e])
+        sub = CSRGraph.from_edges(
+            [self._labels[u] for u in keep],
+            sources,
+            targets,
+            (self._node_SR[u] for u in keep),
+            edge_SR,
+            edge_weight,
+        )
+        sub.graph = dict(self.graph)
+        return sub
+
+    def copy(self) -> "CSRGraph":
+        """The graph is immutable, a copy shares its arrays"""
+        return self.reverse().reverse()
+
+    def descendants(self, source: Hashable) -> set[Hashable]:
+        offsets, targets = self._forward()
+        s = self._node_index()[source]
+        seen = {s}
+        queue = deque([s])
+        while queue:
+            u = queue.popleft()
+            for slot in range(offsets[u], offsets[u + 1]):
+                v = targets[slot]
+                if v not in seen:
+                    seen.add(v)
+                    queue.append(v)
+        seen.discard(s)
+        return {self._labels[u] for u in seen}
+
+    def has_path(self, source: Hashable, target: Hashable) -> bool:
+        if source not in self or target not in self:
+            raise nx.NodeNotFound(
+                f"Either source {source} or target {target} is not in G"
+            )
+        return source == target or target in self.descendants(source)
+
+    def weakly_connected_components(self) -> Generator[set[Hashable], Any, None]:
+        """Generate the node sets of weakly connected components, in the order of their first node like networkx"""
+        out_offset, out_target = self._forward()
+        in_offset, in_source = self._backward()
+        seen = bytearray(len(self._labels))
+        for s in range(len(self._labels)):
+            if seen[s]:
+                continue
+            seen[s] = 1
+            component = [s]
+            queue = deque([s])
+            while queue:
+                u = queue.popleft()
+                for offsets, adjacency in (
+                    (out_offset, out_target),
+                    (in_offset, in_source),
+                ):
+                    for slot in range(offsets[u], offsets[u + 1]):
+                        v = adjacency[slot]
+                        if not seen[v]:
+                            seen[v] = 1
+                            component.append(v)
+                            queue.append(v)
+            yield {self._labels[u] for u in component}
+
+
+def save_graph(G: Union[nx.DiGraph, CSRGraph], file_path: str) -> str:
+    """
+    Save a pan-genome graph as a snapshot: a small header followed by flat arrays (node labels and SR, forward and reverse CSR adjacency, edge SR and weight).
+    The file is written to a temporary name and renamed, so a reader never sees a partial snapshot.
+
+    Args:
+        G (nx.DiGraph | CSRGraph): Graph whose nodes are (segID, orient) tuples
+        file_path (str): Snapshot location
+
+    Raises:
+        ValueError: A node is not a (segID, orient) tuple.
+
+    Returns:
+        str: `file_path`
+    """
+    if not isinstance(G, CSRGraph) or G._reversed:
+        G = CSRGraph.from_networkx(G if isinstance(G, nx.DiGraph) else G.to_networkx())
+    if G._in_offset is None:
+        G._build_reverse()
+    names = bytearray()
+    label_offset = array("q", [0])
+    label_orient = bytearray()
+    seg_node = array("q")
+    odd_node = array("q")
+    for node, label in enumerate(G._labels):
+        if (
+            not isinstance(label, tuple)
+            or len(label) != 2
+            or not isinstance(label[0], str)
+            or label[1] not in ("+", "-")
+        ):
+            raise ValueError(f"Node {label!r} is not a (segID, orient) tuple")
+        segID, orient = label
+        names += segID.encode("utf-8")
+        label_offset.append(len(names))
+        label_orient.append(orient == "-")
+        num = _parse_seg_num(segID)
+        if num < 0:
+            odd_node.append(node)
+            continue
+        slot = 2 * num + (orient == "-")
+        if slot >= len(seg_node):
+            seg_node.extend([-1] * (slot + 1 - len(seg_node)))
+        seg_node[slot] = node
+    blobs = {
+        "label_names": names,
+        "label_offset": label_offset,
+        "label_orient": label_orient,
+        "seg_node": seg_node,
+        "odd_node": odd_node,
+        "graph_attrs": pickle.dumps(G.graph, protocol=pickle.HIGHEST_PROTOCOL),
+    }
+    sections = []
+    offset = _SNAPSHOT_HEADER.size + _SNAPSHOT_SECTION.size * len(_SNAPSHOT_SECTIONS)
+    for name, _ in _SNAPSHOT_SECTIONS:
+        data = blobs[name] if name in blobs else getattr(G, "_" + name)
+        data = memoryview(data).cast("B")
+        offset += -offset % 8
+        sections.append((name, offset, data))
+        offset += len(data)
+    tmp_path = f"{file_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(
+            _SNAPSHOT_HEADER.pack(
+                _SNAPSHOT_MAGIC,
+                _SNAPSHOT_VERSION,
+                sys.byteorder == "little",
+                G.number_of_nodes(),
+                G.number_of_edges(),
+                len(sections),
+            )
+        )
+        for name, offset, data in sections:
+            f.write(_SNAPSHOT_SECTION.pack(name.encode("ascii"), offset, len(data)))
+        for name, offset, data in sections:
+            f.write(b"\0" * (offset - f.tell()))
+            f.write(data)
+    os.replace(tmp_path, file_path)
+    return file_path
+
+
+def load_graph(file_path: str, mmap: bool = True) -> CSRGraph:
+    """
+    Open a snapshot written by `save_graph` as a CSRGraph.
+
+    Args:
+        file_path (str): Snapshot location
+        mmap (bool, optional): Map the file read-only instead of reading it. Opening is then nearly instant, and processes opening
+            (or inheriting) the same snapshot share its pages. A mapped graph is pickled as its path, e.g. when sent to a spawned worker. Defaults to True.
+
+    Raises:
+        ValueError: The file is not a snapshot, or was written by another version or on a machine with another byte order.
+
+    Returns:
+        CSRGraph: The graph, node labels are decoded on access
+    """
+    with open(file_path, "rb") as f:
+        magic, version, little, _, _, n_sections = _SNAPSHOT_HEADER.unpack(
+            f.read(_SNAPSHOT_HEADER.size)
+        )
+        if magic != _SNAPSHOT_MAGIC:
+            raise ValueError(f"{file_path} is not a graph snapshot")
+        if version != _SNAPSHOT_VERSION or little != (sys.byteorder == "little"):
+            raise ValueError(f"{file_path} was written by an incompatible SimPG")
+        table = [
+            _SNAPSHOT_SECTION.unpack(f.read(_SNAPSHOT_SECTION.size))
+            for _ in range(n_sections)
+        ]
+        if mmap:
+            buffer = memoryview(_mmap.mmap(f.fileno(), 0, access=_mmap.ACCESS_READ))
+        else:
+            f.seek(0)
+            buffer = memoryview(f.read())
+    typecodes = dict(_SNAPSHOT_SECTIONS)
+    views = {}
+    for raw_name, offset, length in table:
+        name = raw_name.rstrip(b"\0").decode("ascii")
+        views[name] = buffer[offset : offset + length].cast(typecodes[name])
+    labels = _LabelTable(
+        views["label_names"], views["label_offset"], views["label_orient"]
+    )
+    G = CSRGraph(
+        labels,
+        views["node_SR"],
+        views["out_offset"],
+        views["out_target"],
+        views["edge_SR"],
+        views["edge_weight"],
+        pickle.loads(views["graph_attrs"]),
+    )
+    G._index = _LabelIndex(
+        views["seg_node"], {labels[node]: node for node in views["odd_node"]}
+    )
+    G._in_offset = views["in_offset"]
+    G._in_source = views["in_source"]
+    G._in_edge = views["in_edge"]
+    if mmap:
+        G._snapshot_path = os.path.abspath(file_path)
+    return G
+
+
+def has_path(
+    G: Union[nx.DiGraph, CSRGraph], source: Hashable, target: Hashable
+) -> bool:
+    """`networkx.has_path` for either graph type"""
+    if isinstance(G, CSRGraph):
+        return G.has_path(source, target)
+    return nx.has_path(G, source, target)
+
+
+def descendants(G: Union[nx.DiGraph, CSRGraph], source: Hashable) -> set[Hashable]:
+    """`networkx.descendants` for either graph type"""
+    if isinstance(G, CSRGraph):
+        return G.descendants(source)
+    return nx.descendants(G, source)
+
+
+def weakly_connected_components(
+    G: Union[nx.DiGraph, CSRGraph],
+) -> Generator[set[Hashable], Any, None]:
+    """`networkx.weakly_connected_components` for either graph type"""
+    if isinstance(G, CSRGraph):
+        return G.weakly_connected_components()
+    return nx.weakly_connected_components(G)
+
+
+def number_weakly_connected_components(G: Union[nx.DiGraph, CSRGraph]) -> int:
+    """`networkx.number_weakly_connected_components` for either graph type"""
+    if isinstance(G, CSRGraph):
+        return sum(1 for _ in G.weakly_connected_components())
+    return nx.number_weakly_connected_components(G)
+
+
+if __name__ == "__main__":
+    pass
@@ -15,15 +15,24 @@ def run_SimPG(
     population_name: Optional[str] = None,
     sim_num: int = 1,
     logging_verbose: bool = False,
+    graph_engine: str = "networkx",
+    workers: int = 1,
+    walk_engine: str = "sample",
+    walk_cache_file: Optional[str] = None,
+    use_gfa_paths: bool = False,
+    resume_walks: bool = False,
+    sample_cache_dir: Optional[str] = None,
 ) -> None:
     set_default_logging(logging_verbose)
-    gfa_message = Minigfa(GFA_file_path)
+    gfa_message = Minigfa(GFA_file_path, with_paths=use_gfa_paths)
     bed_message = Minibed(BED_file_path)
     Minigraph = turn_GFA_to_DiGraph(
         gfa_message,
         bed_message,
         whether_to_output_graph_information_in_terminal,
         enable_to_save_temporary_folder,
+        graph_engine=graph_engine,
+        workers=workers,
     )
     simulate_population_every_walk(
         gfa_message,
@@ -31,6 +40,12 @@ def run_SimPG(
         Minigraph,
         population,
         every_sample_Whole_Genome_Sequencing_filepath,
+        workers=workers,
+        walk_engine=walk_engine,
+        cache_file=walk_cache_file,
+        use_paths=use_gfa_paths,
+        resume=resume_walks,
+        sample_cache_dir=sample_cache_dir,
     )
     core_seg_set = get_coreSeg_in_Pangenome(
         gfa_message,
@@ -42,6 +57,7 @@ def run_SimPG(
         every_sample_Whole_Genome_Sequencing_filepath,
         is_output_inspection_results_in_graph=whether_to_output_graph_information_in_terminal,
         is_saved_as_pickle=enable_to_save_temporary_folder,
+        graph_engine=graph_engine,
     )
     simulate_Whole_Genome_Sequencing_for_population(
         Pangenome_Digraph,
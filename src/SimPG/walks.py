@@ -0,0 +1,745 @@
+"""Binary walk store, the random-access file of the walks of a population"""
+
+from array import array
+from typing import Any, Generator, Iterable, NamedTuple, Optional, Union
+from .classes import Minibed, _parse_seg_num
+import json
+import mmap as _mmap
+import os
+import struct
+import sys
+
+__all__ = ["WalkStore", "WalkWriter", "open_walks"]
+
+_WALKS_MAGIC = b"SPGWALKS"
+_WALKS_VERSION = 2
+# magic, version, byte order, offset of the section table (0 while the file is being written), number of sections
+_WALKS_HEADER = struct.Struct("<8sIIQI4x")
+# section name, offset, length in bytes
+_WALKS_SECTION = struct.Struct("<16sQQ")
+_WALKS_SECTIONS = (
+    ("nodes", "i"),
+    ("samples", "B"),
+    ("record_offset", "q"),
+    ("record_length", "q"),
+    ("record_delta", "B"),
+    ("odd_names", "B"),
+    ("bubble_first", "i"),
+    ("bubble_last", "i"),
+    ("bubble_has_head", "B"),
+    ("bubble_head", "i"),
+)
+_WALKS_TYPECODE = "i"  # oriented nodes are stored as int32, `2 * segment key + strand`
+_NO_WALK = -1  # record length of a sample without a walk
+_PARTIAL_SUFFIX = ".partial"
+_JOURNAL_SUFFIX = ".journal"
+_CACHE_MAGIC = b"SPGWCACH"
+_CACHE_VERSION = 1
+# magic, version, record length (-1 for a sample without a walk), whether the record is alleles, length of the odd names
+_CACHE_HEADER = struct.Struct("<8sIqII")
+_CACHE_SUFFIX = ".spwc"
+
+
+class _Reference(NamedTuple):
+    """The linear reference walk, bubble by bubble.
+
+    Bubble b is passed on the reference as `s<first[b] + 1>+ ... s<last[b]>+`, preceded by the oriented node `head[b]`
+    (the source of its chromosome) if `has_head[b]`, i.e. if b is the first bubble of a chromosome.
+    """
+
+    first: memoryview
+    last: memoryview
+    has_head: memoryview
+    head: memoryview
+
+
+class _WalkView:
+    """Read-only sequence of the (segID, orient) nodes of one walk, decoded on access from the int32 array of the store.
+    A walk stored as alleles is expanded on iteration, `nodes` expands it once into an array.
+    """
+
+    def __init__(self, store: "WalkStore", sample_name: str) -> None:
+        self._store = store
+        self._sample_name = sample_name
+        self._nodes: Optional[Union[array, memoryview]] = None
+
+    @property
+    def nodes(self) -> Union[array, memoryview]:
+        if self._nodes is None:
+            self._nodes = self._store.get_nodes(self._sample_name)
+        return self._nodes
+
+    def __len__(self) -> int:
+        if self._nodes is None:
+            return self._store._walk_length(self._sample_name)
+        return len(self._nodes)
+
+    def __getitem__(self, i: int) -> tuple[str, str]:
+        return self._store.get_node(self.nodes[i])
+
+    def __iter__(self) -> Generator[tuple[str, str], Any, None]:
+        get_node = self._store.get_node
+        nodes = self._nodes
+        if nodes is None:
+            nodes = self._store.iter_nodes(self._sample_name)
+        for node in nodes:
+            yield get_node(node)
+
+
+class WalkStore:
+    """
+    Walks of a population opened from a walk store written by `WalkWriter`.
+
+    The file is mapped read-only: a walk is a view of its packed int32 oriented nodes, so opening a store or one sample never reads
+    the other walks. A node is `2 * segment id + strand`: the segment id of an `s<int>` segment is its number, like `Minigfa.get_node_id`,
+    but the segments with other names get negative ids local to the store, which do not index arrays sized by `Minigfa.get_segment_id_bound`
+    and must be translated with `get_node` (then `Minigfa.get_node_id` for the ids of a GFA). The store is a mapping from sample name to walk, in the order the samples were written;
+    a sample without a walk maps to None. Use it as a context manager, or call `close`.
+
+    Walks written as alleles (see `WalkWriter.add`) only store the bubbles where they leave the linear reference,
+    `get_alleles` and `get_reference` give them without expanding the reference runs.
+
+    Examples:
+            >>> with open_walks("tmp/my_walks.spw") as walks:
+            ...     walk = walks["HG002.1"]
+            ...     first = walk[0]  # ("s1", "+")
+            ...     nodes = walk.nodes  # int32 memoryview, numpy.frombuffer(nodes, dtype=numpy.int32) needs no copy
+    """
+
+    def __init__(self, file_path: str) -> None:
+        with open(file_path, "rb") as f:
+            magic, version, little, table_offset, n_sections = _WALKS_HEADER.unpack(
+                f.read(_WALKS_HEADER.size)
+            )
+            if magic != _WALKS_MAGIC:
+                raise ValueError(f"{file_path} is not a walk store")
+            if version != _WALKS_VERSION or little != (sys.byteorder == "little"):
+                raise ValueError(f"{file_path} was written by an incompatible SimPG")
+            if table_offset == 0:
+                raise ValueError(
+                    f"{file_path} is incomplete, its writer did not finish"
+                )
+            f.seek(table_offset)
+            table = [
+                _WALKS_SECTION.unpack(f.read(_WALKS_SECTION.size))
+                for _ in range(n_sections)
+            ]
+            self._mmap = _mmap.mmap(f.fileno(), 0, access=_mmap.ACCESS_READ)
+        self.file_path = file_path
+        self._buffer = memoryview(self._mmap)
+        typecodes = dict(_WALKS_SECTIONS)
+        views = {}
+        for raw_name, offset, length in table:
+            name = raw_name.rstrip(b"\0").decode("ascii")
+            views[name] = self._buffer[offset : offset + length].cast(typecodes[name])
+        names = (
+            str(views["samples"], "utf-8").split("\n") if len(views["samples"]) else []
+        )
+        self._odd_names = (
+            str(views["odd_names"], "utf-8").split("\n")
+            if len(views["odd_names"])
+            else []
+        )
+        self._odd_keys = {name: -k - 1 for k, name in enumerate(self._odd_names)}
+        self._nodes = views["nodes"]
+        # A sample written twice maps to its last record, like a dict built from the records
+        self._records = {
+            name: (offset, length, delta)
+            for name, offset, length, delta in zip(
+                names,
+                views["record_offset"],
+                views["record_length"],
+                views["record_delta"],
+            )
+        }
+        self._reference = _Reference(
+            views["bubble_first"],
+            views["bubble_last"],
+            views["bubble_has_head"],
+            views["bubble_head"],
+        )
+        self._reference_length = sum(self._reference.has_head) + sum(
+            last - first
+            for first, last in zip(self._reference.first, self._reference.last)
+        )
+
+    def __enter__(self) -> "WalkStore":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Unmap the file. Walk views still in use keep the mapping alive until they are released"""
+        self._nodes = self._buffer = self._reference = None
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __iter__(self) -> Generator[str, Any, None]:
+        return iter(self._records)
+
+    def __contains__(self, sample_name: str) -> bool:
+        return sample_name in self._records
+
+    def __getitem__(self, sample_name: str) -> Optional[_WalkView]:
+        if self._records[sample_name][1] == _NO_WALK:
+            return None
+        return _WalkView(self, sample_name)
+
+    def get_nodes(self, sample_name: str) -> Optional[Union[memoryview, array]]:
+        """Return the int32 oriented nodes of a sample's walk, None if the sample has no walk.
+        A walk stored as nodes is a memoryview of the file, a walk stored as alleles is expanded into an array.
+
+        Raises:
+            KeyError: `sample_name` is not in the store.
+        """
+        offset, length, delta = self._records[sample_name]
+        if length == _NO_WALK:
+            return None
+        if delta:
+            return array(_WALKS_TYPECODE, self.iter_nodes(sample_name))
+        return self._nodes[offset : offset + length]
+
+    def get_alleles(self, sample_name: str) -> Optional[dict[int, memoryview]]:
+        """Return the alleles of a walk stored relative to the reference, a dict from bubble (BED line) to the int32 oriented
+        nodes passed instead of the reference run of that bubble, in bubble order. None if the walk is stored as nodes or the sample has no walk.
+
+        Raises:
+            KeyError: `sample_name` is not in the store.
+        """
+        offset, length, delta = self._records[sample_name]
+        if not delta:
+            return None
+        record = self._nodes[offset : offset + length]
+        alleles = {}
+        i = 0
+        while i < length:
+            end = i + 2 + record[i + 1]
+            alleles[record[i]] = record[i + 2 : end]
+            i = end
+        return alleles
+
+    def get_reference(self) -> _Reference:
+        """Return the reference walk the alleles are relative to, as arrays indexed by bubble (see `get_alleles`)"""
+        return self._reference
+
+    def iter_nodes(self, sample_name: str) -> Generator[int, Any, None]:
+        """Generate the int32 oriented nodes of a sample's walk, expanding the reference runs of a walk stored as alleles on the fly
+
+        Raises:
+            KeyError: `sample_name` is not in the store.
+        """
+        alleles = self.get_alleles(sample_name)
+        if alleles is None:
+            nodes = self.get_nodes(sample_name)
+            if nodes is not None:
+                yield from nodes
+            return
+        first, last, has_head, head = self._reference
+        for bubble in range(len(first)):
+            if has_head[bubble]:
+                yield head[bubble]
+            allele = alleles.get(bubble)
+            if allele is None:
+                yield from range(2 * first[bubble] + 2, 2 * last[bubble] + 1, 2)
+            else:
+                yield from allele
+
+    def _walk_length(self, sample_name: str) -> int:
+        alleles = self.get_alleles(sample_name)
+        if alleles is None:
+            return self._records[sample_name][1]
+        first, last = self._reference.first, self._reference.last
+        return self._reference_length + sum(
+            len(allele) - (last[bubble] - first[bubble])
+            for bubble, allele in alleles.items()
+        )
+
+    def samples(self) -> list[str]:
+        """Return the sample names in the order they were written"""
+        return list(self._records)
+
+    def items(self) -> Generator[tuple[str, Optional[_WalkView]], Any, None]:
+        """Generate (sample name, walk) in the order the samples were written, the walk is None for a sample without one"""
+        for sample_name in self._records:
+            yield sample_name, self[sample_name]
+
+    def get_node(self, node: int) -> tuple[str, str]:
+        """Return the (segID, orient) of an oriented node of the store"""
+        key = node >> 1
+        segID = f"s{key}" if key >= 0 else self._odd_names[-key - 1]
+        return segID, "-" if node & 1 else "+"
+
+    def get_node_id(self, segID: str, orient: str) -> int:
+        """Return the oriented node of the store for (segID, orient)
+
+        Raises:
+            KeyError: `segID` is not an `s<int>` ID and is not passed by any walk of the store.
+        """
+        key = _parse_seg_num(segID)
+        if key < 0:
+            key = self._odd_keys[segID]
+        return 2 * key + (orient == "-")
+
+
+class WalkWriter:
+    """
+    Write the walks of a population as a walk store, one sample at a time.
+
+    Walks are appended as packed int32 oriented nodes while the section table (sample names, record offsets and lengths,
+    and the names of segments that are not `s<int>`) is kept in memory and written by `close`. The file is written to a
+    temporary name and renamed on close, so a reader never sees a partial store.
+
+    Given the BED file, the writer also stores the linear reference walk, and a walk can be added as its alleles: only the
+    bubbles where it leaves the reference, the rest of the walk is the reference run of each bubble.
+
+    With `checkpoint=True` the walks are written to `file_path + ".partial"` and every complete record is synced to disk
+    and logged in `file_path + ".journal"`, and both files are kept when the writer is left by an exception.
+    `resume=True` reopens them: the records in the journal are kept, a trailing record the journal does not cover is
+    truncated, and the next walks are appended. A finished store at `file_path` is reopened the same way.
+    The writer must be given the same BED file as the one it resumes.
+
+    Examples:
+            >>> with WalkWriter("tmp/my_walks.spw") as writer:
+            ...     writer.add("HG002.1", [("s1", "+"), ("s2", "+")])
+            >>> with WalkWriter("tmp/my_walks.spw", bed_message) as writer:
+            ...     writer.add("HG002.1", {12: [("s40", "+"), ("s41", "-"), ("s43", "+")]})
+    """
+
+    def __init__(
+        self,
+        file_path: str,
+        bed_message: Optional[Minibed] = None,
+        checkpoint: bool = False,
+        resume: bool = False,
+    ) -> None:
+        self.file_path = file_path
+        self._checkpoint = checkpoint or resume
+        if self._checkpoint:
+            self._tmp_path = file_path + _PARTIAL_SUFFIX
+            self._journal_path = file_path + _JOURNAL_SUFFIX
+        else:
+            self._tmp_path = f"{file_path}.{os.getpid()}.tmp"
+        self._journal = None
+        self._last_record: tuple[Optional[Union[array, memoryview]], bool] = (
+            None,
+            False,
+        )
+        self._samples: list[str] = []
+        self._record_offset = array("q")
+        self._record_length = array("q")
+        self._record_delta = bytearray()
+        self._n_nodes = 0
+        self._itemsize = array(_WALKS_TYPECODE).itemsize
+        self._odd_names: list[str] = []
+        self._odd_keys: dict[str, int] = {}
+        self._node_ids: dict[tuple[str, str], int] = {}
+        self._bubble_first = array(_WALKS_TYPECODE)
+        self._bubble_last = array(_WALKS_TYPECODE)
+        self._bubble_has_head = bytearray()
+        self._bubble_head = array(_WALKS_TYPECODE)
+        if bed_message is not None:
+            sources, _ = bed_message.get_linear_sources_and_sinks()
+            last_chr = object()
+            for chr, _, _, _, list_of_segments in bed_message:
+                self._bubble_first.append(_parse_seg_num(list_of_segments[0]))
+                self._bubble_last.append(_parse_seg_num(list_of_segments[-1]))
+                self._bubble_has_head.append(chr != last_chr)
+                self._bubble_head.append(
+                    self._node_id((sources[chr], "+")) if chr != last_chr else 0
+                )
+                last_chr = chr
+        # The odd names interned so far are the ones of the BED, a resumed writer interns them again
+        self._n_journaled_odd = len(self._odd_names)
+        if resume and self._resume():
+            return
+        self._file = open(self._tmp_path, "wb")
+        self._file.write(
+            _WALKS_HEADER.pack(
+                _WALKS_MAGIC, _WALKS_VERSION, sys.byteorder == "little", 0, 0
+            )
+        )
+        if self._checkpoint:
+            self._journal = open(self._journal_path, "w", encoding="utf-8")
+
+    def _resume(self) -> bool:
+        """Reopen the checkpoint files, or the store at `file_path`, for appending. Return False if there is neither"""
+        if not os.path.exists(self._tmp_path):
+            if not os.path.exists(self.file_path):
+                return False
+            self._journal_store()
+            os.replace(self.file_path, self._tmp_path)
+        with open(self._tmp_path, "rb") as f:
+            magic, version, little, _, _ = _WALKS_HEADER.unpack(
+                f.read(_WALKS_HEADER.size)
+            )
+        if magic != _WALKS_MAGIC:
+            raise ValueError(f"{self._tmp_path} is not a walk store")
+        if version != _WALKS_VERSION or little != (sys.byteorder == "little"):
+            raise ValueError(f"{self._tmp_path} was written by an incompatible SimPG")
+        size = os.path.getsize(self._tmp_path)
+        valid = 0
+        try:
+            with open(self._journal_path, "rb") as journal:
+                lines = journal.readlines()
+        except FileNotFoundError:
+            lines = []
+        for line in lines:
+            # A record is kept only if its journal line is complete and its nodes are in the file
+            if not line.endswith(b"\n"):
+                break
+            try:
+                sample_name, offset, length, delta, odd_names = json.loads(line)
+            except ValueError:
+                break
+            if (
+                offset != self._n_nodes
+                or _WALKS_HEADER.size
+                + (self._n_nodes + max(length, 0)) * self._itemsize
+                > size
+            ):
+                break
+            for segID in odd_names:
+                self._odd_keys[segID] = -len(self._odd_names) - 1
+                self._odd_names.append(segID)
+            self._samples.append(sample_name)
+            self._record_offset.append(offset)
+            self._record_length.append(length)
+            self._record_delta.append(delta)
+            self._n_nodes += max(length, 0)
+            valid += len(line)
+        self._n_journaled_odd = len(self._odd_names)
+        self._file = open(self._tmp_path, "r+b")
+        self._file.truncate(_WALKS_HEADER.size + self._n_nodes * self._itemsize)
+        self._file.write(
+            _WALKS_HEADER.pack(
+                _WALKS_MAGIC, _WALKS_VERSION, sys.byteorder == "little", 0, 0
+            )
+        )
+        self._file.seek(0, os.SEEK_END)
+        self._journal = open(self._journal_path, "a", encoding="utf-8")
+        self._journal.truncate(valid)
+        return True
+
+    def _journal_store(self) -> None:
+        """Log the records of the finished store at `file_path` in a journal, so that it can be reopened as checkpoint files"""
+        with WalkStore(self.file_path) as store:
+            reference = store.get_reference()
+            if (
+                reference.first.tobytes() != self._bubble_first.tobytes()
+                or reference.last.tobytes() != self._bubble_last.tobytes()
+                or store._odd_names[: len(self._odd_names)] != self._odd_names
+            ):
+                raise ValueError(f"{self.file_path} was written for another BED file")
+            odd_names = store._odd_names[len(self._odd_names) :]
+            with open(self._journal_path, "w", encoding="utf-8") as journal:
+                for sample_name, (offset, length, delta) in store._records.items():
+                    journal.write(
+                        json.dumps([sample_name, offset, length, delta, odd_names])
+                        + "\n"
+                    )
+                    odd_names = []
+                journal.flush()
+                os.fsync(journal.fileno())
+            reference = None
+
+    def __enter__(self) -> "WalkWriter":
+        return self
+
+    def __exit__(self, exc_type, *exc_info) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+            if self._journal is not None:
+                # Keep the checkpoint files, a writer with `resume=True` continues from them
+                self._journal.close()
+            else:
+                os.remove(self._tmp_path)
+
+    def _node_id(self, node: tuple[str, str]) -> int:
+        segID, orient = node
+        key = _parse_seg_num(segID)
+        if key < 0:
+            key = self._odd_keys.get(segID)
+            if key is None:
+                key = self._odd_keys[segID] = -len(self._odd_names) - 1
+                self._odd_names.append(segID)
+        node_id = self._node_ids[node] = 2 * key + (orient == "-")
+        return node_id
+
+    def add(
+        self,
+        sample_name: str,
+        walk: Optional[
+            Union[Iterable[tuple[str, str]], dict[int, Iterable[tuple[str, str]]]]
+        ],
+    ) -> None:
+        """Append the walk of a sample.
+
+        Args:
+            sample_name (str): Sample name
+            walk: A list of (segID, orient), None for a sample without a walk, or a dict from bubble (BED line) to the
+                (segID, orient) passed instead of the reference run of that bubble, which needs the writer to be given the BED file.
+        """
+        if walk is None:
+            self.add_nodes(sample_name, None)
+            return
+        node_ids = self._node_ids
+        if isinstance(walk, dict):
+            if not self._bubble_first:
+                raise ValueError("A walk given as alleles needs the BED file")
+            record = array(_WALKS_TYPECODE)
+            for bubble in sorted(walk):
+                allele = walk[bubble]
+                record.append(bubble)
+                record.append(len(allele))
+                record.extend(
+                    [node_ids[x] if x in node_ids else self._node_id(x) for x in allele]
+                )
+            self._add_record(sample_name, record, True)
+            return
+        self.add_nodes(
+            sample_name,
+            array(
+                _WALKS_TYPECODE,
+                [node_ids[x] if x in node_ids else self._node_id(x) for x in walk],
+            ),
+        )
+
+    def add_nodes(
+        self, sample_name: str, nodes: Optional[Union[array, memoryview]]
+    ) -> None:
+        """Append the walk of a sample given as int32 oriented nodes of this writer, or None for a sample without a walk"""
+        self._add_record(sample_name, nodes, False)
+
+    def _add_record(
+        self,
+        sample_name: str,
+        nodes: Optional[Union[array, memoryview]],
+        delta: bool,
+    ) -> None:
+        if "\n" in sample_name:
+            raise ValueError(f"Sample name {sample_name!r} contains a line break")
+        offset = self._n_nodes
+        length = _NO_WALK
+        if nodes is not None:
+            self._file.write(memoryview(nodes).cast("B"))
+            length = len(nodes)
+            self._n_nodes += length
+        self._samples.append(sample_name)
+        self._record_offset.append(offset)
+        self._record_length.append(length)
+        self._record_delta.append(delta)
+        self._last_record = (nodes, delta)
+        if self._journal is not None:
+            # The nodes reach the disk before the journal line that makes the record count on resume
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            odd_names = self._odd_names[self._n_journaled_odd :]
+            self._n_journaled_odd = len(self._odd_names)
+            self._journal.write(
+                json.dumps([sample_name, offset, length, delta, odd_names]) + "\n"
+            )
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+
+    def samples(self) -> list[str]:
+        """Return the sample names written so far, including the ones of a resumed store, in the order they were written"""
+        return list(self._samples)
+
+    def close(self) -> str:
+        """Write the section table and move the store to `file_path`, return `file_path`"""
+        if self._file.closed:
+            return self.file_path
+        f = self._file
+        blobs = {
+            "samples": "\n".join(self._samples).encode("utf-8"),
+            "record_offset": self._record_offset,
+            "record_length": self._record_length,
+            "record_delta": self._record_delta,
+            "odd_names": "\n".join(self._odd_names).encode("utf-8"),
+            "bubble_first": self._bubble_first,
+            "bubble_last": self._bubble_last,
+            "bubble_has_head": self._bubble_has_head,
+            "bubble_head": self._bubble_head,
+        }
+        offset = f.tell()
+        sections = [("nodes", _WALKS_HEADER.size, memoryview(b""))]
+        for name, _ in _WALKS_SECTIONS[1:]:
+            data = memoryview(blobs[name]).cast("B")
+            offset += -offset % 8
+            sections.append((name, offset, data))
+            offset += len(data)
+        for name, offset, data in sections[1:]:
+            f.write(b"\0" * (offset - f.tell()))
+            f.write(data)
+        f.write(b"\0" * (-f.tell() % 8))
+        table_offset = f.tell()
+        for name, offset, data in sections:
+            length = len(data) if name != "nodes" else self._n_nodes * self._itemsize
+            f.write(_WALKS_SECTION.pack(name.encode("ascii"), offset, length))
+        f.seek(0)
+        f.write(
+            _WALKS_HEADER.pack(
+                _WALKS_MAGIC,
+                _WALKS_VERSION,
+                sys.byteorder == "little",
+                table_offset,
+                len(sections),
+            )
+        )
+        f.close()
+        os.replace(self._tmp_path, self.file_path)
+        if self._journal is not None:
+            self._journal.close()
+            os.remove(self._journal_path)
+        return self.file_path
+
+
+class _WalkCache:
+    """Directory of the walk records of single samples, each in a file named by a key the caller derives from everything
+    the walk depends on. A hit is copied into a `WalkWriter` without decoding the walk, so it costs a file read.
+
+    The files hold the encoded record and the names of the segments that are not `s<int>` it passes, as the oriented
+    nodes of such segments depend on the writer. When the files exceed `max_size` bytes, the least recently used are
+    removed, a hit refreshes the modification time of its file.
+    """
+
+    def __init__(self, directory: str, max_size: int) -> None:
+        self.directory = directory
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(size for _, size, _ in self._entries())
+        if self._size > max_size:
+            self._evict()
+
+    def _entries(self) -> list[tuple[float, int, str]]:
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(_CACHE_SUFFIX):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + _CACHE_SUFFIX)
+
+    def __contains__(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def copy_to(self, key: str, writer: WalkWriter, sample_name: str) -> bool:
+        """Add the cached walk of `key` to `writer` as the walk of `sample_name`, return False if it is not cached"""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return False
+        magic, version, length, delta, odd_size = _CACHE_HEADER.unpack_from(data)
+        if magic != _CACHE_MAGIC or version != _CACHE_VERSION:
+            return False
+        start = _CACHE_HEADER.size + odd_size
+        nodes = None
+        if length != _NO_WALK:
+            nodes = array(_WALKS_TYPECODE)
+            nodes.frombytes(data[start:])
+            if odd_size:
+                # Bubbles and allele lengths are never negative, so every negative value is an oriented node
+                keys = {
+                    -k - 1: writer._node_id((segID, "+")) >> 1
+                    for k, segID in enumerate(
+                        str(data[_CACHE_HEADER.size : start], "utf-8").split("\n")
+                    )
+                }
+                nodes = array(
+                    _WALKS_TYPECODE,
+                    [2 * keys[x >> 1] + (x & 1) if x < 0 else x for x in nodes],
+                )
+        writer._add_record(sample_name, nodes, bool(delta))
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        self.hits += 1
+        return True
+
+    def put(self, key: str, writer: WalkWriter) -> None:
+        """Cache the record last added to `writer` under `key`"""
+        self.misses += 1
+        nodes, delta = writer._last_record
+        odd_names = []
+        length = _NO_WALK
+        if nodes is not None:
+            length = len(nodes)
+            if min(nodes, default=0) < 0:
+                keys = {}
+                for x in nodes:
+                    if x < 0 and x >> 1 not in keys:
+                        keys[x >> 1] = -len(keys) - 1
+                        odd_names.append(writer._odd_names[-(x >> 1) - 1])
+                nodes = array(
+                    _WALKS_TYPECODE,
+                    [2 * keys[x >> 1] + (x & 1) if x < 0 else x for x in nodes],
+                )
+        odd = "\n".join(odd_names).encode("utf-8")
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(
+                _CACHE_HEADER.pack(
+                    _CACHE_MAGIC, _CACHE_VERSION, length, delta, len(odd)
+                )
+            )
+            f.write(odd)
+            if nodes is not None:
+                f.write(memoryview(nodes).cast("B"))
+            size = f.tell()
+        os.replace(tmp_path, path)
+        self._size += size
+        if self._size > self.max_size:
+            self._evict()
+
+    def _evict(self) -> None:
+        """Remove the least recently used files until the cache fits in `max_size`"""
+        entries = sorted(self._entries())
+        self._size = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self._size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._size -= size
+
+
+def open_walks(file_path: str) -> WalkStore:
+    """
+    Open a walk store written by `simulate_population_every_walk` (or `WalkWriter`).
+
+    Args:
+        file_path (str): Walk store location
+
+    Raises:
+        ValueError: The file is not a complete walk store, or was written by another version or on a machine with another byte order.
+
+    Returns:
+        WalkStore: Mapping from sample name to walk, walks are decoded on access
+    """
+    return WalkStore(file_path)
+
+
+if __name__ == "__main__":
+    pass